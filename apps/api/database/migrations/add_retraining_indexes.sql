@@ -0,0 +1,15 @@
+-- Composite indexes for the auto-retraining checks
+-- Covers the hot filters used by AutoRetrainingSystem.should_retrain
+-- This migration is safe to run multiple times
+
+-- New completed documents since the last training run, and the
+-- most-recent-first keyset scan used to build the training set
+-- (same order as the training query: newest first, NULL completion times last)
+DROP INDEX IF EXISTS idx_jobs_status_completed;
+DROP INDEX IF EXISTS idx_jobs_status_completed_id;
+CREATE INDEX IF NOT EXISTS idx_jobs_status_completed_recent
+    ON jobs(status, processing_completed_at DESC NULLS LAST, id DESC);
+
+-- Recent predictions per model (performance check)
+CREATE INDEX IF NOT EXISTS idx_predictions_model_created
+    ON ml_predictions(model_name, created_at);
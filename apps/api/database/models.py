@@ -2,7 +2,7 @@ from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Foreig
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from datetime import datetime
 import uuid
 
@@ -59,6 +59,9 @@ class Job(Base, TimestampMixin):
         Index("idx_jobs_user_status", "user_id", "status"),
         Index("idx_jobs_created_at", "created_at"),
         Index("idx_jobs_status_created", "status", "created_at"),
+        # Mesma ordem do ORDER BY do treino (mais recentes primeiro, sem data por último)
+        Index("idx_jobs_status_completed_recent", "status",
+              text("processing_completed_at DESC NULLS LAST"), text("id DESC")),
     )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=generate_uuid)
@@ -171,6 +174,7 @@ class MLPrediction(Base, TimestampMixin):
     __table_args__ = (
         Index("idx_predictions_job_model", "job_id", "model_name"),
         Index("idx_predictions_score", "lead_score"),
+        Index("idx_predictions_model_created", "model_name", "created_at"),
     )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=generate_uuid)
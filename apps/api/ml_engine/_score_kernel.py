@@ -0,0 +1,135 @@
+"""
+Scoring kernels for the Enhanced ML Processor
+Native (Numba) arithmetic over a fixed-layout feature vector
+"""
+
+import numpy as np
+from typing import Tuple
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in so the kernels still run as plain Python"""
+        return lambda func: func
+
+# Layout of the scoring vector (EnhancedFeatureSet field names, in index order),
+# shared by scoring, confidence, prediction factors, insights and quality assessment
+SCORE_FIELDS = (
+    'currency_mentions',
+    'max_amount',
+    'debt_indicators',
+    'legal_bigrams',
+    'cpc_references',
+    'high_risk_patterns',
+    'medium_risk_patterns',
+    'low_risk_patterns',
+    'completeness_score',
+    'clarity_score',
+    'investment_attractiveness',
+    'risk_mitigation_mentions',
+    'information_density',
+    'extraction_confidence',
+    'deadline_mentions',
+)
+
+IDX_CURRENCY = 0
+IDX_MAX_AMOUNT = 1
+IDX_DEBT = 2
+IDX_LEGAL_BIGRAMS = 3
+IDX_CPC = 4
+IDX_HIGH_RISK = 5
+IDX_MEDIUM_RISK = 6
+IDX_LOW_RISK = 7
+IDX_COMPLETENESS = 8
+IDX_CLARITY = 9
+IDX_ATTRACTIVENESS = 10
+IDX_MITIGATION = 11
+IDX_DENSITY = 12
+IDX_CONFIDENCE = 13
+IDX_DEADLINES = 14
+
+# Legal quality terms (legal_bigrams, cpc_references are adjacent in the layout): cap and multiplier
+_LEGAL_CAPS = np.array([15.0, 10.0])
+_LEGAL_MULT = np.array([3.0, 5.0])
+
+
+# Compiled on the first call and loaded from the on-disk cache afterwards, so importing
+# the module stays cheap; callers pass a float64 vector and a float (one specialization)
+@njit(cache=True)
+def score_kernel(v, original_score):
+    """Enhanced lead score (0-100) and prediction confidence for one feature vector"""
+
+    # Financial attractiveness (0-30 points)
+    financial = ((10.0 if v[IDX_CURRENCY] > 0 else 0.0) +
+                 (10.0 if v[IDX_MAX_AMOUNT] > 100000 else 0.0) +  # High-value property
+                 (10.0 if v[IDX_DEBT] < 3 else 0.0))  # Low debt concerns
+    financial = min(30.0, financial)
+
+    # Legal quality (0-25 points)
+    legal = (min(15.0, v[IDX_LEGAL_BIGRAMS] * 3) +  # Proper legal terminology
+             min(10.0, v[IDX_CPC] * 5) +  # Legal references
+             (5.0 if v[IDX_HIGH_RISK] == 0 else 0.0))  # No high risk indicators
+    legal = min(25.0, legal)
+
+    # Document quality (0-20 points)
+    quality = min(20.0, v[IDX_COMPLETENESS] * 0.15 + v[IDX_CLARITY] * 0.05)
+
+    # Investment opportunity (0-15 points)
+    opportunity = min(15.0, v[IDX_ATTRACTIVENESS] * 0.15)
+
+    # Risk mitigation (0-10 points)
+    risk = 10 - v[IDX_HIGH_RISK] * 3 + v[IDX_MITIGATION] * 2
+    risk = max(0.0, min(10.0, risk))
+
+    enhanced_score = min(100.0, financial + legal + quality + opportunity + risk)
+
+    # Confidence: score consistency, feature quality, completeness and information density
+    consistency = max(0.0, 100 - abs(original_score - enhanced_score) * 2)
+    density = min(100.0, v[IDX_DENSITY] * 10)
+    confidence = (consistency * 0.3 + v[IDX_CONFIDENCE] * 0.3 +
+                  v[IDX_COMPLETENESS] * 0.2 + density * 0.2)
+
+    return enhanced_score, confidence
+
+
+def score_vector(features) -> np.ndarray:
+    """Scoring vector (SCORE_FIELDS layout) for an EnhancedFeatureSet"""
+    return np.array([getattr(features, name) for name in SCORE_FIELDS], dtype=np.float64)
+
+
+def score_batch(F: np.ndarray, original_scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized score_kernel over an (N, len(SCORE_FIELDS)) matrix of scoring vectors"""
+
+    # Financial attractiveness (0-30 points)
+    financial = np.minimum(30.0, (10.0 * (F[:, IDX_CURRENCY] > 0) +
+                                  10.0 * (F[:, IDX_MAX_AMOUNT] > 100000) +
+                                  10.0 * (F[:, IDX_DEBT] < 3)))
+
+    # Legal quality (0-25 points)
+    legal_terms = np.minimum(_LEGAL_CAPS, F[:, IDX_LEGAL_BIGRAMS:IDX_CPC + 1] * _LEGAL_MULT)
+    legal = np.minimum(25.0, legal_terms.sum(axis=1) + 5.0 * (F[:, IDX_HIGH_RISK] == 0))
+
+    # Document quality (0-20 points)
+    quality = np.minimum(20.0, F[:, IDX_COMPLETENESS] * 0.15 + F[:, IDX_CLARITY] * 0.05)
+
+    # Investment opportunity (0-15 points)
+    opportunity = np.minimum(15.0, F[:, IDX_ATTRACTIVENESS] * 0.15)
+
+    # Risk mitigation (0-10 points)
+    risk = np.clip(10 - F[:, IDX_HIGH_RISK] * 3 + F[:, IDX_MITIGATION] * 2, 0.0, 10.0)
+
+    enhanced_scores = np.minimum(100.0, financial + legal + quality + opportunity + risk)
+
+    # Confidence, accumulated in place in the same term order as score_kernel
+    # (a BLAS dot product would round differently from the scalar kernel)
+    confidences = np.maximum(0.0, 100 - np.abs(original_scores - enhanced_scores) * 2)
+    confidences *= 0.3
+    confidences += F[:, IDX_CONFIDENCE] * 0.3
+    confidences += F[:, IDX_COMPLETENESS] * 0.2
+    confidences += np.minimum(100.0, F[:, IDX_DENSITY] * 10) * 0.2
+
+    return enhanced_scores, confidences
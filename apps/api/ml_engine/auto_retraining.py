@@ -4,57 +4,147 @@ Faz os modelos ficarem mais inteligentes automaticamente
 """
 
 import os
-import json
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 
+import numpy as np
+import orjson
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from database.models import Job, MLPrediction, TextAnalysis
 from database.connection import get_db
+from ml_engine.feature_engineering import json_float
 from ml_engine.lead_scoring_models import RandomForestLeadScorer, GradientBoostingLeadScorer
 from ml_engine.optimized_models import EnsembleModelRegistry
 
 logger = logging.getLogger(__name__)
 
+# Colunas projetadas no banco (chaves JSONB extraídas no Postgres, sem decodificar o JSON inteiro).
+# Valores (4-8) vêm crus e passam por json_float, como no feedback_integration: um cast no
+# SQL abortaria a query inteira com um único "n/a" no JSON
+TRAINING_COLUMNS = (
+    func.length(Job.filename),                                                           # 0: text_length aproximado
+    func.coalesce(func.cardinality(TextAnalysis.keywords), 0),                           # 1: word_count aproximado
+    func.coalesce(func.jsonb_array_length(TextAnalysis.entities['persons']), 0),         # 2: entity_count
+    func.coalesce(func.jsonb_array_length(TextAnalysis.financial_data['amounts']), 0),   # 3: money_count
+    TextAnalysis.financial_data['total_value'],                                          # 4: total_financial_value
+    TextAnalysis.financial_data['max_value'],                                            # 5: max_financial_value
+    TextAnalysis.business_indicators['legal_score'],                                     # 6: legal_score
+    TextAnalysis.business_indicators['risk_score'],                                      # 7: risk_score
+    TextAnalysis.business_indicators['viability_score'],                                 # 8: viability_score
+)
+
+# Layout fixo do vetor de features (como no metadata original): (posição, expressão sobre a linha projetada)
+FEATURE_VECTOR_SIZE = 40
+FEATURE_SLOTS = (
+    # Features básicas
+    (0, "row[0]"),                                  # text_length aproximado
+    (1, "row[1]"),                                  # word_count aproximado
+    (2, "row[2]"),                                  # entity_count
+    (3, "0.9"),                                     # language_confidence (assumir português)
+    (4, "0.7"),                                     # readability_score (assumir médio)
+    # Features financeiras
+    (5, "row[3]"),                                  # money_count
+    (6, "json_float(row[4], 0.0)"),                 # total_financial_value
+    (7, "json_float(row[5], 0.0)"),                 # max_financial_value
+    # Features legais (baseado em indicators)
+    (8, "json_float(row[6], 0.0)"),                 # legal_compliance_score
+    (9, "json_float(row[7], 0.5)"),                 # risk_level_score
+    (10, "json_float(row[8], 0.5)"),                # investment_viability_score
+)
+
+
+def _compile_feature_writer():
+    """Gera uma vez uma função especializada que escreve cada feature direto na sua posição"""
+    
+    lines = ["def write_features(row, out):"]
+    lines.extend(f"    out[{index}] = {expression}" for index, expression in FEATURE_SLOTS)
+    
+    namespace = {'json_float': json_float}
+    exec(compile("\n".join(lines), "<auto_retraining.write_features>", "exec"), namespace)
+    return namespace['write_features']
+
+
+_write_features = _compile_feature_writer()
+
+
 class AutoRetrainingSystem:
     """Sistema que faz os modelos ficarem mais inteligentes automaticamente"""
     
+    # Cache compartilhado entre instâncias: (model_name, fast_check) -> (timestamp, análise)
+    _should_retrain_cache: Dict[Tuple[str, bool], Tuple[float, Dict[str, any]]] = {}
+    
     def __init__(self):
         self.min_new_samples = 50  # Mínimo de novos documentos para retreinar
         self.performance_threshold = 0.85  # Se accuracy cair abaixo, retreina
         self.max_days_without_training = 30  # Máximo de dias sem treinar
+        self.should_retrain_ttl = 60  # Segundos que a decisão fica em cache
         
-    def should_retrain(self, model_name: str, db: Session) -> Dict[str, any]:
-        """Decide se deve retreinar o modelo"""
+    def should_retrain(self, model_name: str, db: Session, fast_check: bool = False) -> Dict[str, any]:
+        """
+        Decide se deve retreinar o modelo (resultado cacheado por alguns segundos)
+        
+        Com fast_check=True a avaliação para no primeiro critério que dispara
+        o retreinamento; as métricas não calculadas ficam como None.
+        """
+        
+        cache_key = (model_name, fast_check)
+        cached = self._should_retrain_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self.should_retrain_ttl:
+            return dict(cached[1])
+        
+        analysis = self._evaluate_retraining(model_name, db, fast_check)
+        self._should_retrain_cache[cache_key] = (time.monotonic(), analysis)
+        
+        return dict(analysis)
+    
+    def invalidate_should_retrain(self, model_name: str) -> None:
+        """Descarta as decisões cacheadas (ex: após retreinar o modelo)"""
+        self._should_retrain_cache.pop((model_name, False), None)
+        self._should_retrain_cache.pop((model_name, True), None)
+    
+    def _evaluate_retraining(self, model_name: str, db: Session, fast_check: bool = False) -> Dict[str, any]:
+        """Executa as verificações de retreinamento, da mais barata para a mais cara"""
         
         reasons = []
+        analysis = {
+            'should_retrain': False,
+            'reasons': reasons,
+            'new_samples': None,
+            'current_performance': None,
+            'days_since_training': None
+        }
         
         # 1. Verificar quantidade de novos dados
         new_samples = self._count_new_samples_since_last_training(model_name, db)
+        analysis['new_samples'] = new_samples
         if new_samples >= self.min_new_samples:
             reasons.append(f"📊 {new_samples} novos documentos (limite: {self.min_new_samples})")
+            if fast_check:
+                analysis['should_retrain'] = True
+                return analysis
         
-        # 2. Verificar performance atual
-        current_performance = self._get_current_performance(model_name, db)
-        if current_performance < self.performance_threshold:
-            reasons.append(f"📉 Performance baixa: {current_performance:.2f} (limite: {self.performance_threshold})")
-        
-        # 3. Verificar tempo desde último treino
+        # 2. Verificar tempo desde último treino (só lê metadata em disco)
         days_since_training = self._days_since_last_training(model_name)
+        analysis['days_since_training'] = days_since_training
         if days_since_training > self.max_days_without_training:
             reasons.append(f"⏰ {days_since_training} dias sem treinar (limite: {self.max_days_without_training})")
+            if fast_check:
+                analysis['should_retrain'] = True
+                return analysis
+        
+        # 3. Verificar performance atual (varre predições recentes)
+        current_performance = self._get_current_performance(model_name, db)
+        analysis['current_performance'] = current_performance
+        if current_performance < self.performance_threshold:
+            reasons.append(f"📉 Performance baixa: {current_performance:.2f} (limite: {self.performance_threshold})")
         
-        should_retrain = len(reasons) > 0
+        analysis['should_retrain'] = len(reasons) > 0
         
-        return {
-            'should_retrain': should_retrain,
-            'reasons': reasons,
-            'new_samples': new_samples,
-            'current_performance': current_performance,
-            'days_since_training': days_since_training
-        }
+        return analysis
     
     def _count_new_samples_since_last_training(self, model_name: str, db: Session) -> int:
         """Conta documentos novos desde último treino"""
@@ -74,25 +164,30 @@ class AutoRetrainingSystem:
         """Calcula performance atual do modelo"""
         
         # Buscar predições recentes (últimos 7 dias)
-        week_ago = datetime.now() - timedelta(days=7)
+        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
         
-        predictions = db.query(MLPrediction).filter(
+        # Buscar só a coluna de confidence (sem instanciar objetos ORM)
+        rows = db.query(MLPrediction.confidence).filter(
             MLPrediction.model_name == model_name,
             MLPrediction.created_at > week_ago
-        ).all()
-        
-        if not predictions:
-            return 0.5  # Performance neutra se não há dados
+        ).yield_per(1000)
         
         # Calcular accuracy baseado em confidence scores
         # (Em produção, você compararia com resultados reais)
-        avg_confidence = sum(p.confidence or 0.5 for p in predictions) / len(predictions)
-        return avg_confidence
+        confidences = np.fromiter(
+            (row[0] or 0.5 for row in rows),
+            dtype=np.float32
+        )
+        
+        if not confidences.size:
+            return 0.5  # Performance neutra se não há dados
+        
+        return float(confidences.mean())
     
     def _days_since_last_training(self, model_name: str) -> int:
         """Dias desde último treino"""
         last_training = self._get_last_training_date(model_name)
-        return (datetime.now() - last_training).days
+        return (datetime.now(timezone.utc) - last_training).days
     
     def _get_last_training_date(self, model_name: str) -> datetime:
         """Busca data do último treino"""
@@ -100,15 +195,19 @@ class AutoRetrainingSystem:
         model_path = Path(f"storage/models/{model_name}/metadata.json")
         
         if model_path.exists():
-            with open(model_path, 'r') as f:
-                metadata = json.load(f)
-                
-            if metadata.get('training_history'):
-                last_training = metadata['training_history'][-1]['timestamp']
-                return datetime.fromisoformat(last_training.replace('Z', '+00:00'))
+            metadata = orjson.loads(model_path.read_bytes())
+            
+            # last_training: registro mais recente (o histórico completo fica em history.ndjson);
+            # metadados antigos trazem o histórico inteiro embutido
+            last_record = metadata.get('last_training') or (metadata.get('training_history') or [None])[-1]
+            if last_record:
+                last_training = last_record['timestamp']
+                trained_at = datetime.fromisoformat(last_training.replace('Z', '+00:00'))
+                # Históricos antigos gravam horário local sem timezone
+                return trained_at.astimezone(timezone.utc)
         
         # Se não tem histórico, assume treino muito antigo
-        return datetime.now() - timedelta(days=365)
+        return datetime.now(timezone.utc) - timedelta(days=365)
     
     def auto_retrain_if_needed(self, db: Session) -> Dict[str, any]:
         """Verifica e retreina modelos se necessário"""
@@ -119,7 +218,7 @@ class AutoRetrainingSystem:
         for model_name in models_to_check:
             logger.info(f"🔍 Verificando modelo {model_name}...")
             
-            analysis = self.should_retrain(model_name, db)
+            analysis = self.should_retrain(model_name, db, fast_check=True)
             results[model_name] = analysis
             
             if analysis['should_retrain']:
@@ -156,11 +255,12 @@ class AutoRetrainingSystem:
             if success:
                 # Salvar modelo atualizado
                 model.save_model()
+                self.invalidate_should_retrain(model_name)
                 
                 return {
                     'success': True,
                     'samples_used': len(training_data['features']),
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': datetime.now(timezone.utc).isoformat()
                 }
             else:
                 return {'success': False, 'error': 'Training failed'}
@@ -172,23 +272,26 @@ class AutoRetrainingSystem:
     def _prepare_training_data(self, db: Session) -> Dict[str, List]:
         """Prepara dados de treino com documentos mais recentes"""
         
-        # Buscar jobs completados com análise de texto
-        jobs_with_analysis = db.query(Job, TextAnalysis).join(
+        # Buscar jobs completados com análise de texto (só as colunas usadas)
+        rows = db.query(*TRAINING_COLUMNS).select_from(Job).join(
             TextAnalysis, Job.id == TextAnalysis.job_id
         ).filter(
             Job.status == 'completed'
-        ).limit(1000).all()  # Últimos 1000 documentos
+        ).order_by(
+            # NULLS LAST: jobs sem data de conclusão (ex. resetados) não tomam as vagas dos mais recentes
+            Job.processing_completed_at.desc().nulls_last(), Job.id.desc()
+        ).limit(1000).yield_per(200)  # Últimos 1000 documentos (streaming via server-side cursor)
         
         features = []
         targets = []
         
-        for job, analysis in jobs_with_analysis:
+        for row in rows:
             # Extrair features do documento
-            feature_vector = self._extract_features(job, analysis)
+            feature_vector = self._extract_features(row)
             
             # Target: score baseado em resultados conhecidos
             # (Em produção, você teria labels reais de "bom/ruim negócio")
-            target_score = self._calculate_target_score(job, analysis)
+            target_score = self._calculate_target_score(json_float(row[6]), json_float(row[7]), json_float(row[8]))
             
             features.append(feature_vector)
             targets.append(target_score)
@@ -200,49 +303,22 @@ class AutoRetrainingSystem:
             'targets': targets
         }
     
-    def _extract_features(self, job: Job, analysis: TextAnalysis) -> List[float]:
-        """Extrai features de um job para treino"""
-        
-        # Features básicas
-        features = [
-            len(job.filename),  # text_length aproximado
-            analysis.keywords and len(analysis.keywords) or 0,  # word_count aproximado
-            analysis.entities and len(analysis.entities.get('persons', [])) or 0,  # entity_count
-            0.9,  # language_confidence (assumir português)
-            0.7,  # readability_score (assumir médio)
-        ]
-        
-        # Features financeiras
-        financial_data = analysis.financial_data or {}
-        features.extend([
-            len(financial_data.get('amounts', [])),  # money_count
-            financial_data.get('total_value', 0),    # total_financial_value
-            financial_data.get('max_value', 0),      # max_financial_value
-        ])
-        
-        # Features legais (baseado em indicators)
-        business_indicators = analysis.business_indicators or {}
-        features.extend([
-            business_indicators.get('legal_score', 0),        # legal_compliance_score
-            business_indicators.get('risk_score', 0.5),       # risk_level_score
-            business_indicators.get('viability_score', 0.5),  # investment_viability_score
-        ])
-        
-        # Preencher até 40 features (como no metadata original)
-        while len(features) < 40:
-            features.append(0.0)
-        
-        return features[:40]  # Garantir exatamente 40 features
+    def _extract_features(self, row: Tuple) -> List[float]:
+        """Extrai features de uma linha projetada (TRAINING_COLUMNS) para treino"""
+        
+        features = [0.0] * FEATURE_VECTOR_SIZE
+        _write_features(row, features)
+        
+        return features
     
-    def _calculate_target_score(self, job: Job, analysis: TextAnalysis) -> float:
+    def _calculate_target_score(self, legal_score: Optional[float], risk_score: Optional[float],
+                                viability_score: Optional[float]) -> float:
         """Calcula score target para um documento"""
         
         # Lógica simplificada baseada em indicators
-        business_indicators = analysis.business_indicators or {}
-        
-        legal_score = business_indicators.get('legal_score', 0.5)
-        risk_score = 1.0 - business_indicators.get('risk_score', 0.5)  # Inverter risco
-        viability_score = business_indicators.get('viability_score', 0.5)
+        legal_score = 0.5 if legal_score is None else legal_score
+        risk_score = 1.0 - (0.5 if risk_score is None else risk_score)  # Inverter risco
+        viability_score = 0.5 if viability_score is None else viability_score
         
         # Score final: média ponderada
         target = (legal_score * 0.3 + risk_score * 0.4 + viability_score * 0.3)
@@ -256,7 +332,7 @@ def run_auto_retraining():
     
     auto_trainer = AutoRetrainingSystem()
     
-    with next(get_db()) as db:
+    with get_db() as db:
         results = auto_trainer.auto_retrain_if_needed(db)
     
     return results
@@ -267,4 +343,4 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     result = run_auto_retraining()
     print("🤖 Resultado do auto-retreinamento:")
-    print(json.dumps(result, indent=2, default=str))
\ No newline at end of file
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2, default=str).decode())
\ No newline at end of file
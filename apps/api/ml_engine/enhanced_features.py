@@ -3,25 +3,169 @@ Enhanced Feature Engineering - Zero Cost Intelligence Improvements
 Extends existing feature_engineering.py with advanced ML features for better predictions
 """
 
+import importlib.util
 import logging
 import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
 import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
-from dataclasses import dataclass, asdict
-import json
+from dataclasses import dataclass, fields
+
+# spaCy is only imported when the nlp pipeline is first requested
+ADVANCED_LIBS_AVAILABLE = importlib.util.find_spec("spacy") is not None
+if not ADVANCED_LIBS_AVAILABLE:
+    logging.warning("Advanced libraries not available - using fallback implementations")
 
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    import spacy
-    ADVANCED_LIBS_AVAILABLE = True
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
 except ImportError:
-    ADVANCED_LIBS_AVAILABLE = False
-    logging.warning("Advanced libraries not available - using fallback implementations")
+    HYPERSCAN_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """No-op stand-in so the numeric kernels still run as plain Python"""
+        return lambda func: func
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Tokenizer for legal vocabulary lookup: sklearn's default token_pattern, so counts match TfidfVectorizer
+# (runs of 2+ word characters: 'hasta_publica' and 'lei8666' are single tokens, one-letter tokens are dropped)
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+# Numeric fragments inside a matched currency expression
+_NUMBER_RE = re.compile(r'[\d.,]+')
+
+# Character class bit flags for every BMP code point (str.isupper/isdigit semantics)
+_CHAR_UPPER, _CHAR_DIGIT, _CHAR_PUNCT = 1, 2, 4
+_PUNCTUATION = '.,;:!?()[]{}'
+_CHAR_CLASSES = np.array([
+    (_CHAR_UPPER if c.isupper() else 0) | (_CHAR_DIGIT if c.isdigit() else 0) | (_CHAR_PUNCT if c in _PUNCTUATION else 0)
+    for c in map(chr, range(0x10000))
+], dtype=np.uint8)
+
+# Conhecimento de domínio (constantes imutáveis, construídas uma vez por processo)
+# A ordem de _LEGAL_TERMS define os índices do vetor TF-IDF
+_LEGAL_TERMS = (
+    # Property types
+    'imovel', 'propriedade', 'terreno', 'apartamento', 'casa', 'edificio', 
+    'comercial', 'residencial', 'rural', 'urbano', 'lote', 'sala',
+
+    # Legal procedures  
+    'leilao', 'hasta_publica', 'arrematacao', 'execucao', 'penhora', 
+    'bloqueio', 'adjudicacao', 'remicao', 'expropriacao', 'alienacao',
+
+    # Legal entities
+    'tribunal', 'vara', 'juizo', 'comarca', 'juiz', 'escrivao', 
+    'oficial', 'leiloeiro', 'advogado', 'procurador', 'curador',
+
+    # Financial terms
+    'avaliacao', 'lance_minimo', 'debito', 'divida', 'honorarios', 
+    'custas', 'iptu', 'itbi', 'condominio', 'financiamento',
+
+    # Risk indicators
+    'restricao', 'onus', 'gravame', 'hipoteca', 'usufruto', 'servidao', 
+    'enfiteuse', 'indisponibilidade', 'arresto', 'sequestro',
+
+    # Document types
+    'matricula', 'certidao', 'edital', 'auto', 'laudo', 'parecer', 
+    'mandado', 'intimacao', 'citacao', 'notificacao',
+
+    # Legal references
+    'cpc', 'codigo_processo_civil', 'artigo', 'paragrafo', 'inciso', 
+    'lei', 'decreto', 'portaria', 'resolucao',
+
+    # Temporal terms
+    'prazo', 'vencimento', 'data_limite', 'urgente', 'imediato', 
+    'breve', 'periodo', 'cronograma',
+
+    # Quality indicators
+    'regular', 'conforme', 'legal', 'valido', 'procedimento_correto', 
+    'publicado', 'intimado', 'notificado'
+)
+
+_FINANCIAL_PATTERNS = (
+    # Brazilian currency patterns
+    r'R\$\s*\d{1,3}(?:\.\d{3})*(?:,\d{2})?',  # R$ 1.000,00
+    r'\d{1,3}(?:\.\d{3})*(?:,\d{2})?\s*reais',  # 1.000,00 reais
+    r'valor.*?R\$\s*\d+',  # valor R$ amount
+    r'lance.*?R\$\s*\d+',  # lance R$ amount
+    r'avaliacao.*?R\$\s*\d+',  # avaliacao R$ amount
+    r'debito.*?R\$\s*\d+',  # debito R$ amount
+
+    # Tax patterns
+    r'iptu.*?R\$\s*\d+',
+    r'itbi.*?R\$\s*\d+', 
+    r'condominio.*?R\$\s*\d+',
+
+    # Percentage patterns
+    r'\d+(?:,\d+)?\s*%',  # 10,5%
+    r'\d+\s*por\s*cento',  # 10 por cento
+)
+
+_RISK_TERMS = {
+    'high_risk': (
+        'ocupacao_irregular', 'posseiro', 'invasao', 'litigio', 
+        'embargo', 'interdito', 'area_contaminada', 'risco_ambiental',
+        'construcao_irregular', 'sem_habite_se', 'acao_demolitoria'
+    ),
+    'medium_risk': (
+        'inquilino', 'locatario', 'condominio_irregular', 'iptu_atrasado',
+        'obra_inacabada', 'documentacao_pendente', 'vicio_oculto'
+    ),
+    'low_risk': (
+        'livre_ocupacao', 'desocupado', 'vago', 'documentacao_regular',
+        'iptu_em_dia', 'sem_pendencias', 'habite_se_regular'
+    ),
+    'mitigation': (
+        'seguro', 'garantia', 'caucao', 'fianca', 'avalista',
+        'consultoria_juridica', 'due_diligence'
+    )
+}
+
+_LEGAL_NGRAMS = {
+    'bigrams': (
+        'leilao judicial', 'hasta publica', 'execucao fiscal', 
+        'lance minimo', 'valor avaliacao', 'divida ativa',
+        'codigo processo', 'artigo cpc', 'prazo legal'
+    ),
+    'trigrams': (
+        'codigo processo civil', 'primeira segunda praca',
+        'valor lance minimo', 'execucao fiscal fazendaria',
+        'hasta publica judicial', 'livre ocupacao imovel'
+    ),
+    'judicial_phrases': (
+        'nos termos do artigo', 'conforme estabelece o cpc',
+        'de acordo com a lei', 'cumprindo determinacao judicial',
+        'em observancia ao disposto', 'pelo presente edital'
+    )
+}
+
+_ENTITY_TERMS = {
+    'court_terms': ('tribunal', 'vara', 'juízo', 'comarca', 'foro', 'instancia'),
+    'legal_person_terms': ('advogado', 'procurador', 'curador', 'inventariante', 'leiloeiro'),
+    'tax_terms': ('iptu', 'itbi', 'taxa', 'imposto', 'tributo'),
+    'debt_terms': ('dívida', 'débito', 'pendência', 'inadimpl', 'mora', 'atraso'),
+    'payment_terms': ('parcelado', 'à vista', 'financiamento', 'prestação', 'entrada'),
+}
+
+@dataclass(slots=True)
 class EnhancedFeatureSet:
     """Extended feature set with advanced intelligence features"""
     
@@ -107,6 +251,116 @@ class EnhancedFeatureSet:
     processing_time: float = 0.0
     created_at: str = ""
 
+# Componentes do spaCy que o extrator não usa (não são carregados)
+SPACY_EXCLUDED_COMPONENTS = ["ner", "lemmatizer", "attribute_ruler", "parser"]
+
+# Pesos IDF pré-calculados offline (opcional) para o vocabulário jurídico
+LEGAL_IDF_PATH = Path(__file__).parent / "legal_idf.npy"
+
+# Nomes dos campos na ordem de declaração (serialização sem asdict)
+_FIELDS = tuple(field.name for field in fields(EnhancedFeatureSet))
+
+# Indicadores de estrutura do documento
+_HEADER_INDICATORS = ('tribunal', 'vara', 'edital', 'poder judiciário')
+_FOOTER_INDICATORS = ('página', 'folha', 'assinatura', 'cartório')
+_SENTENCE_RE = re.compile(r'[^.\s][^.]*')
+_TABLE_RE = re.compile(r'[┌┐└┘├┤|]|\+---|===')
+
+# Layout estruturado (SoA) para lotes de páginas: campos numéricos do EnhancedFeatureSet
+_DTYPE_BY_TYPE = {int: np.int64, float: np.float64, bool: np.bool_}
+FEATURE_DTYPE = np.dtype([
+    (field.name, _DTYPE_BY_TYPE[field.type])
+    for field in fields(EnhancedFeatureSet) if field.type in _DTYPE_BY_TYPE
+])
+
+@njit(cache=True)
+def _derive_scores(currency_mentions, low_risk, high_risk, completeness, legal_bigrams, debt_indicators,
+                   cpc_references, lei_references, legal_trigrams, court_references, clarity,
+                   information_density, deadline_mentions, temporal_references):
+    """Derived intelligence scores (investment, complexity, difficulty, urgency, confidence)"""
+    
+    # Investment attractiveness score
+    positive = ((currency_mentions > 0) + (low_risk > high_risk) +
+                (completeness > 70) + (legal_bigrams > 2))
+    negative = (high_risk > 2) + (debt_indicators > 3) + (completeness < 50)
+    attractiveness = max(0.0, min(100.0, positive * 25.0 - negative * 15.0))
+    
+    # Legal complexity score
+    legal_complexity = min(100.0, (cpc_references + lei_references + legal_trigrams + court_references) * 5.0)
+    
+    # Processing difficulty score
+    difficulty = ((completeness < 60) + (clarity < 50) +
+                  (high_risk > 1) + (information_density < 5)) * 25.0
+    
+    # Urgency score (based on deadlines and temporal references)
+    urgency = min(100.0, deadline_mentions * 20.0 + min(30.0, temporal_references * 10.0))
+    
+    # Extraction confidence (based on quality indicators)
+    confidence = min(100.0, (completeness * 0.4 + clarity * 0.3 + information_density * 2 +
+                             min(100.0, legal_bigrams * 10.0)) / 4)
+    
+    return attractiveness, legal_complexity, difficulty, urgency, confidence
+
+
+# Layout compacto para armazenamento: scores limitados em FP16, contagens em int16
+# (saturam em 32767), tamanhos/valores monetários em 32 bits
+_WIDE_INT_FIELDS = ('page_number', 'text_length', 'word_count', 'sentence_count')
+_HALF_FLOAT_FIELDS = (
+    'capital_letter_ratio', 'digit_ratio', 'punctuation_density',
+    'paragraph_structure_score', 'section_organization_score',
+    'legal_tfidf_score', 'financial_tfidf_score', 'procedural_tfidf_score',
+    'completeness_score', 'clarity_score', 'urgency_score',
+    'investment_attractiveness', 'legal_complexity_score', 'processing_difficulty',
+    'extraction_confidence',
+)
+
+
+def _storage_type(name: str, dtype: np.dtype) -> Any:
+    if dtype == np.bool_:
+        return np.bool_
+    if np.issubdtype(dtype, np.integer):
+        return np.int32 if name in _WIDE_INT_FIELDS else np.int16
+    return np.float16 if name in _HALF_FLOAT_FIELDS else np.float32
+
+
+FEATURE_STORAGE_DTYPE = np.dtype([
+    (name, _storage_type(name, FEATURE_DTYPE[name])) for name in FEATURE_DTYPE.names
+])
+
+
+def compact_features(batch: np.ndarray) -> np.ndarray:
+    """Downcast a FEATURE_DTYPE batch to FEATURE_STORAGE_DTYPE, saturating out-of-range values"""
+    compact = np.empty(batch.shape, dtype=FEATURE_STORAGE_DTYPE)
+    for name in FEATURE_STORAGE_DTYPE.names:
+        target = FEATURE_STORAGE_DTYPE[name]
+        values = batch[name]
+        if target != np.bool_:
+            limits = np.iinfo(target) if np.issubdtype(target, np.integer) else np.finfo(target)
+            values = np.clip(values, limits.min, limits.max)
+        compact[name] = values
+    return compact
+
+
+def to_ml_float32(rows: np.ndarray) -> np.ndarray:
+    """Feature rows (FEATURE_DTYPE or FEATURE_STORAGE_DTYPE) as a 2D float32 model-input matrix"""
+    return structured_to_unstructured(np.atleast_1d(rows), dtype=np.float32)
+
+
+class _FeatureRow:
+    """Attribute view over one FEATURE_DTYPE record (stands in for EnhancedFeatureSet in the _extract_* steps)"""
+    
+    __slots__ = ('_record',)
+    
+    def __init__(self, record: np.void):
+        object.__setattr__(self, '_record', record)
+    
+    def __getattr__(self, name: str):
+        return self._record[name]
+    
+    def __setattr__(self, name: str, value) -> None:
+        self._record[name] = value
+
+
 class EnhancedFeatureExtractor:
     """Advanced feature extractor with zero-cost intelligence improvements"""
     
@@ -116,149 +370,201 @@ class EnhancedFeatureExtractor:
         self.financial_patterns = self._build_financial_patterns()
         self.risk_patterns = self._build_risk_patterns()
         self.legal_ngrams = self._build_legal_ngrams()
+        self.keyword_groups = self._build_keyword_groups()
+        self._keyword_automaton = self._build_keyword_automaton()
         
-        # Initialize TF-IDF vectorizer with legal vocabulary
-        if ADVANCED_LIBS_AVAILABLE:
-            self.tfidf_vectorizer = TfidfVectorizer(
-                vocabulary=list(self.legal_vocabulary.keys()),
-                ngram_range=(1, 3),
-                max_features=1000,
-                stop_words=self._get_legal_stopwords()
-            )
-            
-            # Load Portuguese spaCy model if available
-            try:
-                self.nlp = spacy.load("pt_core_news_sm")
-                logger.info("Portuguese spaCy model loaded successfully")
-            except OSError:
-                logger.warning("Portuguese spaCy model not found - using regex patterns")
-                self.nlp = None
-        else:
-            self.tfidf_vectorizer = None
-            self.nlp = None
+        # Precompiled legal/structure/quality patterns (applied on every page)
+        self._processo_re = re.compile(r'\d{7}-\d{2}\.\d{4}\.\d{1}\.\d{2}\.\d{4}')
+        self._cpc_res = [re.compile(p) for p in [
+            r'art\.?\s*\d+.*?cpc',
+            r'cpc.*?art\.?\s*\d+',
+            r'artigo\s+\d+.*?codigo.*?processo',
+            r'codigo.*?processo.*?artigo\s+\d+'
+        ]]
+        self._lei_res = [re.compile(p) for p in [
+            r'lei\s+n[°º]?\s*\d+',
+            r'lei\s+federal\s+\d+',
+            r'decreto\s+n[°º]?\s*\d+'
+        ]]
+        self._deadline_res = [re.compile(p) for p in [
+            r'prazo.*?\d+.*?dias?',
+            r'até.*?\d+.*?dias?',
+            r'vencimento.*?\d+',
+            r'data.*?limite',
+            r'deadline'
+        ]]
+        self._section_res = [re.compile(p) for p in [
+            r'\d+\.\s+[A-Z]',  # 1. SECTION
+            r'[A-Z]+\s*-\s*[A-Z]',  # SECTION - TITLE
+            r'\n[A-Z\s]{5,}\n'  # ALL CAPS HEADERS
+        ]]
+        self._essential_res = [re.compile(p, re.IGNORECASE) for p in [
+            r'R\$\s*\d+',  # Financial amounts
+            r'\d{7}-\d{2}\.\d{4}',  # Process numbers
+            r'leilão|hasta|arrematação',  # Auction terms
+            r'imóvel|propriedade|terreno',  # Property terms
+        ]]
+        
+        # Hyperscan prefilter: one pass tells which of the patterns above can match at all
+        # (databases compiled on the first scan - about a second - so construction stays cheap)
+        self._hs_prefilter = None
+        self._hs_prefilter_lock = threading.Lock()
+        
+        # Static IDF weights for the legal vocabulary (offline corpus IDF when shipped, else uniform)
+        self.idf = self._load_idf_weights()
+        
+        # Portuguese spaCy model is loaded lazily on first access to self.nlp
+        self._nlp = None
+        self._nlp_loaded = False
         
         logger.info("Enhanced Feature Extractor initialized with Brazilian legal domain knowledge")
     
+    @property
+    def nlp(self):
+        """Portuguese spaCy pipeline (tokenizer/tagger only), loaded on first use"""
+        if not self._nlp_loaded:
+            self._nlp_loaded = True
+            if ADVANCED_LIBS_AVAILABLE:
+                try:
+                    import spacy
+                    self._nlp = spacy.load("pt_core_news_sm", exclude=SPACY_EXCLUDED_COMPONENTS)
+                    logger.info("Portuguese spaCy model loaded successfully")
+                except (ImportError, OSError):
+                    logger.warning("Portuguese spaCy model not found - using regex patterns")
+        return self._nlp
+    
+    def _load_idf_weights(self) -> np.ndarray:
+        """Load precomputed IDF weights from disk, falling back to uniform weights"""
+        size = len(self.legal_vocabulary)
+        
+        if LEGAL_IDF_PATH.exists():
+            try:
+                idf = np.load(LEGAL_IDF_PATH).astype(np.float32)
+                if idf.shape == (size,):
+                    logger.info(f"Legal vocabulary IDF weights loaded from {LEGAL_IDF_PATH}")
+                    return idf
+                logger.warning(f"IDF weights shape {idf.shape} does not match vocabulary size {size} - using uniform weights")
+            except Exception as e:
+                logger.warning(f"Could not load IDF weights: {e}")
+        
+        # Per-document IDF is degenerate (every present term gets the same weight)
+        return np.ones(size, dtype=np.float32)
+    
     def _build_legal_vocabulary(self) -> Dict[str, int]:
         """Build comprehensive legal vocabulary for Brazilian judicial auctions"""
-        vocabulary = {}
-        index = 0
-        
-        # Core legal terms
-        legal_terms = [
-            # Property types
-            'imovel', 'propriedade', 'terreno', 'apartamento', 'casa', 'edificio', 
-            'comercial', 'residencial', 'rural', 'urbano', 'lote', 'sala',
-            
-            # Legal procedures  
-            'leilao', 'hasta_publica', 'arrematacao', 'execucao', 'penhora', 
-            'bloqueio', 'adjudicacao', 'remicao', 'expropriacao', 'alienacao',
-            
-            # Legal entities
-            'tribunal', 'vara', 'juizo', 'comarca', 'juiz', 'escrivao', 
-            'oficial', 'leiloeiro', 'advogado', 'procurador', 'curador',
-            
-            # Financial terms
-            'avaliacao', 'lance_minimo', 'debito', 'divida', 'honorarios', 
-            'custas', 'iptu', 'itbi', 'condominio', 'financiamento',
-            
-            # Risk indicators
-            'restricao', 'onus', 'gravame', 'hipoteca', 'usufruto', 'servidao', 
-            'enfiteuse', 'indisponibilidade', 'arresto', 'sequestro',
-            
-            # Document types
-            'matricula', 'certidao', 'edital', 'auto', 'laudo', 'parecer', 
-            'mandado', 'intimacao', 'citacao', 'notificacao',
-            
-            # Legal references
-            'cpc', 'codigo_processo_civil', 'artigo', 'paragrafo', 'inciso', 
-            'lei', 'decreto', 'portaria', 'resolucao',
-            
-            # Temporal terms
-            'prazo', 'vencimento', 'data_limite', 'urgente', 'imediato', 
-            'breve', 'periodo', 'cronograma',
-            
-            # Quality indicators
-            'regular', 'conforme', 'legal', 'valido', 'procedimento_correto', 
-            'publicado', 'intimado', 'notificado'
-        ]
-        
-        for term in legal_terms:
-            vocabulary[term] = index
-            index += 1
-            
-        return vocabulary
+        return {term: index for index, term in enumerate(_LEGAL_TERMS)}
     
-    def _build_financial_patterns(self) -> List[str]:
+    def _build_financial_patterns(self) -> List[re.Pattern]:
         """Build financial pattern recognition patterns"""
-        return [
-            # Brazilian currency patterns
-            r'R\$\s*\d{1,3}(?:\.\d{3})*(?:,\d{2})?',  # R$ 1.000,00
-            r'\d{1,3}(?:\.\d{3})*(?:,\d{2})?\s*reais',  # 1.000,00 reais
-            r'valor.*?R\$\s*\d+',  # valor R$ amount
-            r'lance.*?R\$\s*\d+',  # lance R$ amount
-            r'avaliacao.*?R\$\s*\d+',  # avaliacao R$ amount
-            r'debito.*?R\$\s*\d+',  # debito R$ amount
-            
-            # Tax patterns
-            r'iptu.*?R\$\s*\d+',
-            r'itbi.*?R\$\s*\d+', 
-            r'condominio.*?R\$\s*\d+',
-            
-            # Percentage patterns
-            r'\d+(?:,\d+)?\s*%',  # 10,5%
-            r'\d+\s*por\s*cento',  # 10 por cento
-        ]
+        return [re.compile(pattern, re.IGNORECASE) for pattern in _FINANCIAL_PATTERNS]
     
-    def _build_risk_patterns(self) -> Dict[str, List[str]]:
+    def _build_risk_patterns(self) -> Dict[str, Tuple[str, ...]]:
         """Build risk assessment patterns"""
-        return {
-            'high_risk': [
-                'ocupacao_irregular', 'posseiro', 'invasao', 'litigio', 
-                'embargo', 'interdito', 'area_contaminada', 'risco_ambiental',
-                'construcao_irregular', 'sem_habite_se', 'acao_demolitoria'
-            ],
-            'medium_risk': [
-                'inquilino', 'locatario', 'condominio_irregular', 'iptu_atrasado',
-                'obra_inacabada', 'documentacao_pendente', 'vicio_oculto'
-            ],
-            'low_risk': [
-                'livre_ocupacao', 'desocupado', 'vago', 'documentacao_regular',
-                'iptu_em_dia', 'sem_pendencias', 'habite_se_regular'
-            ],
-            'mitigation': [
-                'seguro', 'garantia', 'caucao', 'fianca', 'avalista',
-                'consultoria_juridica', 'due_diligence'
-            ]
-        }
+        return _RISK_TERMS
     
-    def _build_legal_ngrams(self) -> Dict[str, List[str]]:
+    def _build_legal_ngrams(self) -> Dict[str, Tuple[str, ...]]:
         """Build legal n-gram patterns for phrase detection"""
+        return _LEGAL_NGRAMS
+    
+    def _build_keyword_groups(self) -> Dict[str, Tuple[str, ...]]:
+        """Literal keyword groups counted on the lowercased text"""
         return {
-            'bigrams': [
-                'leilao judicial', 'hasta publica', 'execucao fiscal', 
-                'lance minimo', 'valor avaliacao', 'divida ativa',
-                'codigo processo', 'artigo cpc', 'prazo legal'
-            ],
-            'trigrams': [
-                'codigo processo civil', 'primeira segunda praca',
-                'valor lance minimo', 'execucao fiscal fazendaria',
-                'hasta publica judicial', 'livre ocupacao imovel'
-            ],
-            'judicial_phrases': [
-                'nos termos do artigo', 'conforme estabelece o cpc',
-                'de acordo com a lei', 'cumprindo determinacao judicial',
-                'em observancia ao disposto', 'pelo presente edital'
-            ]
+            **self.risk_patterns,
+            **self.legal_ngrams,
+            **_ENTITY_TERMS,
         }
     
-    def _get_legal_stopwords(self) -> List[str]:
-        """Get legal domain stopwords to filter out"""
-        return [
-            'processo', 'autos', 'requerente', 'requerido', 'exequente',
-            'executado', 'autor', 'reu', 'parte', 'partes', 'senhor',
-            'senhora', 'doutor', 'doutora'
-        ]
+    def _build_keyword_automaton(self):
+        """Aho-Corasick automaton over every literal keyword (one scan per page)"""
+        if not AHOCORASICK_AVAILABLE:
+            return None
+        
+        automaton = ahocorasick.Automaton()
+        term_index = 0
+        for group, terms in self.keyword_groups.items():
+            for term in terms:
+                automaton.add_word(term, (group, term_index, len(term)))
+                term_index += 1
+        automaton.make_automaton()
+        
+        return automaton
+    
+    def _count_keywords(self, text_lower: str) -> Dict[str, int]:
+        """Occurrences per keyword group, with str.count semantics (non-overlapping per term)"""
+        # Not a token Counter: terms are substrings ('inadimpl' as a stem, 'à vista' spans
+        # two words, 'mora' also hits 'demora'), so whole-token lookups would change counts
+        if self._keyword_automaton is None:
+            return {
+                group: sum(text_lower.count(term) for term in terms)
+                for group, terms in self.keyword_groups.items()
+            }
+        
+        counts = dict.fromkeys(self.keyword_groups, 0)
+        last_end = {}
+        for end, (group, term_index, length) in self._keyword_automaton.iter(text_lower):
+            # Skip hits overlapping the previous hit of the same term, like str.count does
+            if end - length < last_end.get(term_index, -1):
+                continue
+            last_end[term_index] = end
+            counts[group] += 1
+        
+        return counts
+    
+    def _build_hyperscan_prefilter(self) -> Tuple[Any, Any, List[re.Pattern]]:
+        """Compile every regex family into Hyperscan block databases (raw text and lowercased text)"""
+        if not HYPERSCAN_AVAILABLE:
+            return None, None, []
+        
+        text_patterns = [self._processo_re] + self.financial_patterns + self._section_res + self._essential_res
+        lower_patterns = self._cpc_res + self._lei_res + self._deadline_res
+        all_patterns = text_patterns + lower_patterns
+        
+        def compile_db(patterns: List[re.Pattern], first_id: int):
+            database = hyperscan.Database()
+            database.compile(
+                expressions=[pattern.pattern.encode('utf-8') for pattern in patterns],
+                ids=list(range(first_id, first_id + len(patterns))),
+                elements=len(patterns),
+                flags=[
+                    hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH |
+                    (hyperscan.HS_FLAG_CASELESS if pattern.flags & re.IGNORECASE else 0)
+                    for pattern in patterns
+                ]
+            )
+            return database
+        
+        try:
+            return compile_db(text_patterns, 0), compile_db(lower_patterns, len(text_patterns)), all_patterns
+        except Exception as e:
+            logger.warning(f"Hyperscan prefilter unavailable - scanning every pattern: {e}")
+            return None, None, []
+    
+    def _prefilter_patterns(self, text: str, text_lower: str) -> Optional[set]:
+        """Patterns with at least one match in the page, or None when every pattern must run"""
+        prefilter = self._hs_prefilter
+        if prefilter is None:
+            with self._hs_prefilter_lock:
+                if self._hs_prefilter is None:
+                    self._hs_prefilter = self._build_hyperscan_prefilter()
+                prefilter = self._hs_prefilter
+        
+        text_db, lower_db, patterns = prefilter
+        if text_db is None:
+            return None
+        
+        hits = set()
+        
+        def on_match(pattern_id, start, end, flags, context):
+            hits.add(pattern_id)
+        
+        try:
+            text_db.scan(text.encode('utf-8'), match_event_handler=on_match)
+            lower_db.scan(text_lower.encode('utf-8'), match_event_handler=on_match)
+        except Exception as e:
+            logger.warning(f"Hyperscan scan failed - scanning every pattern: {e}")
+            return None
+        
+        return {patterns[pattern_id] for pattern_id in hits}
     
     def extract_enhanced_features(self, text: str, job_id: str = "", page_number: int = 0) -> EnhancedFeatureSet:
         """
@@ -272,61 +578,121 @@ class EnhancedFeatureExtractor:
         Returns:
             EnhancedFeatureSet with all advanced features
         """
-        start_time = datetime.now()
+        row = np.zeros(1, dtype=FEATURE_DTYPE)
+        self.extract_to_row(text, row, 0, job_id=job_id, page_number=page_number)
+        
+        features = self.row_to_dataclass(row[0], job_id=job_id)
+        features.created_at = datetime.now().isoformat()
+        
+        logger.debug(f"Enhanced features extracted for {job_id}: "
+                    f"completeness={features.completeness_score:.1f}, "
+                    f"investment_attractiveness={features.investment_attractiveness:.1f}")
+        
+        return features
+    
+    def extract_to_row(self, text: str, out: np.ndarray, idx: int, job_id: str = "", page_number: int = 0) -> None:
+        """
+        Extract enhanced features straight into row ``idx`` of a FEATURE_DTYPE array
+        
+        No EnhancedFeatureSet is allocated; use row_to_dataclass() when a caller
+        needs one. On failure the row keeps only page_number and processing_time.
+        
+        Args:
+            text: Document text to analyze
+            out: Structured array with FEATURE_DTYPE
+            idx: Row to fill
+            job_id: Job identifier (logging only)
+            page_number: Page number
+        """
+        t0 = time.perf_counter_ns()
+        record = out[idx]
+        features = _FeatureRow(record)
         
         try:
-            features = EnhancedFeatureSet(
-                job_id=job_id,
-                page_number=page_number,
-                created_at=datetime.now().isoformat()
-            )
+            features.page_number = page_number
+            
+            text_lower = text.lower()
+            
+            # Regex patterns worth running on this page (single Hyperscan pass)
+            active_patterns = self._prefilter_patterns(text, text_lower)
+            
+            # Literal keyword counts (single Aho-Corasick pass)
+            keyword_counts = self._count_keywords(text_lower)
             
             # 1. Enhanced text statistics
             features = self._extract_text_statistics(features, text)
             
             # 2. Advanced legal patterns
-            features = self._extract_legal_patterns(features, text)
+            features = self._extract_legal_patterns(features, text, text_lower, keyword_counts, active_patterns)
             
             # 3. Enhanced financial features
-            features = self._extract_financial_features(features, text)
+            features = self._extract_financial_features(features, text, keyword_counts, active_patterns)
             
             # 4. Document structure analysis
-            features = self._extract_structure_features(features, text)
+            features = self._extract_structure_features(features, text, active_patterns)
             
-            # 5. TF-IDF features (if available)
-            if self.tfidf_vectorizer and ADVANCED_LIBS_AVAILABLE:
-                features = self._extract_tfidf_features(features, text)
+            # 5. TF-IDF features
+            features = self._extract_tfidf_features(features, text_lower)
             
             # 6. N-gram features
-            features = self._extract_ngram_features(features, text)
+            features = self._extract_ngram_features(features, keyword_counts)
             
             # 7. Risk assessment features
-            features = self._extract_risk_features(features, text)
+            features = self._extract_risk_features(features, keyword_counts)
             
             # 8. Quality assessment
-            features = self._assess_document_quality(features, text)
+            features = self._assess_document_quality(features, text, active_patterns)
             
             # 9. Derived intelligence features
             features = self._calculate_derived_features(features)
             
-            # Calculate processing time
-            features.processing_time = (datetime.now() - start_time).total_seconds()
-            
-            logger.debug(f"Enhanced features extracted for {job_id}: "
-                        f"completeness={features.completeness_score:.1f}, "
-                        f"investment_attractiveness={features.investment_attractiveness:.1f}")
-            
-            return features
-            
         except Exception as e:
-            logger.error(f"Error in enhanced feature extraction: {e}")
-            # Return basic features in case of error
-            return EnhancedFeatureSet(
-                job_id=job_id,
-                page_number=page_number,
-                created_at=datetime.now().isoformat(),
-                processing_time=(datetime.now() - start_time).total_seconds()
+            logger.error(f"Error in enhanced feature extraction for {job_id}: {e}")
+            # Keep basic features in case of error
+            out[idx] = np.zeros((), dtype=FEATURE_DTYPE)
+            record['page_number'] = page_number
+        
+        # Calculate processing time
+        record['processing_time'] = (time.perf_counter_ns() - t0) * 1e-9
+    
+    def extract_enhanced_features_batch(self, texts: List[str], job_ids: Optional[List[str]] = None,
+                                        page_numbers: Optional[List[int]] = None) -> np.ndarray:
+        """
+        Extract enhanced features for every page of a job into one structured array
+        
+        The compiled scanners (Hyperscan, Aho-Corasick, regexes) and numpy tables are
+        built once per extractor and shared by all pages; each page is written into a
+        preallocated row of a FEATURE_DTYPE array.
+        
+        Args:
+            texts: Page texts to analyze
+            job_ids: Optional job identifier per page (logging only)
+            page_numbers: Optional page number per page (defaults to 1..n)
+            
+        Returns:
+            Structured ndarray with one row per page
+        """
+        batch = np.zeros(len(texts), dtype=FEATURE_DTYPE)
+        
+        for i, text in enumerate(texts):
+            self.extract_to_row(
+                text, batch, i,
+                job_id=job_ids[i] if job_ids else "",
+                page_number=page_numbers[i] if page_numbers else i + 1
             )
+        
+        return batch
+    
+    def row_to_dataclass(self, row: np.void, job_id: str = "") -> EnhancedFeatureSet:
+        """Convert a FEATURE_DTYPE row back into an EnhancedFeatureSet"""
+        return EnhancedFeatureSet(job_id=job_id, **{name: row[name].item() for name in FEATURE_DTYPE.names})
+    
+    def _count_matches(self, patterns: List[re.Pattern], text: str, active_patterns: Optional[set]) -> int:
+        """Total findall matches, skipping patterns the prefilter ruled out"""
+        return sum(
+            len(pattern.findall(text)) for pattern in patterns
+            if active_patterns is None or pattern in active_patterns
+        )
     
     def _extract_text_statistics(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
         """Extract advanced text statistics"""
@@ -334,237 +700,219 @@ class EnhancedFeatureExtractor:
             return features
             
         words = text.split()
-        sentences = [s for s in text.split('.') if s.strip()]
+        # Non-blank '.'-separated sentences, counted without materializing them
+        sentence_count = len(_SENTENCE_RE.findall(text))
         
         # Basic counts
         features.text_length = len(text)
         features.word_count = len(words)
-        features.sentence_count = len(sentences)
+        features.sentence_count = sentence_count
         
         # Advanced statistics
         if words:
-            features.avg_word_length = sum(len(word) for word in words) / len(words)
+            features.avg_word_length = len(''.join(words)) / len(words)
         
-        if sentences:
-            features.avg_sentence_length = sum(len(sent.split()) for sent in sentences) / len(sentences)
+        if sentence_count:
+            # Words per sentence: '.' acts as an extra word separator
+            features.avg_sentence_length = len(text.replace('.', ' ').split()) / sentence_count
         
-        # Character composition analysis
+        # Character composition analysis (one vectorized pass over the code points)
         if text:
-            features.capital_letter_ratio = sum(1 for c in text if c.isupper()) / len(text)
-            features.digit_ratio = sum(1 for c in text if c.isdigit()) / len(text)
-            features.punctuation_density = sum(1 for c in text if c in '.,;:!?()[]{}') / len(text)
+            upper_count, digit_count, punct_count = self._count_character_classes(text)
+            features.capital_letter_ratio = upper_count / len(text)
+            features.digit_ratio = digit_count / len(text)
+            features.punctuation_density = punct_count / len(text)
         
         return features
     
-    def _extract_legal_patterns(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
+    def _count_character_classes(self, text: str) -> Tuple[int, int, int]:
+        """Count uppercase, digit and punctuation characters"""
+        code_points = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        
+        # Code points outside the BMP are rare; classify them directly
+        astral = code_points > 0xFFFF
+        if astral.any():
+            extra = [chr(c) for c in code_points[astral]]
+            extra_counts = (sum(c.isupper() for c in extra), sum(c.isdigit() for c in extra), 0)
+            code_points = code_points[~astral]
+        else:
+            extra_counts = (0, 0, 0)
+        
+        class_counts = np.bincount(_CHAR_CLASSES[code_points], minlength=8)
+        class_ids = np.arange(8)
+        return (
+            int(class_counts[(class_ids & _CHAR_UPPER) != 0].sum()) + extra_counts[0],
+            int(class_counts[(class_ids & _CHAR_DIGIT) != 0].sum()) + extra_counts[1],
+            int(class_counts[(class_ids & _CHAR_PUNCT) != 0].sum()) + extra_counts[2],
+        )
+    
+    def _extract_legal_patterns(self, features: EnhancedFeatureSet, text: str, text_lower: str,
+                                keyword_counts: Dict[str, int],
+                                active_patterns: Optional[set] = None) -> EnhancedFeatureSet:
         """Extract legal patterns using Brazilian legal domain knowledge"""
-        text_lower = text.lower()
         
         # Legal process numbers (Brazilian format)
-        processo_pattern = r'\d{7}-\d{2}\.\d{4}\.\d{1}\.\d{2}\.\d{4}'
-        features.processo_numbers = len(re.findall(processo_pattern, text))
+        features.processo_numbers = self._count_matches([self._processo_re], text, active_patterns)
         
         # CPC references
-        cpc_patterns = [
-            r'art\.?\s*\d+.*?cpc',
-            r'cpc.*?art\.?\s*\d+',
-            r'artigo\s+\d+.*?codigo.*?processo',
-            r'codigo.*?processo.*?artigo\s+\d+'
-        ]
-        features.cpc_references = sum(len(re.findall(pattern, text_lower)) for pattern in cpc_patterns)
+        features.cpc_references = self._count_matches(self._cpc_res, text_lower, active_patterns)
         
         # Law references
-        lei_patterns = [
-            r'lei\s+n[°º]?\s*\d+',
-            r'lei\s+federal\s+\d+',
-            r'decreto\s+n[°º]?\s*\d+'
-        ]
-        features.lei_references = sum(len(re.findall(pattern, text_lower)) for pattern in lei_patterns)
+        features.lei_references = self._count_matches(self._lei_res, text_lower, active_patterns)
         
         # Court references
-        court_terms = ['tribunal', 'vara', 'juízo', 'comarca', 'foro', 'instancia']
-        features.court_references = sum(text_lower.count(term) for term in court_terms)
+        features.court_references = keyword_counts['court_terms']
         
         # Deadline mentions
-        deadline_patterns = [
-            r'prazo.*?\d+.*?dias?',
-            r'até.*?\d+.*?dias?',
-            r'vencimento.*?\d+',
-            r'data.*?limite',
-            r'deadline'
-        ]
-        features.deadline_mentions = sum(len(re.findall(pattern, text_lower)) for pattern in deadline_patterns)
+        features.deadline_mentions = self._count_matches(self._deadline_res, text_lower, active_patterns)
         
         # Legal persons
-        legal_person_terms = ['advogado', 'procurador', 'curador', 'inventariante', 'leiloeiro']
-        features.legal_persons = sum(text_lower.count(term) for term in legal_person_terms)
+        features.legal_persons = keyword_counts['legal_person_terms']
         
         return features
     
-    def _extract_financial_features(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
+    def _extract_financial_features(self, features: EnhancedFeatureSet, text: str, keyword_counts: Dict[str, int],
+                                    active_patterns: Optional[set] = None) -> EnhancedFeatureSet:
         """Extract enhanced financial features"""
         
-        # Find all currency amounts
+        # Gather every currency match first, then pull the numbers out in one scan
+        # (a space never belongs to a number, so joining keeps matches apart)
+        matches = [
+            match
+            for pattern in self.financial_patterns
+            if active_patterns is None or pattern in active_patterns
+            for match in pattern.findall(text)
+        ]
+        
         amounts = []
-        for pattern in self.financial_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                # Extract numeric value
-                numeric_part = re.findall(r'[\d.,]+', match)
-                for num_str in numeric_part:
-                    try:
-                        # Convert Brazilian format to float
-                        clean_num = num_str.replace('.', '').replace(',', '.')
-                        value = float(clean_num)
-                        if value > 100:  # Filter out very small values
-                            amounts.append(value)
-                    except ValueError:
-                        continue
+        for num_str in _NUMBER_RE.findall(' '.join(matches)):
+            try:
+                # Convert Brazilian format to float
+                value = float(num_str.replace('.', '').replace(',', '.'))
+                if value > 100:  # Filter out very small values
+                    amounts.append(value)
+            except ValueError:
+                continue
         
         # Calculate financial statistics
         features.currency_mentions = len(amounts)
         if amounts:
-            features.max_amount = max(amounts)
-            features.min_amount = min(amounts)
-            features.avg_amount = sum(amounts) / len(amounts)
-            features.amount_variance = np.var(amounts) if len(amounts) > 1 else 0.0
+            amount_array = np.asarray(amounts, dtype=np.float64)
+            features.max_amount = float(amount_array.max())
+            features.min_amount = float(amount_array.min())
+            features.avg_amount = float(amount_array.mean())
+            features.amount_variance = float(amount_array.var()) if amount_array.size > 1 else 0.0
         
         # Tax mentions
-        tax_terms = ['iptu', 'itbi', 'taxa', 'imposto', 'tributo']
-        features.tax_mentions = sum(text.lower().count(term) for term in tax_terms)
+        features.tax_mentions = keyword_counts['tax_terms']
         
         # Debt indicators
-        debt_terms = ['dívida', 'débito', 'pendência', 'inadimpl', 'mora', 'atraso']
-        features.debt_indicators = sum(text.lower().count(term) for term in debt_terms)
+        features.debt_indicators = keyword_counts['debt_terms']
         
         # Payment terms
-        payment_terms = ['parcelado', 'à vista', 'financiamento', 'prestação', 'entrada']
-        features.payment_terms = sum(text.lower().count(term) for term in payment_terms)
+        features.payment_terms = keyword_counts['payment_terms']
         
         return features
     
-    def _extract_structure_features(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
+    def _extract_structure_features(self, features: EnhancedFeatureSet, text: str,
+                                    active_patterns: Optional[set] = None) -> EnhancedFeatureSet:
         """Analyze document structure"""
         
         # Check for header/footer patterns
         lines = text.split('\n')
         if lines:
             # Header detection (first few lines)
-            header_indicators = ['tribunal', 'vara', 'edital', 'poder judiciário']
-            features.has_header = any(indicator in lines[0].lower() for indicator in header_indicators)
+            first_line = lines[0].lower()
+            features.has_header = any(indicator in first_line for indicator in _HEADER_INDICATORS)
             
             # Footer detection (last few lines)
-            footer_indicators = ['página', 'folha', 'assinatura', 'cartório']
-            features.has_footer = any(indicator in lines[-1].lower() for indicator in footer_indicators)
+            last_line = lines[-1].lower()
+            features.has_footer = any(indicator in last_line for indicator in _FOOTER_INDICATORS)
         
-        # Table detection
-        table_indicators = ['┌', '┐', '└', '┘', '├', '┤', '|', '+---', '===']
-        features.has_tables = any(indicator in text for indicator in table_indicators)
+        # Table detection (single scan for any box-drawing/ASCII table marker)
+        features.has_tables = _TABLE_RE.search(text) is not None
         
         # Paragraph structure assessment
-        paragraphs = [p for p in text.split('\n\n') if p.strip()]
-        if paragraphs:
-            avg_paragraph_length = sum(len(p.split()) for p in paragraphs) / len(paragraphs)
+        # '\n\n' never splits a word, so the page word count covers all paragraphs
+        paragraph_count = sum(1 for p in text.split('\n\n') if p and not p.isspace())
+        if paragraph_count:
+            avg_paragraph_length = features.word_count / paragraph_count
             # Good structure: paragraphs between 20-100 words
             features.paragraph_structure_score = max(0, min(100, 
                 100 - abs(avg_paragraph_length - 60) * 2))
         
         # Section organization (headers, numbering)
-        section_patterns = [
-            r'\d+\.\s+[A-Z]',  # 1. SECTION
-            r'[A-Z]+\s*-\s*[A-Z]',  # SECTION - TITLE
-            r'\n[A-Z\s]{5,}\n'  # ALL CAPS HEADERS
-        ]
-        section_count = sum(len(re.findall(pattern, text)) for pattern in section_patterns)
+        section_count = self._count_matches(self._section_res, text, active_patterns)
         features.section_organization_score = min(100, section_count * 20)
         
         return features
     
-    def _extract_tfidf_features(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
+    def _extract_tfidf_features(self, features: EnhancedFeatureSet, text_lower: str) -> EnhancedFeatureSet:
         """Extract TF-IDF features for legal domain"""
         try:
-            # Transform text to TF-IDF vector
-            tfidf_vector = self.tfidf_vectorizer.fit_transform([text])
+            # Term frequencies restricted to the legal vocabulary
+            vocabulary = self.legal_vocabulary
+            indices = [vocabulary[token] for token in _TOKEN_RE.findall(text_lower) if token in vocabulary]
+            tf = np.bincount(indices, minlength=len(vocabulary)).astype(np.float32)
+            
+            # L2-normalized like sklearn's TfidfVectorizer output
+            vector_array = tf * self.idf
+            norm = np.linalg.norm(vector_array)
+            if norm > 0:
+                vector_array /= norm
+            
+            # Legal terms score (first 1/3 of vocabulary)
+            legal_end = len(vocabulary) // 3
+            features.legal_tfidf_score = float(vector_array[:legal_end].sum())
+            
+            # Financial terms score (middle 1/3)
+            financial_start = legal_end
+            financial_end = 2 * legal_end
+            features.financial_tfidf_score = float(vector_array[financial_start:financial_end].sum())
+            
+            # Procedural terms score (last 1/3)
+            features.procedural_tfidf_score = float(vector_array[financial_end:].sum())
             
-            if tfidf_vector.shape[1] > 0:
-                # Calculate domain-specific TF-IDF scores
-                vector_array = tfidf_vector.toarray()[0]
-                
-                # Legal terms score (first 1/3 of vocabulary)
-                legal_end = len(self.legal_vocabulary) // 3
-                features.legal_tfidf_score = float(np.sum(vector_array[:legal_end]))
-                
-                # Financial terms score (middle 1/3)
-                financial_start = legal_end
-                financial_end = 2 * legal_end
-                features.financial_tfidf_score = float(np.sum(vector_array[financial_start:financial_end]))
-                
-                # Procedural terms score (last 1/3)
-                features.procedural_tfidf_score = float(np.sum(vector_array[financial_end:]))
-                
         except Exception as e:
             logger.warning(f"TF-IDF extraction failed: {e}")
             
         return features
     
-    def _extract_ngram_features(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
+    def _extract_ngram_features(self, features: EnhancedFeatureSet, keyword_counts: Dict[str, int]) -> EnhancedFeatureSet:
         """Extract n-gram features for legal phrases"""
-        text_lower = text.lower()
         
         # Count legal bigrams
-        features.legal_bigrams = sum(
-            text_lower.count(bigram) for bigram in self.legal_ngrams['bigrams']
-        )
+        features.legal_bigrams = keyword_counts['bigrams']
         
         # Count legal trigrams
-        features.legal_trigrams = sum(
-            text_lower.count(trigram) for trigram in self.legal_ngrams['trigrams']
-        )
+        features.legal_trigrams = keyword_counts['trigrams']
         
         # Count judicial phrases
-        features.judicial_phrases = sum(
-            text_lower.count(phrase) for phrase in self.legal_ngrams['judicial_phrases']
-        )
+        features.judicial_phrases = keyword_counts['judicial_phrases']
         
         return features
     
-    def _extract_risk_features(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
+    def _extract_risk_features(self, features: EnhancedFeatureSet, keyword_counts: Dict[str, int]) -> EnhancedFeatureSet:
         """Extract risk assessment features"""
-        text_lower = text.lower()
         
         # Count risk patterns
-        features.high_risk_patterns = sum(
-            text_lower.count(pattern) for pattern in self.risk_patterns['high_risk']
-        )
-        
-        features.medium_risk_patterns = sum(
-            text_lower.count(pattern) for pattern in self.risk_patterns['medium_risk']
-        )
-        
-        features.low_risk_patterns = sum(
-            text_lower.count(pattern) for pattern in self.risk_patterns['low_risk']
-        )
-        
-        features.risk_mitigation_mentions = sum(
-            text_lower.count(pattern) for pattern in self.risk_patterns['mitigation']
-        )
+        features.high_risk_patterns = keyword_counts['high_risk']
+        features.medium_risk_patterns = keyword_counts['medium_risk']
+        features.low_risk_patterns = keyword_counts['low_risk']
+        features.risk_mitigation_mentions = keyword_counts['mitigation']
         
         return features
     
-    def _assess_document_quality(self, features: EnhancedFeatureSet, text: str) -> EnhancedFeatureSet:
+    def _assess_document_quality(self, features: EnhancedFeatureSet, text: str,
+                                 active_patterns: Optional[set] = None) -> EnhancedFeatureSet:
         """Assess overall document quality"""
         
         # Completeness score (based on essential information presence)
-        essential_patterns = [
-            r'R\$\s*\d+',  # Financial amounts
-            r'\d{7}-\d{2}\.\d{4}',  # Process numbers
-            r'leilão|hasta|arrematação',  # Auction terms
-            r'imóvel|propriedade|terreno',  # Property terms
-        ]
-        
-        found_patterns = sum(1 for pattern in essential_patterns 
-                           if re.search(pattern, text, re.IGNORECASE))
-        features.completeness_score = (found_patterns / len(essential_patterns)) * 100
+        if active_patterns is not None:
+            found_patterns = sum(1 for pattern in self._essential_res if pattern in active_patterns)
+        else:
+            found_patterns = sum(1 for pattern in self._essential_res if pattern.search(text))
+        features.completeness_score = (found_patterns / len(self._essential_res)) * 100
         
         # Clarity score (based on readability and structure)
         clarity_factors = [
@@ -586,68 +934,34 @@ class EnhancedFeatureExtractor:
     
     def _calculate_derived_features(self, features: EnhancedFeatureSet) -> EnhancedFeatureSet:
         """Calculate derived intelligence features"""
-        
-        # Investment attractiveness score
-        positive_factors = [
-            features.currency_mentions > 0,  # Has financial info
-            features.low_risk_patterns > features.high_risk_patterns,  # More positive than negative
-            features.completeness_score > 70,  # Complete information
-            features.legal_bigrams > 2,  # Proper legal terminology
-        ]
-        
-        negative_factors = [
-            features.high_risk_patterns > 2,  # Many risk indicators
-            features.debt_indicators > 3,  # Many debt mentions
-            features.completeness_score < 50,  # Incomplete information
-        ]
-        
-        attractiveness = sum(positive_factors) * 25 - sum(negative_factors) * 15
-        features.investment_attractiveness = max(0, min(100, attractiveness))
-        
-        # Legal complexity score
-        complexity_indicators = [
-            features.cpc_references,
-            features.lei_references, 
-            features.legal_trigrams,
-            features.court_references
-        ]
-        features.legal_complexity_score = min(100, sum(complexity_indicators) * 5)
-        
-        # Processing difficulty score
-        difficulty_factors = [
-            features.completeness_score < 60,  # Incomplete info
-            features.clarity_score < 50,  # Poor clarity
-            features.high_risk_patterns > 1,  # Risk factors present
-            features.information_density < 5,  # Low information density
-        ]
-        features.processing_difficulty = sum(difficulty_factors) * 25
-        
-        # Urgency score (based on deadlines and temporal references)
-        urgency_factors = [
-            features.deadline_mentions * 20,
-            min(30, features.temporal_references * 10)
-        ]
-        features.urgency_score = min(100, sum(urgency_factors))
-        
-        # Extraction confidence (based on quality indicators)
-        confidence_factors = [
-            features.completeness_score * 0.4,
-            features.clarity_score * 0.3,
-            features.information_density * 2,  # Scale to 0-100
-            min(100, features.legal_bigrams * 10)
-        ]
-        features.extraction_confidence = min(100, sum(confidence_factors) / len(confidence_factors))
+        (
+            features.investment_attractiveness,
+            features.legal_complexity_score,
+            features.processing_difficulty,
+            features.urgency_score,
+            features.extraction_confidence,
+        ) = _derive_scores(
+            float(features.currency_mentions), float(features.low_risk_patterns),
+            float(features.high_risk_patterns), float(features.completeness_score),
+            float(features.legal_bigrams), float(features.debt_indicators),
+            float(features.cpc_references), float(features.lei_references),
+            float(features.legal_trigrams), float(features.court_references),
+            float(features.clarity_score), float(features.information_density),
+            float(features.deadline_mentions), float(features.temporal_references)
+        )
         
         return features
     
     def features_to_dict(self, features: EnhancedFeatureSet) -> Dict[str, Any]:
         """Convert features to dictionary for ML model input"""
-        return asdict(features)
+        return {name: getattr(features, name) for name in _FIELDS}
     
     def get_feature_importance_names(self) -> List[str]:
         """Get list of feature names for model training"""
-        sample_features = EnhancedFeatureSet(job_id="sample")
-        return list(asdict(sample_features).keys())
+        return list(_FIELDS)
 
-# Global instance for easy import
-enhanced_feature_extractor = EnhancedFeatureExtractor()
\ No newline at end of file
+# Shared instance, built on first use (importing the module stays cheap)
+@lru_cache()
+def get_enhanced_feature_extractor() -> EnhancedFeatureExtractor:
+    """Get the shared enhanced feature extractor instance"""
+    return EnhancedFeatureExtractor()
\ No newline at end of file
@@ -3,56 +3,141 @@ Enhanced ML Processor - Integration Layer
 Integrates enhanced features with existing ML pipeline for improved predictions
 """
 
+import hashlib
+import importlib.util
 import logging
 import numpy as np
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
-import json
+from dataclasses import fields, replace
+from functools import lru_cache
 
 # Import existing components
 from .feature_engineering import FeatureEngineer, FeatureSet
-from .enhanced_features import EnhancedFeatureExtractor, EnhancedFeatureSet
+from .enhanced_features import EnhancedFeatureSet, get_enhanced_feature_extractor
 from .lead_scoring_models import ModelPrediction
+from ._score_kernel import (
+    IDX_CLARITY, IDX_COMPLETENESS, IDX_CONFIDENCE, IDX_CPC, IDX_CURRENCY, IDX_DEADLINES, IDX_DEBT,
+    IDX_DENSITY, IDX_HIGH_RISK, IDX_LEGAL_BIGRAMS, IDX_LOW_RISK, IDX_MAX_AMOUNT, IDX_MEDIUM_RISK,
+    score_batch, score_kernel, score_vector
+)
 
-try:
-    from sklearn.ensemble import RandomForestClassifier
-    from sklearn.preprocessing import StandardScaler
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+# sklearn is only probed here; importing it is slow and nothing on the processing path uses it
+SKLEARN_AVAILABLE = importlib.util.find_spec("sklearn") is not None
 
 logger = logging.getLogger(__name__)
 
+# FeatureSet is a flat dataclass: a field-name tuple is enough to serialize it
+_FEATURE_SET_FIELDS = tuple(field.name for field in fields(FeatureSet))
+
+# Key prediction factors: (rule over the scoring vector, message), in report order
+_PREDICTION_FACTOR_RULES = (
+    # Positive factors
+    (lambda ev: ev[IDX_CURRENCY] > 2, "Múltiplas informações financeiras disponíveis"),
+    (lambda ev: ev[IDX_LEGAL_BIGRAMS] > 3, "Terminologia legal apropriada"),
+    (lambda ev: ev[IDX_LOW_RISK] > ev[IDX_HIGH_RISK], "Indicadores de baixo risco"),
+    (lambda ev: ev[IDX_COMPLETENESS] > 80, "Documento completo e bem estruturado"),
+    
+    # Negative factors
+    (lambda ev: ev[IDX_HIGH_RISK] > 2, "Múltiplos indicadores de risco identificados"),
+    (lambda ev: ev[IDX_DEBT] > 4, "Muitas menções de dívidas ou débitos"),
+    (lambda ev: ev[IDX_COMPLETENESS] < 50, "Documento incompleto ou mal estruturado"),
+)
+
+# Insight rule bits (see EnhancedMLProcessor._insight_flags)
+_FLAG_FINANCIAL = 1 << 0
+_FLAG_RISK = 1 << 1
+_FLAG_DEADLINE = 1 << 2
+_FLAG_LOW_COMPLETENESS = 1 << 3
+_FLAG_FEW_LEGAL_REFS = 1 << 4
+
+# Bound message formatters for the insights whose text depends on the features
+_DEADLINE_MSG = "Documento menciona {} prazo(s) - atenção aos vencimentos".format
+_COMPLETENESS_MSG = "Qualidade documental baixa ({:.1f}%) - resultados podem ser imprecisos".format
+_HIGH_RISK_MSG = "Múltiplos indicadores de risco ({}) - análise cuidadosa necessária".format
+
+# Insight templates (copied per document; 'message' is filled in where it depends on the features)
+_DEADLINE_INSIGHT = {'type': 'temporal', 'category': 'deadline', 'message': None,
+                     'priority': 'medium', 'action_required': True}
+_COMPLETENESS_INSIGHT = {'type': 'quality', 'category': 'completeness', 'message': None,
+                         'priority': 'high', 'action_required': True}
+_COMPLIANCE_INSIGHT = {'type': 'legal', 'category': 'compliance',
+                       'message': "Poucas referências legais encontradas - verifique conformidade processual",
+                       'priority': 'medium', 'action_required': True}
+_HIGH_DEBT_RATIO_INSIGHT = {'type': 'financial', 'category': 'debt_ratio',
+                            'message': "Alta proporção de menções de dívida - possível alto endividamento",
+                            'priority': 'high', 'action_required': True, 'confidence': 0.6}
+_LOW_DEBT_RATIO_INSIGHT = {'type': 'financial', 'category': 'debt_ratio',
+                           'message': "Baixa proporção de menções de dívida - situação financeira aparentemente positiva",
+                           'priority': 'low', 'action_required': False, 'confidence': 0.7}
+_HIGH_RISK_INSIGHT = {'type': 'risk', 'category': 'high_risk', 'message': None,
+                      'priority': 'high', 'action_required': True, 'confidence': 0.8}
+_LOW_RISK_INSIGHT = {'type': 'risk', 'category': 'low_risk',
+                     'message': "Múltiplos indicadores positivos - baixo perfil de risco",
+                     'priority': 'low', 'action_required': False, 'confidence': 0.75}
+
+# Analysis quality levels: overall score thresholds (>=) and (level, base recommendation)
+_QUALITY_LEVEL_THRESHOLDS = (40, 60, 80)
+_QUALITY_LEVELS = (
+    ("Baixa", "Recomenda-se nova análise com melhor qualidade documental"),
+    ("Regular", "Considere obter informações adicionais"),
+    ("Boa", "Análise adequada para decisão"),
+    ("Excelente", "Análise completa e confiável"),
+)
+
+def _document_text(text_analysis: Dict[str, Any]) -> str:
+    """Text to analyse: cleaned text, or the original text when there is none"""
+    return text_analysis.get('cleaned_text') or text_analysis.get('original_text', '')
+
 class EnhancedMLProcessor:
     """
     Enhanced ML processor that combines original and enhanced features
     for better predictions while maintaining backward compatibility
     """
     
+    __slots__ = ('original_engineer', 'enhanced_extractor', 'models', 'scalers', 'feature_weights',
+                 '_initialization_time', '_feature_cache', '_feature_cache_lock')
+    
+    # Weights for different feature categories based on domain knowledge
+    FEATURE_WEIGHTS = {
+        # Enhanced features (higher weights for proven valuable features)
+        'financial_features': 0.25,      # Financial info is crucial
+        'legal_compliance': 0.20,        # Legal aspects are critical
+        'risk_assessment': 0.20,         # Risk evaluation is key
+        'document_quality': 0.15,        # Quality affects reliability
+        'temporal_urgency': 0.10,        # Timing matters
+        'structural_analysis': 0.10      # Document structure indicates quality
+    }
+    
+    # Analysis quality breakdown: metric names and weights of the overall score
+    QUALITY_METRICS = ('completeness', 'clarity', 'information_density', 'extraction_confidence')
+    QUALITY_WEIGHTS = np.array([0.3, 0.25, 0.25, 0.2])
+    
+    # Enhanced-feature cache (texts shorter than the minimum are not worth hashing)
+    FEATURE_CACHE_SIZE = 4096
+    FEATURE_CACHE_MIN_TEXT = 512
+    
     def __init__(self):
         """Initialize with both original and enhanced feature extractors"""
         self.original_engineer = FeatureEngineer()
-        self.enhanced_extractor = EnhancedFeatureExtractor()
+        self.enhanced_extractor = get_enhanced_feature_extractor()
         
         # Initialize improved models
         self.models = {}
         self.scalers = {}
-        self.feature_weights = self._calculate_feature_weights()
+        self.feature_weights = self.FEATURE_WEIGHTS
+        self._initialization_time = datetime.now().isoformat()
+        
+        # Enhanced features of recently seen page texts (repeated boilerplate pages)
+        self._feature_cache = OrderedDict()
+        self._feature_cache_lock = threading.Lock()
         
         logger.info("Enhanced ML Processor initialized")
     
-    def _calculate_feature_weights(self) -> Dict[str, float]:
-        """Calculate weights for different feature categories based on domain knowledge"""
-        return {
-            # Enhanced features (higher weights for proven valuable features)
-            'financial_features': 0.25,      # Financial info is crucial
-            'legal_compliance': 0.20,        # Legal aspects are critical
-            'risk_assessment': 0.20,         # Risk evaluation is key
-            'document_quality': 0.15,        # Quality affects reliability
-            'temporal_urgency': 0.10,        # Timing matters
-            'structural_analysis': 0.10      # Document structure indicates quality
-        }
-    
     def process_document_enhanced(self, 
                                 text_analysis: Dict[str, Any],
                                 job_metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -66,11 +151,11 @@ class EnhancedMLProcessor:
         Returns:
             Enhanced analysis results with improved predictions
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             # Extract text for processing
-            text = text_analysis.get('cleaned_text', text_analysis.get('original_text', ''))
+            text = _document_text(text_analysis)
             job_id = text_analysis.get('job_id', '')
             
             # 1. Extract original features (maintain compatibility)
@@ -80,83 +165,212 @@ class EnhancedMLProcessor:
             )
             
             # 2. Extract enhanced features
-            enhanced_features = self.enhanced_extractor.extract_enhanced_features(
-                text, 
-                job_id=job_id
-            )
-            
-            # 3. Combine features intelligently
-            combined_prediction = self._combine_predictions(original_features, enhanced_features)
-            
-            # 4. Generate insights and recommendations
-            insights = self._generate_intelligent_insights(enhanced_features, combined_prediction)
-            
-            # 5. Assess quality and confidence
-            quality_assessment = self._assess_analysis_quality(enhanced_features, text_analysis)
+            enhanced_features = self._extract_enhanced_features(text, job_id)
             
-            # 6. Calculate processing metrics
-            processing_time = (datetime.now() - start_time).total_seconds()
+            # Shared feature vector for scoring, insights and quality assessment
+            ev = score_vector(enhanced_features)
             
-            # Build enhanced result
-            enhanced_result = {
-                # Original compatibility
-                'lead_score': combined_prediction['lead_score'],
-                'confidence': combined_prediction['confidence'],
-                'classification': combined_prediction['classification'],
-                
-                # Enhanced information
-                'enhanced_features': self.enhanced_extractor.features_to_dict(enhanced_features),
-                'original_features': self._features_to_dict(original_features),
-                'combined_prediction': combined_prediction,
-                'quality_assessment': quality_assessment,
-                'intelligent_insights': insights,
-                
-                # Metadata
-                'processing_metadata': {
-                    'enhanced_processing_time': processing_time,
-                    'total_features_extracted': len(self.enhanced_extractor.features_to_dict(enhanced_features)),
-                    'enhancement_version': '1.0',
-                    'processing_timestamp': datetime.now().isoformat()
-                }
-            }
-            
-            logger.info(f"Enhanced processing completed for {job_id}: "
-                       f"score={combined_prediction['lead_score']:.2f}, "
-                       f"quality={quality_assessment['overall_score']:.1f}")
+            # 3. Combine features intelligently
+            combined_prediction = self._combine_predictions(original_features, ev)
             
-            return enhanced_result
+            # 4-6. Insights, quality assessment and result assembly
+            return self._build_enhanced_result(
+                text_analysis, original_features, enhanced_features, ev, combined_prediction, start_time
+            )
             
         except Exception as e:
             logger.error(f"Error in enhanced ML processing: {e}")
             # Fallback to original processing
             return self._fallback_processing(text_analysis, job_metadata)
     
+    def process_documents_batch(self, 
+                                text_analyses: List[Dict[str, Any]],
+                                job_metadata: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Process many documents (e.g. all pages of a job) with one vectorized scoring pass
+        
+        Features are extracted per document; enhanced scores, confidences, weights
+        and classifications are then computed as NumPy array operations over all
+        documents at once.
+        
+        Args:
+            text_analyses: Original text analysis results, one per document
+            job_metadata: Optional job metadata (shared by all documents)
+            
+        Returns:
+            Enhanced analysis results, in the same order as text_analyses
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(text_analyses)
+        documents = []
+        
+        # 1-2. Extract original and enhanced features per document
+        for index, text_analysis in enumerate(text_analyses):
+            start_time = time.perf_counter()
+            try:
+                text = _document_text(text_analysis)
+                original_features = self.original_engineer.extract_features(
+                    text_analysis, 
+                    job_metadata=job_metadata
+                )
+                enhanced_features = self._extract_enhanced_features(text, text_analysis.get('job_id', ''))
+                documents.append((index, text_analysis, original_features, enhanced_features, start_time))
+            except Exception as e:
+                logger.error(f"Error in enhanced ML processing: {e}")
+                results[index] = self._fallback_processing(text_analysis, job_metadata)
+        
+        if not documents:
+            return results
+        
+        # 3. Score every document at once
+        feature_matrix = np.stack([score_vector(enhanced) for _, _, _, enhanced, _ in documents])
+        original_scores = np.array(
+            [original.original_lead_score for _, _, original, _, _ in documents], dtype=np.float64
+        )
+        enhanced_scores, confidences = score_batch(feature_matrix, original_scores)
+        
+        enhanced_weights = np.where(feature_matrix[:, IDX_CONFIDENCE] > 70, 0.7, 0.4)
+        combined_scores = enhanced_scores * enhanced_weights + original_scores * (1.0 - enhanced_weights)
+        classifications = np.where(combined_scores >= 75, 'high',
+                                   np.where(combined_scores >= 50, 'medium', 'low'))
+        
+        # 4-6. Insights, quality assessment and result assembly per document
+        for (index, text_analysis, original_features, enhanced_features, start_time), ev, \
+                original_score, enhanced_score, confidence, combined_score, enhanced_weight, classification in zip(
+                    documents, feature_matrix, original_scores.tolist(), enhanced_scores.tolist(),
+                    confidences.tolist(), combined_scores.tolist(), enhanced_weights.tolist(),
+                    classifications.tolist()):
+            try:
+                combined_prediction = self._build_prediction(
+                    ev, original_score, enhanced_score, confidence,
+                    combined_score, enhanced_weight, classification
+                )
+                results[index] = self._build_enhanced_result(
+                    text_analysis, original_features, enhanced_features, ev, combined_prediction, start_time
+                )
+            except Exception as e:
+                logger.error(f"Error in enhanced ML processing: {e}")
+                results[index] = self._fallback_processing(text_analysis, job_metadata)
+        
+        return results
+    
+    def _extract_enhanced_features(self, text: str, job_id: str) -> EnhancedFeatureSet:
+        """
+        Extract enhanced features, reusing the result for texts already seen
+        
+        Legal PDFs repeat whole pages (cover, index, signatures); those are keyed
+        by a blake2b digest of the text and only extracted once. Short texts are
+        cheap to extract and are never cached.
+        """
+        if len(text) < self.FEATURE_CACHE_MIN_TEXT:
+            return self.enhanced_extractor.extract_enhanced_features(text, job_id=job_id)
+        
+        text_hash = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        with self._feature_cache_lock:
+            cached = self._feature_cache.get(text_hash)
+            if cached is not None:
+                self._feature_cache.move_to_end(text_hash)
+        if cached is not None:
+            return replace(cached, job_id=job_id, created_at=datetime.now().isoformat())
+        
+        features = self.enhanced_extractor.extract_enhanced_features(text, job_id=job_id)
+        with self._feature_cache_lock:
+            self._feature_cache[text_hash] = features
+            if len(self._feature_cache) > self.FEATURE_CACHE_SIZE:
+                self._feature_cache.popitem(last=False)
+        return features
+    
+    def _build_enhanced_result(self, 
+                               text_analysis: Dict[str, Any],
+                               original_features: FeatureSet,
+                               enhanced_features: EnhancedFeatureSet,
+                               ev: np.ndarray,
+                               combined_prediction: Dict[str, Any],
+                               start_time: float) -> Dict[str, Any]:
+        """
+        Generate insights and quality assessment and assemble the enhanced result
+
+        The result stays a plain dict: the integration layer update()s it in place
+        and the API serializes every key, so no field can be deferred.
+        """
+        job_id = text_analysis.get('job_id', '')
+        
+        # 4. Generate insights and recommendations
+        insights = self._generate_intelligent_insights(ev, combined_prediction)
+        
+        # 5. Assess quality and confidence
+        quality_assessment = self._assess_analysis_quality(ev, text_analysis)
+        
+        # 6. Calculate processing metrics
+        processing_time = time.perf_counter() - start_time
+        
+        enhanced_dict = self.enhanced_extractor.features_to_dict(enhanced_features)
+        
+        # Build enhanced result
+        enhanced_result = {
+            # Original compatibility
+            'lead_score': combined_prediction['lead_score'],
+            'confidence': combined_prediction['confidence'],
+            'classification': combined_prediction['classification'],
+            
+            # Enhanced information
+            'enhanced_features': enhanced_dict,
+            'original_features': self._features_to_dict(original_features),
+            'combined_prediction': combined_prediction,
+            'quality_assessment': quality_assessment,
+            'intelligent_insights': insights,
+            
+            # Metadata
+            'processing_metadata': {
+                'enhanced_processing_time': processing_time,
+                'total_features_extracted': len(enhanced_dict),
+                'enhancement_version': '1.0',
+                'processing_timestamp': datetime.now().isoformat()
+            }
+        }
+        
+        logger.info(f"Enhanced processing completed for {job_id}: "
+                   f"score={combined_prediction['lead_score']:.2f}, "
+                   f"quality={quality_assessment['overall_score']:.1f}")
+        
+        return enhanced_result
+    
     def _combine_predictions(self, 
                            original_features: FeatureSet, 
-                           enhanced_features: EnhancedFeatureSet) -> Dict[str, Any]:
+                           ev: np.ndarray) -> Dict[str, Any]:
         """Intelligently combine original and enhanced predictions"""
         
         # Extract key metrics from both feature sets
         original_score = original_features.original_lead_score
         
-        # Calculate enhanced score using domain-specific rules
-        enhanced_score = self._calculate_enhanced_score(enhanced_features)
+        # Enhanced score (domain-specific rules) and confidence (consistency and
+        # feature quality) in one native pass over the scoring vector
+        enhanced_score, confidence = score_kernel(ev, float(original_score))
+        enhanced_score, confidence = float(enhanced_score), float(confidence)  # plain floats for round()
         
         # Weighted combination (favor enhanced features if confidence is high)
-        enhanced_weight = 0.7 if enhanced_features.extraction_confidence > 70 else 0.4
+        enhanced_weight = 0.7 if ev[IDX_CONFIDENCE] > 70 else 0.4
         original_weight = 1.0 - enhanced_weight
         
         combined_score = (enhanced_score * enhanced_weight + 
                          original_score * original_weight)
         
-        # Calculate confidence based on consistency and feature quality
-        confidence = self._calculate_prediction_confidence(
-            original_features, enhanced_features, original_score, enhanced_score
-        )
-        
         # Determine classification
         classification = self._classify_lead_score(combined_score)
         
+        return self._build_prediction(
+            ev, original_score, enhanced_score, confidence,
+            combined_score, enhanced_weight, classification
+        )
+    
+    def _build_prediction(self, 
+                          ev: np.ndarray,
+                          original_score: float,
+                          enhanced_score: float,
+                          confidence: float,
+                          combined_score: float,
+                          enhanced_weight: float,
+                          classification: str) -> Dict[str, Any]:
+        """Assemble the combined prediction from already computed scores"""
         return {
             'lead_score': round(combined_score, 2),
             'confidence': round(confidence, 2),
@@ -164,82 +378,12 @@ class EnhancedMLProcessor:
             'score_breakdown': {
                 'original_score': round(original_score, 2),
                 'enhanced_score': round(enhanced_score, 2),
-                'original_weight': original_weight,
+                'original_weight': 1.0 - enhanced_weight,
                 'enhanced_weight': enhanced_weight
             },
-            'prediction_factors': self._identify_prediction_factors(enhanced_features)
+            'prediction_factors': self._identify_prediction_factors(ev)
         }
     
-    def _calculate_enhanced_score(self, features: EnhancedFeatureSet) -> float:
-        """Calculate enhanced lead score using improved algorithm"""
-        
-        score_components = {}
-        
-        # Financial attractiveness (0-30 points)
-        financial_score = 0
-        if features.currency_mentions > 0:
-            financial_score += 10
-        if features.max_amount > 100000:  # High-value property
-            financial_score += 10
-        if features.debt_indicators < 3:  # Low debt concerns
-            financial_score += 10
-        score_components['financial'] = min(30, financial_score)
-        
-        # Legal quality (0-25 points) 
-        legal_score = 0
-        legal_score += min(15, features.legal_bigrams * 3)  # Proper legal terminology
-        legal_score += min(10, features.cpc_references * 5)  # Legal references
-        if features.high_risk_patterns == 0:  # No high risk indicators
-            legal_score += 5
-        score_components['legal'] = min(25, legal_score)
-        
-        # Document quality (0-20 points)
-        quality_score = features.completeness_score * 0.15 + features.clarity_score * 0.05
-        score_components['quality'] = min(20, quality_score)
-        
-        # Investment opportunity (0-15 points)
-        opportunity_score = features.investment_attractiveness * 0.15
-        score_components['opportunity'] = min(15, opportunity_score)
-        
-        # Risk mitigation (0-10 points)
-        risk_score = 10
-        risk_score -= features.high_risk_patterns * 3
-        risk_score += features.risk_mitigation_mentions * 2
-        score_components['risk'] = max(0, min(10, risk_score))
-        
-        # Total score
-        total_score = sum(score_components.values())
-        
-        return min(100, total_score)
-    
-    def _calculate_prediction_confidence(self, 
-                                       original_features: FeatureSet,
-                                       enhanced_features: EnhancedFeatureSet,
-                                       original_score: float,
-                                       enhanced_score: float) -> float:
-        """Calculate confidence in the prediction"""
-        
-        confidence_factors = []
-        
-        # Score consistency (how close are original and enhanced scores?)
-        score_diff = abs(original_score - enhanced_score)
-        consistency_score = max(0, 100 - score_diff * 2)  # Penalty for large differences
-        confidence_factors.append(consistency_score * 0.3)
-        
-        # Feature quality
-        feature_quality = enhanced_features.extraction_confidence
-        confidence_factors.append(feature_quality * 0.3)
-        
-        # Document completeness
-        completeness = enhanced_features.completeness_score
-        confidence_factors.append(completeness * 0.2)
-        
-        # Information density (more information = higher confidence)
-        density_score = min(100, enhanced_features.information_density * 10)
-        confidence_factors.append(density_score * 0.2)
-        
-        return sum(confidence_factors)
-    
     def _classify_lead_score(self, score: float) -> str:
         """Classify lead score into categories"""
         if score >= 75:
@@ -249,183 +393,124 @@ class EnhancedMLProcessor:
         else:
             return 'low'
     
-    def _identify_prediction_factors(self, features: EnhancedFeatureSet) -> List[str]:
+    def _identify_prediction_factors(self, ev: np.ndarray) -> List[str]:
         """Identify key factors influencing the prediction"""
-        factors = []
-        
-        # Positive factors
-        if features.currency_mentions > 2:
-            factors.append("Múltiplas informações financeiras disponíveis")
-        
-        if features.legal_bigrams > 3:
-            factors.append("Terminologia legal apropriada")
-        
-        if features.low_risk_patterns > features.high_risk_patterns:
-            factors.append("Indicadores de baixo risco")
-        
-        if features.completeness_score > 80:
-            factors.append("Documento completo e bem estruturado")
-        
-        # Negative factors
-        if features.high_risk_patterns > 2:
-            factors.append("Múltiplos indicadores de risco identificados")
-        
-        if features.debt_indicators > 4:
-            factors.append("Muitas menções de dívidas ou débitos")
-        
-        if features.completeness_score < 50:
-            factors.append("Documento incompleto ou mal estruturado")
-        
-        return factors
+        return [message for applies, message in _PREDICTION_FACTOR_RULES if applies(ev)]
     
     def _generate_intelligent_insights(self, 
-                                     features: EnhancedFeatureSet, 
+                                     ev: np.ndarray, 
                                      prediction: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate intelligent insights based on analysis"""
+        flags = self._insight_flags(ev)
+        if not flags:
+            return []
+        
         insights = []
         
         # Financial insights
-        if features.max_amount > 0:
-            ratio_insight = self._analyze_financial_ratio(features)
+        if flags & _FLAG_FINANCIAL:
+            ratio_insight = self._analyze_financial_ratio(ev)
             if ratio_insight:
                 insights.append(ratio_insight)
         
         # Risk insights
-        risk_insight = self._analyze_risk_profile(features)
-        if risk_insight:
-            insights.append(risk_insight)
+        if flags & _FLAG_RISK:
+            risk_insight = self._analyze_risk_profile(ev)
+            if risk_insight:
+                insights.append(risk_insight)
         
         # Temporal insights
-        if features.deadline_mentions > 0:
-            temporal_insight = {
-                'type': 'temporal',
-                'category': 'deadline',
-                'message': f"Documento menciona {features.deadline_mentions} prazo(s) - atenção aos vencimentos",
-                'priority': 'medium',
-                'action_required': True
-            }
-            insights.append(temporal_insight)
+        if flags & _FLAG_DEADLINE:
+            insights.append({
+                **_DEADLINE_INSIGHT,
+                'message': _DEADLINE_MSG(int(ev[IDX_DEADLINES]))
+            })
         
         # Quality insights
-        if features.completeness_score < 60:
-            quality_insight = {
-                'type': 'quality',
-                'category': 'completeness',
-                'message': f"Qualidade documental baixa ({features.completeness_score:.1f}%) - resultados podem ser imprecisos",
-                'priority': 'high',
-                'action_required': True
-            }
-            insights.append(quality_insight)
+        if flags & _FLAG_LOW_COMPLETENESS:
+            insights.append({
+                **_COMPLETENESS_INSIGHT,
+                'message': _COMPLETENESS_MSG(ev[IDX_COMPLETENESS])
+            })
         
         # Legal insights
-        if features.cpc_references == 0 and features.legal_bigrams < 2:
-            legal_insight = {
-                'type': 'legal',
-                'category': 'compliance',
-                'message': "Poucas referências legais encontradas - verifique conformidade processual",
-                'priority': 'medium',
-                'action_required': True
-            }
-            insights.append(legal_insight)
+        if flags & _FLAG_FEW_LEGAL_REFS:
+            insights.append(dict(_COMPLIANCE_INSIGHT))
         
         return insights
     
-    def _analyze_financial_ratio(self, features: EnhancedFeatureSet) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _insight_flags(ev: np.ndarray) -> int:
+        """Bitmap of the insight rules that can fire for this scoring vector"""
+        total_risk_indicators = ev[IDX_HIGH_RISK] + ev[IDX_MEDIUM_RISK] * 0.5
+        return ((_FLAG_FINANCIAL if ev[IDX_MAX_AMOUNT] > 0 else 0) |
+                (_FLAG_RISK if total_risk_indicators > 3 or
+                 (ev[IDX_LOW_RISK] > 2 and total_risk_indicators == 0) else 0) |
+                (_FLAG_DEADLINE if ev[IDX_DEADLINES] > 0 else 0) |
+                (_FLAG_LOW_COMPLETENESS if ev[IDX_COMPLETENESS] < 60 else 0) |
+                (_FLAG_FEW_LEGAL_REFS if ev[IDX_CPC] == 0 and ev[IDX_LEGAL_BIGRAMS] < 2 else 0))
+    
+    def _analyze_financial_ratio(self, ev: np.ndarray) -> Optional[Dict[str, Any]]:
         """Analyze financial ratios and provide insights"""
-        if features.max_amount == 0:
+        if ev[IDX_MAX_AMOUNT] == 0:
             return None
         
         # Estimate debt-to-value ratio based on mentions
-        debt_ratio_estimate = features.debt_indicators / max(1, features.currency_mentions)
+        debt_ratio_estimate = ev[IDX_DEBT] / max(1, ev[IDX_CURRENCY])
         
         if debt_ratio_estimate > 0.5:
-            return {
-                'type': 'financial',
-                'category': 'debt_ratio',
-                'message': f"Alta proporção de menções de dívida - possível alto endividamento",
-                'priority': 'high',
-                'action_required': True,
-                'confidence': 0.6
-            }
+            return dict(_HIGH_DEBT_RATIO_INSIGHT)
         elif debt_ratio_estimate < 0.2:
-            return {
-                'type': 'financial',
-                'category': 'debt_ratio',
-                'message': f"Baixa proporção de menções de dívida - situação financeira aparentemente positiva",
-                'priority': 'low',
-                'action_required': False,
-                'confidence': 0.7
-            }
+            return dict(_LOW_DEBT_RATIO_INSIGHT)
         
         return None
     
-    def _analyze_risk_profile(self, features: EnhancedFeatureSet) -> Optional[Dict[str, Any]]:
+    def _analyze_risk_profile(self, ev: np.ndarray) -> Optional[Dict[str, Any]]:
         """Analyze risk profile and provide insights"""
-        total_risk_indicators = (features.high_risk_patterns + 
-                               features.medium_risk_patterns * 0.5)
+        total_risk_indicators = (ev[IDX_HIGH_RISK] + 
+                               ev[IDX_MEDIUM_RISK] * 0.5)
         
         if total_risk_indicators > 3:
             return {
-                'type': 'risk',
-                'category': 'high_risk',
-                'message': f"Múltiplos indicadores de risco ({int(total_risk_indicators)}) - análise cuidadosa necessária",
-                'priority': 'high',
-                'action_required': True,
-                'confidence': 0.8
-            }
-        elif features.low_risk_patterns > 2 and total_risk_indicators == 0:
-            return {
-                'type': 'risk',
-                'category': 'low_risk',
-                'message': f"Múltiplos indicadores positivos - baixo perfil de risco",
-                'priority': 'low',
-                'action_required': False,
-                'confidence': 0.75
+                **_HIGH_RISK_INSIGHT,
+                'message': _HIGH_RISK_MSG(int(total_risk_indicators))
             }
+        elif ev[IDX_LOW_RISK] > 2 and total_risk_indicators == 0:
+            return dict(_LOW_RISK_INSIGHT)
         
         return None
     
     def _assess_analysis_quality(self, 
-                               features: EnhancedFeatureSet, 
+                               ev: np.ndarray, 
                                text_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Assess the quality of the analysis"""
         
-        quality_scores = {
-            'completeness': features.completeness_score,
-            'clarity': features.clarity_score,
-            'information_density': min(100, features.information_density * 10),
-            'extraction_confidence': features.extraction_confidence
-        }
+        quality_scores = np.array([
+            ev[IDX_COMPLETENESS],
+            ev[IDX_CLARITY],
+            min(100, ev[IDX_DENSITY] * 10),
+            ev[IDX_CONFIDENCE]
+        ], dtype=np.float64)
         
         # Calculate weighted overall score
-        weights = {'completeness': 0.3, 'clarity': 0.25, 'information_density': 0.25, 'extraction_confidence': 0.2}
-        overall_score = sum(score * weights[metric] for metric, score in quality_scores.items())
-        
-        # Generate quality level
-        if overall_score >= 80:
-            quality_level = "Excelente"
-            recommendations = ["Análise completa e confiável"]
-        elif overall_score >= 60:
-            quality_level = "Boa"
-            recommendations = ["Análise adequada para decisão"]
-        elif overall_score >= 40:
-            quality_level = "Regular"
-            recommendations = ["Considere obter informações adicionais"]
-        else:
-            quality_level = "Baixa"
-            recommendations = ["Recomenda-se nova análise com melhor qualidade documental"]
+        overall_score = float(quality_scores @ self.QUALITY_WEIGHTS)
+        
+        # Generate quality level (a NaN score falls through to "Baixa", like the >= chain did)
+        level = bisect_right(_QUALITY_LEVEL_THRESHOLDS, overall_score) if overall_score == overall_score else 0
+        quality_level, recommendation = _QUALITY_LEVELS[level]
+        recommendations = [recommendation]
         
         # Add specific recommendations
-        if features.completeness_score < 70:
+        if ev[IDX_COMPLETENESS] < 70:
             recommendations.append("Documento incompleto - verifique informações essenciais")
         
-        if features.clarity_score < 60:
+        if ev[IDX_CLARITY] < 60:
             recommendations.append("Baixa clareza do texto - considere melhor qualidade de digitalização")
         
         return {
             'overall_score': round(overall_score, 1),
             'quality_level': quality_level,
-            'breakdown': {k: round(v, 1) for k, v in quality_scores.items()},
+            'breakdown': {metric: round(score, 1) for metric, score in zip(self.QUALITY_METRICS, quality_scores.tolist())},
             'recommendations': recommendations,
             'confidence_level': 'high' if overall_score >= 70 else 'medium' if overall_score >= 50 else 'low'
         }
@@ -468,18 +553,7 @@ class EnhancedMLProcessor:
     
     def _features_to_dict(self, features: FeatureSet) -> Dict[str, Any]:
         """Convert FeatureSet to dictionary"""
-        try:
-            return asdict(features)
-        except:
-            # Manual conversion if asdict fails
-            return {
-                'job_id': features.job_id,
-                'page_number': features.page_number,
-                'text_length': features.text_length,
-                'word_count': features.word_count,
-                'entity_count': features.entity_count,
-                'original_lead_score': features.original_lead_score
-            }
+        return {name: getattr(features, name) for name in _FEATURE_SET_FIELDS}
     
     def get_processing_stats(self) -> Dict[str, Any]:
         """Get processing statistics"""
@@ -488,8 +562,11 @@ class EnhancedMLProcessor:
             'original_engineer_ready': bool(self.original_engineer),
             'sklearn_available': SKLEARN_AVAILABLE,
             'feature_weights': self.feature_weights,
-            'initialization_time': datetime.now().isoformat()
+            'initialization_time': self._initialization_time
         }
 
-# Global instance for easy integration
-enhanced_ml_processor = EnhancedMLProcessor()
\ No newline at end of file
+# Shared instance, built on first use (importing the module stays cheap)
+@lru_cache()
+def get_enhanced_ml_processor() -> EnhancedMLProcessor:
+    """Get the shared Enhanced ML Processor instance"""
+    return EnhancedMLProcessor()
\ No newline at end of file
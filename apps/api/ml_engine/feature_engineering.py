@@ -6,9 +6,13 @@ Extração e engenharia de features para modelos de ML de lead scoring
 import logging
 import numpy as np
 import pandas as pd
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from operator import attrgetter
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 import json
 import re
 
@@ -96,6 +100,25 @@ class FeatureSet:
     created_at: str = ""
     processing_time: float = 0.0
 
+@lru_cache(maxsize=32)
+def _column_getters(columns: Tuple[str, ...]) -> Tuple[Tuple[int, Any], ...]:
+    """Acessores (índice, attrgetter) das colunas que existem no FeatureSet"""
+    known = {f.name for f in fields(FeatureSet)}
+    return tuple(
+        (j, attrgetter(column))
+        for j, column in enumerate(columns)
+        if column in known
+    )
+
+def json_float(value: Any, default: Optional[float] = None) -> Optional[float]:
+    """Valor de um campo JSON como float; null ou texto não numérico viram o default"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
 class FeatureEngineer:
     """Engine de engenharia de features para ML"""
     
@@ -481,6 +504,25 @@ class FeatureEngineer:
         logger.info(f"DataFrame criado: {df.shape[0]} linhas, {df.shape[1]} colunas")
         return df
     
+    def features_to_matrix(self, features_list: List[FeatureSet], columns: Tuple[str, ...]) -> np.ndarray:
+        """Converte lista de features direto para matriz float32 (linhas x columns), sem pandas
+        
+        Mesmos valores de features_to_dataframe + fillna(0) + reindex(columns, fill_value=0):
+        colunas ausentes, None, NaN e valores não numéricos viram 0.
+        """
+        X = np.zeros((len(features_list), len(columns)), dtype=np.float32)
+        getters = _column_getters(columns)
+        for i, features in enumerate(features_list):
+            row = X[i]
+            for j, getter in getters:
+                value = getter(features)
+                if value is not None and value == value:
+                    try:
+                        row[j] = value
+                    except (TypeError, ValueError):
+                        pass  # não numérico: 0, como pd.to_numeric(errors='coerce')
+        return X
+    
     def get_feature_importance_names(self) -> List[str]:
         """Retorna nomes das features para análise de importância"""
         return [
@@ -590,4 +632,75 @@ class FeatureEngineer:
         return features
 
 # Instância global do feature engineer
-feature_engineer = FeatureEngineer() 
\ No newline at end of file
+feature_engineer = FeatureEngineer()
+
+class FeatureMatrixCache:
+    """Cache LRU das matrizes de features (uma por população de FeatureSets)
+    
+    Reavaliar a mesma população (ex. reprocessamento noturno) reutiliza a matriz
+    densa em vez de percorrer os dataclasses de novo. A chave é (colunas,
+    (job_id, page_number, created_at) de cada linha); listas com alguma linha sem
+    created_at não identificam uma extração e não passam pelo cache.
+    
+    O cache é limitado pelo total de bytes das matrizes (max_bytes); matrizes
+    maiores que max_entry_bytes (lotes grandes, quase nunca reavaliados) não
+    são guardadas, para não expulsar todas as outras.
+    """
+    
+    def __init__(self, max_entries: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 max_entry_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._matrices: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+    
+    def get_matrix(self, features_list: List[FeatureSet], columns: Tuple[str, ...]) -> np.ndarray:
+        """Matriz float32 (linhas x columns) das features; tratar como somente leitura"""
+        if not all(features.created_at for features in features_list):
+            return feature_engineer.features_to_matrix(features_list, columns)
+        
+        # Lote grande demais para o cache: nem monta a chave
+        if len(features_list) * len(columns) * np.dtype(np.float32).itemsize > self.max_entry_bytes:
+            return feature_engineer.features_to_matrix(features_list, columns)
+        
+        key = (columns, tuple(
+            (features.job_id, features.page_number, features.created_at)
+            for features in features_list
+        ))
+        with self._lock:
+            X = self._matrices.get(key)
+            if X is not None:
+                self._matrices.move_to_end(key)
+                return X
+        
+        X = feature_engineer.features_to_matrix(features_list, columns)
+        X.flags.writeable = False
+        
+        with self._lock:
+            previous = self._matrices.pop(key, None)
+            if previous is not None:
+                self._nbytes -= previous.nbytes
+            self._matrices[key] = X
+            self._nbytes += X.nbytes
+            while self._matrices and (len(self._matrices) > self.max_entries or
+                                      self._nbytes > self.max_bytes):
+                _, evicted = self._matrices.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+        return X
+    
+    @property
+    def nbytes(self) -> int:
+        """Total de bytes das matrizes em cache"""
+        return self._nbytes
+    
+    def clear(self) -> None:
+        """Descarta todas as matrizes em cache"""
+        with self._lock:
+            self._matrices.clear()
+            self._nbytes = 0
+
+# Instância global do cache de matrizes de features
+feature_matrix_cache = FeatureMatrixCache() 
\ No newline at end of file
@@ -5,18 +5,105 @@ Pega feedback dos usuários e treina os modelos automaticamente
 
 import json
 import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Tuple
 import numpy as np
+import orjson
 from pathlib import Path
 
+from sqlalchemy import func
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 from database.models import Job, MLPrediction, TextAnalysis
 from database.connection import get_db
+from ml_engine.feature_engineering import json_float
 from ml_engine.lead_scoring_models import RandomForestLeadScorer, GradientBoostingLeadScorer
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+    
+    def njit(*args, **kwargs):
+        """No-op stand-in so the kernels still run as plain Python"""
+        return lambda func: func
+
 logger = logging.getLogger(__name__)
 
+# Tamanho do vetor de features de treino (mesmo que auto_retraining.py)
+FEATURE_VECTOR_SIZE = 40
+
+# Colunas lidas por job no treino com feedback (projeção, sem hidratar Job/TextAnalysis/MLPrediction)
+FEEDBACK_TRAINING_COLUMNS = (
+    Job.id,
+    Job.filename,
+    TextAnalysis.keywords,
+    TextAnalysis.entities,
+    TextAnalysis.financial_data,
+    TextAnalysis.business_indicators,
+    MLPrediction.lead_score,
+)
+
+# Feedback já lido por arquivo: {caminho: ((st_mtime_ns, st_size), entradas)}
+_FEEDBACK_CACHE: Dict[Path, Tuple[Tuple[int, int], List[Dict]]] = {}
+
+# Componentes do score de feedback, na ordem das colunas
+_FEEDBACK_COMPONENTS = ('overall_quality', 'would_invest', 'main_issue',
+                        'high_score_validation', 'low_score_validation')
+
+# Problema/oportunidade principal -> score (positivo 0.8, negativo 0.2)
+_ISSUE_SCORES = {
+    'Boa oportunidade': 0.8, 'Preço atrativo': 0.8, 'Localização excelente': 0.8, 'Documentação completa': 0.8,
+    'Preço muito alto': 0.2, 'Documentação incompleta': 0.2, 'Localização ruim': 0.2, 'Riscos legais': 0.2,
+}
+
+# Compilado na primeira chamada (cache em disco depois), para o import continuar barato
+@njit(parallel=True, cache=True)
+def _average_feedback_components(components, out):
+    """Média dos componentes respondidos (não NaN) de cada feedback, limitada a 0-1"""
+    for i in prange(components.shape[0]):
+        total = 0.0
+        count = 0
+        for value in components[i]:
+            if not np.isnan(value):
+                total += value
+                count += 1
+        
+        # Score neutro se não há componentes; clamp entre 0 e 1
+        score = total / count if count else 0.5
+        out[i] = max(0.0, min(1.0, score))
+
+
+# Compilado na primeira chamada; contagens (int) e valores (float, via json_float) têm
+# sempre os mesmos tipos, então há uma única especialização
+@njit(cache=True)
+def _pack_features(text_length, word_count, entity_count, money_count, total_value, max_value,
+                   legal_score, risk_score, viability_score, out):
+    """Escreve as 11 features básicas nas primeiras posições de uma linha já zerada"""
+    
+    # Features básicas
+    out[0] = text_length
+    out[1] = word_count
+    out[2] = entity_count
+    out[3] = 0.9  # language_confidence (assumir português)
+    out[4] = 0.7  # readability_score (assumir médio)
+    
+    # Features financeiras
+    out[5] = money_count
+    out[6] = total_value
+    out[7] = max_value
+    
+    # Features legais
+    out[8] = legal_score
+    out[9] = risk_score
+    out[10] = viability_score
+
 class FeedbackIntegrationSystem:
     """Sistema que incorpora feedback dos usuários no treinamento dos modelos"""
     
@@ -27,18 +114,14 @@ class FeedbackIntegrationSystem:
     def convert_feedback_to_training_labels(self, feedback_data: List[Dict]) -> List[Tuple[str, float]]:
         """Converte feedback dos usuários em labels de treino"""
         
-        training_labels = []
+        job_ids = [feedback['job_id'] for feedback in feedback_data]
         
-        for feedback in feedback_data:
-            job_id = feedback['job_id']
-            user_responses = feedback['user_feedback']
-            
-            # Converter respostas do usuário em score numérico
-            score = self._calculate_score_from_feedback(user_responses)
-            
-            training_labels.append((job_id, score))
-            
-            logger.debug(f"Job {job_id}: feedback convertido em score {score:.2f}")
+        # Converter respostas do usuário em score numérico (todas de uma vez)
+        scores = self._calculate_scores_from_feedback(
+            [feedback['user_feedback'] for feedback in feedback_data]
+        )
+        
+        training_labels = list(zip(job_ids, scores.tolist()))
         
         logger.info(f"📊 Convertidos {len(training_labels)} feedbacks em labels de treino")
         
@@ -46,90 +129,93 @@ class FeedbackIntegrationSystem:
     
     def _calculate_score_from_feedback(self, user_responses: Dict) -> float:
         """Converte respostas do usuário em score de 0 a 1"""
+        return float(self._calculate_scores_from_feedback([user_responses])[0])
+    
+    def _calculate_scores_from_feedback(self, responses: List[Dict]) -> np.ndarray:
+        """
+        Converte as respostas de vários usuários em scores de 0 a 1
         
-        score_components = []
-        
-        # 1. Rating geral (1-5) -> 0-1
-        if 'overall_quality' in user_responses:
-            rating = int(user_responses['overall_quality'].split(' - ')[0])
-            score_components.append((rating - 1) / 4)  # Normalizar 1-5 para 0-1
-        
-        # 2. Intenção de investir (sim/não) -> 1/0
-        if 'would_invest' in user_responses:
-            invest_score = 1.0 if user_responses['would_invest'] == 'Sim' else 0.0
-            score_components.append(invest_score)
-        
-        # 3. Problema/oportunidade principal
-        if 'main_issue' in user_responses:
-            issue = user_responses['main_issue']
-            if issue in ['Boa oportunidade', 'Preço atrativo', 'Localização excelente', 'Documentação completa']:
-                score_components.append(0.8)  # Positivo
-            elif issue in ['Preço muito alto', 'Documentação incompleta', 'Localização ruim', 'Riscos legais']:
-                score_components.append(0.2)  # Negativo
-        
-        # 4. Validação do score do modelo
-        if 'high_score_validation' in user_responses:
-            if user_responses['high_score_validation'] == 'Concordo':
-                score_components.append(0.9)  # Usuário confirma score alto
-            else:
-                score_components.append(0.3)  # Usuário discorda do score alto
-                
-        if 'low_score_validation' in user_responses:
-            if user_responses['low_score_validation'] == 'Concordo':
-                score_components.append(0.1)  # Usuário confirma score baixo
-            else:
-                score_components.append(0.7)  # Usuário discorda do score baixo
+        Cada resposta vira uma linha de componentes (NaN = pergunta não respondida);
+        o score é a média dos componentes presentes, 0.5 quando não há nenhum.
+        """
+        components = np.full((len(responses), len(_FEEDBACK_COMPONENTS)), np.nan)
+        
+        for row, user_responses in zip(components, responses):
+            # 1. Rating geral ("4 - Bom", 1-5) -> 0-1
+            quality = user_responses.get('overall_quality')
+            if quality is not None:
+                row[0] = (int(quality.partition(' - ')[0]) - 1) / 4
+            
+            # 2. Intenção de investir (sim/não) -> 1/0
+            if 'would_invest' in user_responses:
+                row[1] = 1.0 if user_responses['would_invest'] == 'Sim' else 0.0
+            
+            # 3. Problema/oportunidade principal (outras respostas não contam)
+            if 'main_issue' in user_responses:
+                row[2] = _ISSUE_SCORES.get(user_responses['main_issue'], np.nan)
+            
+            # 4. Validação do score do modelo
+            if 'high_score_validation' in user_responses:
+                row[3] = 0.9 if user_responses['high_score_validation'] == 'Concordo' else 0.3
+            if 'low_score_validation' in user_responses:
+                row[4] = 0.1 if user_responses['low_score_validation'] == 'Concordo' else 0.7
         
-        # Calcular score final como média ponderada
-        if score_components:
-            final_score = sum(score_components) / len(score_components)
-        else:
-            final_score = 0.5  # Score neutro se não há componentes
+        # Score final como média dos componentes respondidos
+        scores = np.empty(len(responses))
+        _average_feedback_components(components, scores)
         
-        return max(0.0, min(1.0, final_score))  # Clamp entre 0 e 1
+        return scores
     
-    def create_feedback_enhanced_training_set(self, db: Session) -> Dict[str, List]:
+    def create_feedback_enhanced_training_set(self, db: Session) -> Dict[str, Any]:
         """Cria conjunto de treino combinando dados automáticos + feedback humano"""
         
-        # 1. Carregar feedback dos usuários
-        feedback_data = self._load_feedback_data()
-        feedback_labels = self.convert_feedback_to_training_labels(feedback_data)
-        feedback_dict = dict(feedback_labels)
-        
-        # 2. Buscar todos os jobs com análises
-        jobs_with_analysis = db.query(Job, TextAnalysis, MLPrediction).join(
-            TextAnalysis, Job.id == TextAnalysis.job_id
-        ).outerjoin(
-            MLPrediction, Job.id == MLPrediction.job_id
-        ).filter(
-            Job.status == 'completed'
-        ).all()
-        
-        features = []
-        labels = []
-        weights = []
-        
-        for job, analysis, prediction in jobs_with_analysis:
-            # Extrair features
-            feature_vector = self._extract_features_from_job(job, analysis)
-            features.append(feature_vector)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # 1. Carregar feedback dos usuários (arquivos) enquanto o banco é lido
+            feedback_future = executor.submit(self._load_feedback_labels)
             
-            # Determinar label e peso
-            if str(job.id) in feedback_dict:
-                # Usar feedback humano (peso maior)
-                label = feedback_dict[str(job.id)]
-                weight = self.feedback_weight
-                logger.debug(f"Job {job.id}: usando feedback humano (label={label:.2f})")
-            else:
-                # Usar predição automática (peso menor)
-                label = prediction.lead_score if prediction and prediction.lead_score else 0.5
-                weight = 1.0
-                logger.debug(f"Job {job.id}: usando predição automática (label={label:.2f})")
+            # 2. Buscar todos os jobs com análises (só as colunas usadas, sem objetos ORM)
+            query = db.query(*FEEDBACK_TRAINING_COLUMNS).select_from(Job).join(
+                TextAnalysis, Job.id == TextAnalysis.job_id
+            ).outerjoin(
+                MLPrediction, Job.id == MLPrediction.job_id
+            ).filter(
+                Job.status == 'completed'
+            )
+            capacity = query.with_entities(func.count()).scalar() or 0
+            
+            # Matriz de features float32 contígua (uma linha por job), preenchida no lugar
+            features = np.zeros((capacity, FEATURE_VECTOR_SIZE), dtype=np.float32)
+            labels = np.empty(capacity, dtype=np.float32)
+            weights = np.ones(capacity, dtype=np.float32)
+            job_ids = []
+            
+            # Streaming via server-side cursor; jobs concluídos depois da contagem ficam para o próximo treino
+            for row in islice(query.yield_per(1000), capacity):
+                i = len(job_ids)
+                job_ids.append(str(row.id))
+                
+                # Extrair features
+                self._extract_features_from_job(row, features[i])
+                
+                # Predição automática (peso menor); substituída abaixo se houver feedback humano
+                labels[i] = row.lead_score or 0.5
             
-            labels.append(label)
-            weights.append(weight)
+            feedback_dict = feedback_future.result()
+        
+        # 3. Usar feedback humano (peso maior) onde existir
+        for i, job_id in enumerate(job_ids):
+            label = feedback_dict.get(job_id)
+            if label is not None:
+                labels[i] = label
+                weights[i] = self.feedback_weight
+                logger.debug("Job %s: usando feedback humano (label=%.2f)", job_id, label)
         
-        logger.info(f"📚 Dataset criado: {len(features)} exemplos, {len(feedback_dict)} com feedback humano")
+        n_samples = len(job_ids)
+        if n_samples < capacity:
+            # Jobs removidos entre a contagem e a leitura
+            features, labels, weights = features[:n_samples], labels[:n_samples], weights[:n_samples]
+        
+        logger.info(f"📚 Dataset criado: {n_samples} exemplos, {len(feedback_dict)} com feedback humano")
         
         return {
             'features': features,
@@ -138,6 +224,10 @@ class FeedbackIntegrationSystem:
             'feedback_count': len(feedback_dict)
         }
     
+    def _load_feedback_labels(self) -> Dict[str, float]:
+        """Carrega o feedback dos arquivos e converte em labels por job_id"""
+        return dict(self.convert_feedback_to_training_labels(self._load_feedback_data()))
+    
     def _load_feedback_data(self) -> List[Dict]:
         """Carrega dados de feedback dos arquivos"""
         
@@ -148,46 +238,57 @@ class FeedbackIntegrationSystem:
         feedback_data = []
         
         for file in feedback_dir.glob('feedback_*.jsonl'):
-            with open(file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        feedback_data.append(json.loads(line))
+            # Reaproveitar o parse se o arquivo não mudou (mesmo mtime e tamanho)
+            stat = file.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            cached = _FEEDBACK_CACHE.get(file)
+            if cached is None or cached[0] != signature:
+                cached = (signature, self._parse_feedback_file(file))
+                _FEEDBACK_CACHE[file] = cached
+            feedback_data.extend(cached[1])
         
         return feedback_data
     
-    def _extract_features_from_job(self, job: Job, analysis: TextAnalysis) -> List[float]:
-        """Extrai features de um job (mesmo que auto_retraining.py)"""
-        
-        # Features básicas
-        features = [
-            len(job.filename),  # text_length aproximado
-            analysis.keywords and len(analysis.keywords) or 0,  # word_count aproximado
-            analysis.entities and len(analysis.entities.get('persons', [])) or 0,  # entity_count
-            0.9,  # language_confidence (assumir português)
-            0.7,  # readability_score (assumir médio)
-        ]
-        
-        # Features financeiras
-        financial_data = analysis.financial_data or {}
-        features.extend([
-            len(financial_data.get('amounts', [])),  # money_count
-            financial_data.get('total_value', 0),    # total_financial_value
-            financial_data.get('max_value', 0),      # max_financial_value
-        ])
+    def _parse_feedback_file(self, file: Path) -> List[Dict]:
+        """Lê um arquivo JSONL de feedback (linhas inválidas são ignoradas)"""
+        
+        entries = []
         
-        # Features legais
-        business_indicators = analysis.business_indicators or {}
-        features.extend([
-            business_indicators.get('legal_score', 0),        # legal_compliance_score
-            business_indicators.get('risk_score', 0.5),       # risk_level_score
-            business_indicators.get('viability_score', 0.5),  # investment_viability_score
-        ])
+        # Arquivo lido de uma vez em bytes; o orjson decodifica o UTF-8 no parser
+        for line_number, line in enumerate(file.read_bytes().splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(orjson.loads(line))
+            except orjson.JSONDecodeError as e:
+                logger.warning(f"Linha de feedback inválida ignorada ({file.name}:{line_number}): {e}")
         
-        # Preencher até 40 features
-        while len(features) < 40:
-            features.append(0.0)
+        return entries
+    
+    def _extract_features_from_job(self, row: Row, out: np.ndarray) -> None:
+        """
+        Extrai features de um job (mesmo que auto_retraining.py)
         
-        return features[:40]
+        Lê uma linha de FEEDBACK_TRAINING_COLUMNS e escreve as 11 features
+        básicas na linha `out` (FEATURE_VECTOR_SIZE posições, já zerada);
+        as demais ficam em 0.0.
+        """
+        financial_data = row.financial_data or {}
+        business_indicators = row.business_indicators or {}
+        
+        # Contagens e valores extraídos do JSON aqui; a escrita na linha é nativa
+        _pack_features(
+            len(row.filename),  # text_length aproximado
+            row.keywords and len(row.keywords) or 0,  # word_count aproximado
+            row.entities and len(row.entities.get('persons', [])) or 0,  # entity_count
+            len(financial_data.get('amounts', [])),  # money_count
+            json_float(financial_data.get('total_value'), 0.0),  # total_financial_value
+            json_float(financial_data.get('max_value'), 0.0),    # max_financial_value
+            json_float(business_indicators.get('legal_score'), 0.0),        # legal_compliance_score
+            json_float(business_indicators.get('risk_score'), 0.5),         # risk_level_score
+            json_float(business_indicators.get('viability_score'), 0.5),    # investment_viability_score
+            out
+        )
     
     def retrain_with_feedback(self, model_name: str, db: Session) -> Dict[str, any]:
         """Retreina modelo incorporando feedback dos usuários"""
@@ -201,7 +302,7 @@ class FeedbackIntegrationSystem:
             if training_data['feedback_count'] < self.min_feedback_for_update:
                 return {
                     'success': False,
-                    'reason': f'Feedback insuficiente ({training_data[\"feedback_count\"]} < {self.min_feedback_for_update})'
+                    'reason': f'Feedback insuficiente ({training_data["feedback_count"]} < {self.min_feedback_for_update})'
                 }
             
             # Carregar modelo
@@ -218,4 +319,141 @@ class FeedbackIntegrationSystem:
                 training_data['features'],
                 training_data['labels'],
                 training_data['weights']
-            )\n            \n            if success:\n                # Salvar modelo atualizado\n                model.save_model()\n                \n                # Marcar feedback como processado\n                self._mark_feedback_as_processed()\n                \n                result = {\n                    'success': True,\n                    'samples_used': len(training_data['features']),\n                    'feedback_samples': training_data['feedback_count'],\n                    'timestamp': datetime.now().isoformat()\n                }\n                \n                logger.info(f\"✅ Retreinamento com feedback concluído para {model_name}\")\n                return result\n            else:\n                return {'success': False, 'reason': 'Training failed'}\n                \n        except Exception as e:\n            logger.error(f\"❌ Erro no retreinamento com feedback: {e}\")\n            return {'success': False, 'error': str(e)}\n    \n    def _train_with_weights(self, model, features: List[List[float]], \n                          labels: List[float], weights: List[float]) -> bool:\n        \"\"\"Treina modelo com pesos para dar mais importância ao feedback humano\"\"\"\n        \n        try:\n            # Converter para numpy arrays\n            X = np.array(features)\n            y = np.array(labels)\n            sample_weight = np.array(weights)\n            \n            # Treinar modelo (a maioria dos sklearn models suporta sample_weight)\n            if hasattr(model, 'model') and hasattr(model.model, 'fit'):\n                model.model.fit(X, y, sample_weight=sample_weight)\n                model.is_trained = True\n                return True\n            else:\n                logger.warning(\"Modelo não suporta sample_weight, treinando sem pesos\")\n                return model.train(features, labels)\n                \n        except Exception as e:\n            logger.error(f\"Erro no treinamento com pesos: {e}\")\n            return False\n    \n    def _mark_feedback_as_processed(self):\n        \"\"\"Marca feedback como processado (move para arquivo de histórico)\"\"\"\n        \n        feedback_dir = Path('storage/feedback')\n        processed_dir = Path('storage/feedback/processed')\n        processed_dir.mkdir(exist_ok=True)\n        \n        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')\n        \n        for file in feedback_dir.glob('feedback_*.jsonl'):\n            if file.parent.name != 'processed':  # Não mover se já está em processed\n                new_path = processed_dir / f\"{file.stem}_processed_{timestamp}{file.suffix}\"\n                file.rename(new_path)\n                logger.info(f\"📁 Feedback movido para: {new_path}\")\n    \n    def get_feedback_statistics(self) -> Dict[str, any]:\n        \"\"\"Retorna estatísticas do feedback coletado\"\"\"\n        \n        feedback_data = self._load_feedback_data()\n        \n        if not feedback_data:\n            return {'total_feedback': 0}\n        \n        # Analisar padrões no feedback\n        stats = {\n            'total_feedback': len(feedback_data),\n            'feedback_by_month': {},\n            'average_scores': {},\n            'most_common_issues': {},\n            'investment_intention': {'yes': 0, 'no': 0}\n        }\n        \n        for feedback in feedback_data:\n            # Contagem por mês\n            month = feedback['timestamp'][:7]  # YYYY-MM\n            stats['feedback_by_month'][month] = stats['feedback_by_month'].get(month, 0) + 1\n            \n            # Análise das respostas\n            responses = feedback['user_feedback']\n            \n            if 'overall_quality' in responses:\n                rating = int(responses['overall_quality'].split(' - ')[0])\n                if 'overall_quality' not in stats['average_scores']:\n                    stats['average_scores']['overall_quality'] = []\n                stats['average_scores']['overall_quality'].append(rating)\n            \n            if 'would_invest' in responses:\n                if responses['would_invest'] == 'Sim':\n                    stats['investment_intention']['yes'] += 1\n                else:\n                    stats['investment_intention']['no'] += 1\n            \n            if 'main_issue' in responses:\n                issue = responses['main_issue']\n                stats['most_common_issues'][issue] = stats['most_common_issues'].get(issue, 0) + 1\n        \n        # Calcular médias\n        for key, values in stats['average_scores'].items():\n            stats['average_scores'][key] = sum(values) / len(values)\n        \n        return stats\n\n\n# Função para usar na API\ndef run_feedback_enhanced_retraining(model_name: str) -> Dict:\n    \"\"\"Executa retreinamento incorporando feedback dos usuários\"\"\"\n    \n    feedback_system = FeedbackIntegrationSystem()\n    \n    with next(get_db()) as db:\n        return feedback_system.retrain_with_feedback(model_name, db)\n\n\nif __name__ == \"__main__\":\n    # Teste do sistema\n    logging.basicConfig(level=logging.INFO)\n    \n    feedback_system = FeedbackIntegrationSystem()\n    \n    # Mostrar estatísticas de feedback\n    stats = feedback_system.get_feedback_statistics()\n    print(\"📊 Estatísticas de Feedback:\")\n    print(json.dumps(stats, indent=2, default=str))\n    \n    # Testar retreinamento com feedback\n    result = run_feedback_enhanced_retraining('random_forest_classifier')\n    print(\"\\n🔄 Resultado do retreinamento:\")\n    print(json.dumps(result, indent=2, default=str))"
\ No newline at end of file
+            )
+            
+            if success:
+                # Salvar modelo atualizado
+                model.save_model()
+                
+                # Marcar feedback como processado
+                self._mark_feedback_as_processed()
+                
+                result = {
+                    'success': True,
+                    'samples_used': len(training_data['features']),
+                    'feedback_samples': training_data['feedback_count'],
+                    'timestamp': datetime.now().isoformat()
+                }
+                
+                logger.info(f"✅ Retreinamento com feedback concluído para {model_name}")
+                return result
+            else:
+                return {'success': False, 'reason': 'Training failed'}
+                
+        except Exception as e:
+            logger.error(f"❌ Erro no retreinamento com feedback: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    def _train_with_weights(self, model, X: np.ndarray, 
+                          y: np.ndarray, sample_weight: np.ndarray) -> bool:
+        """
+        Treina modelo com pesos para dar mais importância ao feedback humano
+        
+        Recebe os arrays de create_feedback_enhanced_training_set como estão
+        (float32 contíguo); o sklearn usa o buffer sem copiar nem converter para float64.
+        """
+        
+        try:
+            if X.dtype != np.float32 or not X.flags.c_contiguous:
+                logger.warning("Features fora do layout float32 contíguo - convertendo (cópia extra)")
+                X = np.ascontiguousarray(X, dtype=np.float32)
+            
+            # Treinar modelo (a maioria dos sklearn models suporta sample_weight)
+            if hasattr(model, 'model') and hasattr(model.model, 'fit'):
+                model.model.fit(X, y, sample_weight=sample_weight)
+                model.is_trained = True
+                if hasattr(model, 'refresh_feature_importance'):
+                    model.refresh_feature_importance()
+                return True
+            else:
+                logger.warning("Modelo não suporta sample_weight, treinando sem pesos")
+                return model.train(X, y)
+                
+        except Exception as e:
+            logger.error(f"Erro no treinamento com pesos: {e}")
+            return False
+    
+    def _mark_feedback_as_processed(self):
+        """Marca feedback como processado (move para arquivo de histórico)"""
+        
+        feedback_dir = 'storage/feedback'
+        processed_dir = os.path.join(feedback_dir, 'processed')
+        
+        # Uma leitura do diretório; a pasta processed não casa com o padrão
+        with os.scandir(feedback_dir) as entries:
+            targets = [
+                entry for entry in entries
+                if entry.name.startswith('feedback_') and entry.name.endswith('.jsonl') and entry.is_file()
+            ]
+        
+        os.makedirs(processed_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        for entry in targets:
+            stem = entry.name[:-len('.jsonl')]
+            os.replace(entry.path, os.path.join(processed_dir, f"{stem}_processed_{timestamp}.jsonl"))
+        
+        # Os arquivos movidos não são mais lidos por _load_feedback_data
+        _FEEDBACK_CACHE.clear()
+        
+        logger.info(f"📁 {len(targets)} arquivo(s) de feedback movido(s) para: {processed_dir}")
+    
+    def get_feedback_statistics(self) -> Dict[str, any]:
+        """Retorna estatísticas do feedback coletado"""
+        
+        feedback_data = self._load_feedback_data()
+        
+        if not feedback_data:
+            return {'total_feedback': 0}
+        
+        # Uma passada para separar as colunas, agregação depois
+        months = [feedback['timestamp'][:7] for feedback in feedback_data]  # YYYY-MM
+        responses = [feedback['user_feedback'] for feedback in feedback_data]
+        ratings = np.fromiter(
+            (int(r['overall_quality'].partition(' - ')[0]) for r in responses if 'overall_quality' in r),
+            dtype=np.int64
+        )
+        intentions = [r['would_invest'] for r in responses if 'would_invest' in r]
+        invest_yes = intentions.count('Sim')
+        
+        # Analisar padrões no feedback
+        stats = {
+            'total_feedback': len(feedback_data),
+            'feedback_by_month': dict(Counter(months)),
+            'average_scores': {},
+            'most_common_issues': dict(Counter(r['main_issue'] for r in responses if 'main_issue' in r)),
+            'investment_intention': {'yes': invest_yes, 'no': len(intentions) - invest_yes}
+        }
+        
+        # Calcular médias
+        if ratings.size:
+            stats['average_scores']['overall_quality'] = float(ratings.mean())
+        
+        return stats
+
+
+# Função para usar na API
+def run_feedback_enhanced_retraining(model_name: str) -> Dict:
+    """Executa retreinamento incorporando feedback dos usuários"""
+    
+    feedback_system = FeedbackIntegrationSystem()
+    
+    with next(get_db()) as db:
+        return feedback_system.retrain_with_feedback(model_name, db)
+
+
+if __name__ == "__main__":
+    # Teste do sistema
+    logging.basicConfig(level=logging.INFO)
+    
+    feedback_system = FeedbackIntegrationSystem()
+    
+    # Mostrar estatísticas de feedback
+    stats = feedback_system.get_feedback_statistics()
+    print("📊 Estatísticas de Feedback:")
+    print(json.dumps(stats, indent=2, default=str))
+    
+    # Testar retreinamento com feedback
+    result = run_feedback_enhanced_retraining('random_forest_classifier')
+    print("\n🔄 Resultado do retreinamento:")
+    print(json.dumps(result, indent=2, default=str))
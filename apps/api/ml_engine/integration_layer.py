@@ -4,30 +4,54 @@ Seamlessly integrates enhanced ML features with existing pipeline
 """
 
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
+from dataclasses import fields, is_dataclass
+from functools import lru_cache
+from types import MappingProxyType
 
-# Import existing components
-from .enhanced_ml_processor import enhanced_ml_processor
+# Import existing components (the enhanced processor is imported on first use)
 from .feature_engineering import feature_engineer
-from .lead_scoring_models import ModelPrediction
 
 logger = logging.getLogger(__name__)
 
+# Version reported in the compatibility fields of enhanced results
+ENHANCEMENT_VERSION = '1.0'
+
+@lru_cache()
+def get_enhanced_processor():
+    """Shared enhanced ML processor, imported on first use (loads the enhanced feature stack)"""
+    from .enhanced_ml_processor import get_enhanced_ml_processor
+    return get_enhanced_ml_processor()
+
+@lru_cache(maxsize=None)
+def _public_field_names(feature_type: type) -> Optional[Tuple[str, ...]]:
+    """Public field names of a dataclass feature type (None for other types)"""
+    if not is_dataclass(feature_type):
+        return None
+    return tuple(field.name for field in fields(feature_type) if not field.name.startswith('_'))
+
 class MLPipelineIntegrator:
     """
     Integration layer that provides enhanced ML capabilities
     while maintaining full backward compatibility
     """
     
+    # Lead score classes, indexed by how many thresholds (50, 75) the score reaches
+    SCORE_CLASSES = ('low', 'medium', 'high')
+    
     def __init__(self):
-        self.enhanced_processor = enhanced_ml_processor
         self.original_engineer = feature_engineer
         self.enhancement_enabled = True
         self.fallback_enabled = True
         
         logger.info("ML Pipeline Integrator initialized - enhanced features enabled")
     
+    @property
+    def enhanced_processor(self):
+        """Enhanced ML processor (imported the first time enhanced processing is used)"""
+        return get_enhanced_processor()
+    
     def process_text_analysis(self, 
                              text_analysis: Dict[str, Any],
                              job_metadata: Optional[Dict[str, Any]] = None,
@@ -54,20 +78,17 @@ class MLPipelineIntegrator:
                 text_analysis, job_metadata
             )
             
-            # Add compatibility layer for existing code
-            enhanced_result.update({
-                # Backward compatibility fields
-                'lead_indicators': {
-                    'lead_score': enhanced_result['lead_score'],
-                    'confidence': enhanced_result['confidence'],
-                    'classification': enhanced_result['classification']
-                },
-                'features': enhanced_result.get('original_features', {}),
-                
-                # Enhancement status
-                'enhancement_status': 'enabled',
-                'enhancement_version': '1.0'
-            })
+            # Add compatibility layer for existing code (in place, in the original key order)
+            enhanced_result['lead_indicators'] = {
+                'lead_score': enhanced_result['lead_score'],
+                'confidence': enhanced_result['confidence'],
+                'classification': enhanced_result['classification']
+            }
+            enhanced_result['features'] = enhanced_result.get('original_features', {})
+            
+            # Enhancement status
+            enhanced_result['enhancement_status'] = 'enabled'
+            enhanced_result['enhancement_version'] = ENHANCEMENT_VERSION
             
             logger.info(f"Enhanced processing successful for job {text_analysis.get('job_id', 'unknown')}")
             return enhanced_result
@@ -121,18 +142,16 @@ class MLPipelineIntegrator:
         result = self._process_original_only(text_analysis, job_metadata)
         
         # Add fallback information
-        result.update({
-            'enhancement_status': 'fallback',
-            'fallback_reason': error_info,
-            'quality_assessment': {
-                'overall_score': 60.0,
-                'quality_level': "Processamento básico",
-                'recommendations': [
-                    "Processado com sistema básico devido a erro no sistema avançado",
-                    "Resultado pode ter menor precisão que o processamento avançado"
-                ]
-            }
-        })
+        result['enhancement_status'] = 'fallback'
+        result['fallback_reason'] = error_info
+        result['quality_assessment'] = {
+            'overall_score': 60.0,
+            'quality_level': "Processamento básico",
+            'recommendations': [
+                "Processado com sistema básico devido a erro no sistema avançado",
+                "Resultado pode ter menor precisão que o processamento avançado"
+            ]
+        }
         
         return result
     
@@ -161,17 +180,15 @@ class MLPipelineIntegrator:
     
     def _classify_score(self, score: float) -> str:
         """Classify lead score into categories"""
-        if score >= 75:
-            return 'high'
-        elif score >= 50:
-            return 'medium'
-        else:
-            return 'low'
+        return self.SCORE_CLASSES[int(score >= 50) + int(score >= 75)]
     
     def _convert_features_to_dict(self, features) -> Dict[str, Any]:
         """Convert features to dictionary format"""
         try:
-            if hasattr(features, '__dict__'):
+            field_names = _public_field_names(type(features))
+            if field_names is not None:
+                return {name: getattr(features, name) for name in field_names}
+            elif hasattr(features, '__dict__'):
                 return {k: v for k, v in features.__dict__.items() 
                        if not k.startswith('_')}
             else:
@@ -214,26 +231,9 @@ class MLPipelineIntegrator:
         """Test the processing pipeline with sample data"""
         
         if sample_text is None:
-            sample_text = """
-            EDITAL DE LEILÃO JUDICIAL
-            
-            O Juiz de Direito da 1ª Vara Cível da Comarca de São Paulo, no processo nº 1234567-89.2023.8.26.0100,
-            torna público que será realizada hasta pública do imóvel localizado na Rua das Flores, 123.
-            
-            VALOR DA AVALIAÇÃO: R$ 350.000,00
-            LANCE MÍNIMO: R$ 233.333,33 (2/3 do valor da avaliação)
-            DÉBITO TOTAL: R$ 45.000,00
-            
-            O imóvel encontra-se livre de ocupação e com documentação regular.
-            """
+            sample_text = _SAMPLE_TEXT
         
-        sample_analysis = {
-            'job_id': 'test_job_001',
-            'original_text': sample_text,
-            'cleaned_text': sample_text,
-            'entities': [],
-            'lead_indicators': {'lead_score': 70.0}
-        }
+        sample_analysis = dict(_SAMPLE_ANALYSIS, original_text=sample_text, cleaned_text=sample_text)
         
         try:
             result = self.process_text_analysis(sample_analysis)
@@ -254,6 +254,28 @@ class MLPipelineIntegrator:
                 'test_timestamp': datetime.now().isoformat()
             }
 
+# Sample document for test_processing (the text fields are filled per call)
+_SAMPLE_TEXT = """
+            EDITAL DE LEILÃO JUDICIAL
+            
+            O Juiz de Direito da 1ª Vara Cível da Comarca de São Paulo, no processo nº 1234567-89.2023.8.26.0100,
+            torna público que será realizada hasta pública do imóvel localizado na Rua das Flores, 123.
+            
+            VALOR DA AVALIAÇÃO: R$ 350.000,00
+            LANCE MÍNIMO: R$ 233.333,33 (2/3 do valor da avaliação)
+            DÉBITO TOTAL: R$ 45.000,00
+            
+            O imóvel encontra-se livre de ocupação e com documentação regular.
+            """
+
+_SAMPLE_ANALYSIS = MappingProxyType({
+    'job_id': 'test_job_001',
+    'original_text': None,
+    'cleaned_text': None,
+    'entities': [],
+    'lead_indicators': {'lead_score': 70.0}
+})
+
 # Global integrator instance
 ml_integrator = MLPipelineIntegrator()
 
@@ -3,10 +3,13 @@ Lead Scoring Models - Etapa 5
 Modelos de Machine Learning para scoring avançado de leads
 """
 
+import asyncio
 import logging
+import os
 import pickle
 import json
 import joblib
+import time
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime
@@ -15,6 +18,7 @@ from dataclasses import dataclass, asdict
 
 try:
     import pandas as pd
+    from sklearn import config_context
     from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
     from sklearn.linear_model import LogisticRegression, LinearRegression
     from sklearn.model_selection import train_test_split, cross_val_score
@@ -26,10 +30,82 @@ except ImportError:
     SKLEARN_AVAILABLE = False
     logging.warning("scikit-learn não disponível - usando modelos básicos")
 
-from ml_engine.feature_engineering import FeatureSet, feature_engineer
+# orjson para os metadados dos modelos (opcional; fallback json da stdlib)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# ONNX Runtime para inferência compilada das árvores (opcional)
+try:
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+from ml_engine.feature_engineering import FeatureSet, feature_engineer, feature_matrix_cache
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Classes do Random Forest, indexadas por (score >= 50) + (score >= 80)
+SCORE_CLASSES = np.array(['low', 'medium', 'high'])
+
+# Nome da entrada dos modelos exportados para ONNX
+ONNX_INPUT_NAME = 'float_input'
+
+# Ordem das classes na distribuição combinada do ensemble
+ENSEMBLE_CLASSES = ('high', 'medium', 'low')
+
+# Gradient Boosting: (classificação, confiança) indexadas por (score >= 50) + (score >= 80)
+GB_CLASSIFICATION = (('low', 0.8), ('medium', 0.7), ('high', 0.9))
+
+# Gradient Boosting: distribuição aproximada (ordem de ENSEMBLE_CLASSES) por faixa
+# de score: < 40, [40, 60), [60, 80), >= 80
+_SCORE_BUCKETS = np.array([40.0, 60.0, 80.0])
+_SCORE_PROBABILITY_TABLE = np.array([
+    [0.05, 0.2, 0.75],
+    [0.1, 0.6, 0.3],
+    [0.4, 0.5, 0.1],
+    [0.8, 0.15, 0.05],
+])
+
+
+def _score_probability_rows(scores: np.ndarray) -> List[List[float]]:
+    """Linhas de _SCORE_PROBABILITY_TABLE para um vetor de scores (busca binária vetorizada)"""
+    return _SCORE_PROBABILITY_TABLE[np.searchsorted(_SCORE_BUCKETS, scores, side='right')].tolist()
+
+
+if NUMBA_AVAILABLE:
+    # Sem assinatura explícita: a matriz do feature_matrix_cache é somente leitura,
+    # um tipo distinto para o Numba
+    @njit(cache=True)
+    def _standardize(X, mean, scale, out):
+        """(X - mean) / scale numa passada, com os arredondamentos float32 do caminho NumPy"""
+        for i in range(X.shape[0]):
+            for j in range(X.shape[1]):
+                centered = np.float32(X[i, j] - mean[j])
+                out[i, j] = centered / scale[j]
+
+
+def _weighted_sum(rows: np.ndarray, weights: List[float]) -> np.ndarray:
+    """Soma ponderada das linhas, acumulada linha a linha
+    
+    Sem produto matricial (BLAS): o arredondamento fica igual ao da soma escalar.
+    """
+    total = rows[0] * weights[0]
+    for row, weight in zip(rows[1:], weights[1:]):
+        total += row * weight
+    return total
+
 @dataclass
 class ModelPrediction:
     """Resultado de predição de um modelo"""
@@ -58,6 +134,23 @@ class ModelPerformance:
     samples_trained: int
     last_trained: str
 
+class _FastScaler:
+    """Scaler de inferência: só mean_/scale_ de um StandardScaler (scaler.npz), sem sklearn"""
+    __slots__ = ('mean_', 'scale_')
+    
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = mean
+        self.scale_ = scale
+    
+    def transform(self, X) -> np.ndarray:
+        """Mesma aritmética de StandardScaler.transform (cópia; dtype float preservado)"""
+        X = np.array(X)
+        if X.dtype.kind != 'f':
+            X = X.astype(np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
 class LeadScoringModel:
     """Classe base para modelos de lead scoring"""
     
@@ -66,8 +159,12 @@ class LeadScoringModel:
         self.model = None
         self.scaler = None
         self.feature_columns = None
+        self._feature_importance = {}
+        self._importance_vector = None
+        self._onnx_session = None
         self.is_trained = False
         self.training_history = []
+        self._history_saved = 0  # registros de training_history já gravados em history.ndjson
         self.model_path = Path(f"storage/models/{model_name}")
         self.model_path.mkdir(parents=True, exist_ok=True)
     
@@ -80,7 +177,94 @@ class LeadScoringModel:
         # Preencher valores faltantes
         X = X.fillna(0)
         
-        return X
+        # float32: metade da memória trafegada; as árvores já treinam em float32
+        return X.astype(np.float32, copy=False)
+    
+    def _set_feature_columns(self, columns) -> None:
+        """Fixa as colunas do treinamento (tupla: também é chave do feature_matrix_cache)"""
+        self.feature_columns = tuple(columns)
+    
+    def refresh_feature_importance(self) -> None:
+        """Recalcula o cache de feature importance (fixo até o próximo treinamento)"""
+        importances = getattr(self.model, 'feature_importances_', None)
+        if importances is None or self.feature_columns is None:
+            self._feature_importance = {}
+            self._importance_vector = None
+        else:
+            self._feature_importance = dict(zip(self.feature_columns, importances.tolist()))
+            # Mesmos valores, alinhados a feature_columns (usado pelo ensemble)
+            self._importance_vector = np.array(list(self._feature_importance.values()))
+    
+    def _feature_matrix(self, features_list: List[FeatureSet]) -> np.ndarray:
+        """Matriz de predição (float32, colunas do treinamento) via feature_matrix_cache
+        
+        Equivale a features_to_dataframe + preprocess_features + reindex; não modificar.
+        """
+        return feature_matrix_cache.get_matrix(features_list, self.feature_columns)
+    
+    def predict_matrix(self, X: np.ndarray) -> List[ModelPrediction]:
+        """Faz predição direto de uma matriz já montada (linhas x feature_columns)"""
+        start = time.perf_counter()
+        
+        if not self.is_trained or not SKLEARN_AVAILABLE:
+            return [self._create_dummy_prediction() for _ in range(len(X))]
+        
+        return self._predict_from_array(np.asarray(X, dtype=np.float32), start)
+    
+    def _scale_features(self, X: np.ndarray) -> np.ndarray:
+        """Padroniza X com o StandardScaler treinado, num novo array (X fica intacto)
+        
+        Mesma aritmética (e dtype float32) de scaler.transform no treinamento,
+        sem revalidar a matriz; com Numba, numa única passada sem temporários.
+        """
+        if NUMBA_AVAILABLE:
+            X_scaled = np.empty_like(X)
+            _standardize(X, self.scaler.mean_, self.scaler.scale_, X_scaled)
+            return X_scaled
+        
+        X_scaled = np.subtract(X, self.scaler.mean_, out=np.empty_like(X))
+        X_scaled /= self.scaler.scale_
+        return X_scaled
+    
+    def _export_onnx(self) -> None:
+        """Exporta o modelo para ONNX e abre a sessão do onnxruntime usada na predição
+        
+        Sem ONNX disponível (ou se a conversão falhar), remove um model.onnx
+        anterior para que ele nunca fique defasado em relação ao model.pkl.
+        """
+        onnx_file = self.model_path / "model.onnx"
+        self._onnx_session = None
+        
+        if not ONNX_AVAILABLE or self.feature_columns is None:
+            onnx_file.unlink(missing_ok=True)
+            return
+        
+        try:
+            initial_types = [(ONNX_INPUT_NAME, FloatTensorType([None, len(self.feature_columns)]))]
+            onnx_model = convert_sklearn(
+                self.model,
+                initial_types=initial_types,
+                options={RandomForestClassifier: {'zipmap': False}}  # probabilidades como matriz
+            )
+            
+            tmp_file = onnx_file.with_suffix('.onnx.tmp')
+            with open(tmp_file, 'wb') as f:
+                f.write(onnx_model.SerializeToString())
+            os.replace(tmp_file, onnx_file)
+            
+            self._load_onnx_session(onnx_file)
+            
+        except Exception as e:
+            logger.warning(f"Falha ao exportar {self.model_name} para ONNX: {e}")
+            onnx_file.unlink(missing_ok=True)
+    
+    def _load_onnx_session(self, onnx_file: Path) -> None:
+        """Abre a sessão do onnxruntime; sem ela a predição usa o modelo sklearn"""
+        try:
+            self._onnx_session = ort.InferenceSession(str(onnx_file), providers=['CPUExecutionProvider'])
+        except Exception as e:
+            logger.warning(f"Falha ao carregar {onnx_file}: {e}")
+            self._onnx_session = None
     
     def save_model(self) -> bool:
         """Salva modelo treinado"""
@@ -88,21 +272,46 @@ class LeadScoringModel:
             # Salvar modelo
             joblib.dump(self.model, self.model_path / "model.pkl")
             
-            # Salvar scaler se existir
+            # Exportar para ONNX (inferência sem o caminho Python do sklearn)
+            self._export_onnx()
+            
+            # Salvar scaler se existir; mean/scale também em .npz, carregados sem
+            # unpickling do sklearn na inicialização dos workers
+            scaler_arrays_file = self.model_path / "scaler.npz"
             if self.scaler is not None:
                 joblib.dump(self.scaler, self.model_path / "scaler.pkl")
+                
+                tmp_arrays_file = scaler_arrays_file.with_suffix('.npz.tmp')
+                with open(tmp_arrays_file, 'wb') as f:
+                    np.savez(f, mean=self.scaler.mean_, scale=self.scaler.scale_)
+                os.replace(tmp_arrays_file, scaler_arrays_file)
+            else:
+                scaler_arrays_file.unlink(missing_ok=True)
             
             # Salvar metadados
             metadata = {
                 'model_name': self.model_name,
                 'is_trained': self.is_trained,
                 'feature_columns': self.feature_columns,
-                'training_history': self.training_history,
+                'last_training': self.training_history[-1] if self.training_history else None,
                 'saved_at': datetime.now().isoformat()
             }
             
-            with open(self.model_path / "metadata.json", 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            # Escrita atômica: leitores concorrentes nunca veem JSON truncado
+            metadata_file = self.model_path / "metadata.json"
+            tmp_file = metadata_file.with_suffix('.json.tmp')
+            if ORJSON_AVAILABLE:
+                tmp_file.write_bytes(orjson.dumps(
+                    metadata,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                ))
+            else:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(metadata, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, metadata_file)
+            
+            # Histórico de treinos: só os registros novos, em append
+            self._append_training_history()
             
             logger.info(f"Modelo {self.model_name} salvo com sucesso")
             return True
@@ -111,26 +320,81 @@ class LeadScoringModel:
             logger.error(f"Erro ao salvar modelo {self.model_name}: {e}")
             return False
     
+    def _append_training_history(self) -> None:
+        """Acrescenta ao history.ndjson os registros de treino ainda não gravados
+        
+        Uma linha JSON por treino: salvar não reescreve o histórico inteiro.
+        """
+        new_records = self.training_history[self._history_saved:]
+        if not new_records:
+            return
+        
+        if ORJSON_AVAILABLE:
+            lines = b''.join(
+                orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+                for record in new_records
+            )
+        else:
+            lines = b''.join(
+                json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+                for record in new_records
+            )
+        
+        with open(self.model_path / "history.ndjson", 'ab') as f:
+            f.write(lines)
+        self._history_saved = len(self.training_history)
+    
+    def _load_training_history(self, history_file: Path) -> List[Dict[str, Any]]:
+        """Lê o history.ndjson (uma linha por treino)"""
+        loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+        with open(history_file, 'rb') as f:
+            return [loads(line) for line in f if line.strip()]
+    
     def load_model(self) -> bool:
         """Carrega modelo salvo"""
         model_file = self.model_path / "model.pkl"
         scaler_file = self.model_path / "scaler.pkl"
         metadata_file = self.model_path / "metadata.json"
+        history_file = self.model_path / "history.ndjson"
         
         try:
             # Carregar metadados
             if metadata_file.exists():
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
+                if ORJSON_AVAILABLE:
+                    metadata = orjson.loads(metadata_file.read_bytes())
+                else:
+                    with open(metadata_file, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                
+                feature_columns = metadata.get('feature_columns')
+                if feature_columns is not None:
+                    self._set_feature_columns(feature_columns)
                 
-                self.feature_columns = metadata.get('feature_columns')
+                # Metadados antigos trazem o histórico embutido: regravado no
+                # history.ndjson no próximo save_model
                 self.training_history = metadata.get('training_history', [])
+                self._history_saved = 0
+            
+            if history_file.exists():
+                self.training_history = self._load_training_history(history_file)
+                self._history_saved = len(self.training_history)
             
             # Carregar modelo
             if SKLEARN_AVAILABLE and model_file.exists():
                 self.model = joblib.load(model_file)
+                self.refresh_feature_importance()
+                
+                # Preferir o modelo ONNX quando existir
+                onnx_file = self.model_path / "model.onnx"
+                self._onnx_session = None
+                if ONNX_AVAILABLE and onnx_file.exists():
+                    self._load_onnx_session(onnx_file)
                 
-                if scaler_file.exists():
+                scaler_arrays_file = self.model_path / "scaler.npz"
+                if scaler_arrays_file.exists():
+                    with np.load(scaler_arrays_file) as arrays:
+                        self.scaler = _FastScaler(arrays['mean'], arrays['scale'])
+                elif scaler_file.exists():
                     self.scaler = joblib.load(scaler_file)
                 
                 self.is_trained = True
@@ -148,10 +412,12 @@ class RandomForestLeadScorer(LeadScoringModel):
     def __init__(self):
         super().__init__("random_forest_classifier")
         if SKLEARN_AVAILABLE:
+            # n_jobs=-1: árvores treinadas e avaliadas em paralelo, em todos os núcleos
             self.model = RandomForestClassifier(
                 n_estimators=100,
                 max_depth=10,
-                random_state=42
+                random_state=42,
+                n_jobs=-1
             )
     
     def train(self, features_list: List[FeatureSet], target_scores: List[float]) -> ModelPerformance:
@@ -173,23 +439,24 @@ class RandomForestLeadScorer(LeadScoringModel):
             # Pré-processar features
             X = self.preprocess_features(features_df)
             
-            # Converter scores para classes
-            y = np.array(['high' if s >= 80 else 'medium' if s >= 50 else 'low' 
-                         for s in target_scores])
+            # Converter scores para classes (NaN cai em 'low', como na comparação escalar)
+            scores = np.asarray(target_scores, dtype=np.float64)
+            y = SCORE_CLASSES[(scores >= 50).astype(np.intp) + (scores >= 80)]
             
             # Dividir dados
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42
             )
             
-            # Escalar features
-            self.scaler = StandardScaler()
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Escalar features (float32 contíguo, escalado no próprio buffer)
+            self.scaler = StandardScaler(copy=False)
+            X_train_scaled = self.scaler.fit_transform(np.ascontiguousarray(X_train, dtype=np.float32))
+            X_test_scaled = self.scaler.transform(np.ascontiguousarray(X_test, dtype=np.float32))
             
             # Treinar modelo
             self.model.fit(X_train_scaled, y_train)
-            self.feature_columns = list(X.columns)
+            self._set_feature_columns(X.columns)
+            self.refresh_feature_importance()
             self.is_trained = True
             
             # Avaliar performance
@@ -201,15 +468,13 @@ class RandomForestLeadScorer(LeadScoringModel):
             # Cross-validation (ajustar CV baseado no tamanho dos dados)
             cv_folds = min(3, len(X_train) // 2) if len(X_train) >= 4 else 2
             if cv_folds >= 2:
-                cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=cv_folds)
+                cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=cv_folds, n_jobs=-1)
             else:
-                cv_scores = [self.model.score(X_train_scaled, y_train)]
+                # Sem folds suficientes não há validação: não reavaliar no próprio treino
+                cv_scores = np.array([np.nan])
             
             # Feature importance
-            feature_importance = dict(zip(
-                self.feature_columns,
-                self.model.feature_importances_
-            ))
+            feature_importance = dict(self._feature_importance)
             
             training_time = (datetime.now() - start_time).total_seconds()
             
@@ -251,64 +516,76 @@ class RandomForestLeadScorer(LeadScoringModel):
     
     def predict(self, features: FeatureSet) -> ModelPrediction:
         """Faz predição com Random Forest"""
-        start_time = datetime.now()
+        return self.predict_batch([features])[0]
+    
+    def predict_batch(self, features_list: List[FeatureSet]) -> List[ModelPrediction]:
+        """Faz predição com Random Forest para vários documentos numa única chamada ao modelo"""
+        start = time.perf_counter()
         
         if not self.is_trained or not SKLEARN_AVAILABLE:
-            return self._create_dummy_prediction()
+            return [self._create_dummy_prediction() for _ in features_list]
         
+        return self._predict_from_array(self._feature_matrix(features_list), start)
+    
+    def _predict_from_array(self, X: np.ndarray, start: float) -> List[ModelPrediction]:
+        """Predição Random Forest a partir de uma matriz de _feature_matrix (não modificada)"""
         try:
-            # Converter para DataFrame
-            features_df = feature_engineer.features_to_dataframe([features])
-            X = self.preprocess_features(features_df)
+            # Escalar
+            X_scaled = self._scale_features(X)
             
-            # Garantir que as colunas sejam as mesmas do treinamento
-            X = X.reindex(columns=self.feature_columns, fill_value=0)
+            # Predição (uma chamada para o lote inteiro): ONNX quando exportado; no sklearn
+            # a matriz já é finita, então ele não precisa varrê-la de novo atrás de NaN/inf
+            if self._onnx_session is not None:
+                predicted_classes, probabilities_batch = self._onnx_session.run(
+                    None, {ONNX_INPUT_NAME: X_scaled}
+                )
+                probabilities_batch = probabilities_batch.astype(np.float64)
+            else:
+                with config_context(assume_finite=True):
+                    predicted_classes = self.model.predict(X_scaled)
+                    probabilities_batch = self.model.predict_proba(X_scaled)
             
-            # Escalar
-            X_scaled = self.scaler.transform(X)
-            
-            # Predição
-            predicted_class = self.model.predict(X_scaled)[0]
-            probabilities = self.model.predict_proba(X_scaled)[0]
-            
-            # Mapear probabilidades para classes
-            prob_dict = dict(zip(
-                self.model.classes_,
-                probabilities
-            ))
-            
-            # Score baseado nas probabilidades
-            lead_score = (
-                prob_dict.get('high', 0) * 100 +
-                prob_dict.get('medium', 0) * 60 +
-                prob_dict.get('low', 0) * 20
-            )
+            prediction_time = time.perf_counter() - start
             
-            # Feature importance
-            feature_importance = dict(zip(
-                self.feature_columns,
-                self.model.feature_importances_
-            ))
-            
-            prediction_time = (datetime.now() - start_time).total_seconds()
-            
-            return ModelPrediction(
-                lead_score=lead_score,
-                confidence=max(probabilities),
-                classification=predicted_class,
-                probability_distribution=prob_dict,
-                feature_importance=feature_importance,
-                model_name=self.model_name,
-                prediction_time=prediction_time,
-                metadata={
-                    'input_features': len(self.feature_columns),
-                    'model_type': 'RandomForestClassifier'
-                }
+            # Score baseado nas probabilidades, calculado para o lote inteiro
+            # (classe ausente do treinamento conta 0)
+            class_probabilities = dict(zip(self.model.classes_, probabilities_batch.T))
+            missing = np.zeros(len(probabilities_batch))
+            lead_scores = (
+                class_probabilities.get('high', missing) * 100 +
+                class_probabilities.get('medium', missing) * 60 +
+                class_probabilities.get('low', missing) * 20
             )
+            confidences = probabilities_batch.max(axis=1)
+            
+            predictions = []
+            for predicted_class, probabilities, lead_score, confidence in zip(
+                    predicted_classes, probabilities_batch, lead_scores, confidences):
+                # Mapear probabilidades para classes
+                prob_dict = dict(zip(
+                    self.model.classes_,
+                    probabilities
+                ))
+                
+                predictions.append(ModelPrediction(
+                    lead_score=lead_score,
+                    confidence=confidence,
+                    classification=predicted_class,
+                    probability_distribution=prob_dict,
+                    feature_importance=self._feature_importance,
+                    model_name=self.model_name,
+                    prediction_time=prediction_time,
+                    metadata={
+                        'input_features': len(self.feature_columns),
+                        'model_type': 'RandomForestClassifier'
+                    }
+                ))
+            
+            return predictions
             
         except Exception as e:
             logger.error(f"Erro na predição Random Forest: {e}")
-            return self._create_dummy_prediction()
+            return [self._create_dummy_prediction() for _ in range(len(X))]
     
     def _create_dummy_performance(self) -> ModelPerformance:
         """Cria performance dummy para casos de erro"""
@@ -380,14 +657,15 @@ class GradientBoostingLeadScorer(LeadScoringModel):
                 X, y, test_size=0.2, random_state=42
             )
             
-            # Escalar features
-            self.scaler = StandardScaler()
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Escalar features (float32 contíguo, escalado no próprio buffer)
+            self.scaler = StandardScaler(copy=False)
+            X_train_scaled = self.scaler.fit_transform(np.ascontiguousarray(X_train, dtype=np.float32))
+            X_test_scaled = self.scaler.transform(np.ascontiguousarray(X_test, dtype=np.float32))
             
             # Treinar modelo
             self.model.fit(X_train_scaled, y_train)
-            self.feature_columns = list(X.columns)
+            self._set_feature_columns(X.columns)
+            self.refresh_feature_importance()
             self.is_trained = True
             
             # Avaliar performance
@@ -400,15 +678,13 @@ class GradientBoostingLeadScorer(LeadScoringModel):
             # Cross-validation (ajustar CV baseado no tamanho dos dados)
             cv_folds = min(3, len(X_train) // 2) if len(X_train) >= 4 else 2
             if cv_folds >= 2:
-                cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=cv_folds)
+                cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=cv_folds, n_jobs=-1)
             else:
-                cv_scores = [self.model.score(X_train_scaled, y_train)]
+                # Sem folds suficientes não há validação: não reavaliar no próprio treino
+                cv_scores = np.array([np.nan])
             
             # Feature importance
-            feature_importance = dict(zip(
-                self.feature_columns,
-                self.model.feature_importances_
-            ))
+            feature_importance = dict(self._feature_importance)
             
             training_time = (datetime.now() - start_time).total_seconds()
             
@@ -450,78 +726,72 @@ class GradientBoostingLeadScorer(LeadScoringModel):
     
     def predict(self, features: FeatureSet) -> ModelPrediction:
         """Faz predição com Gradient Boosting"""
-        start_time = datetime.now()
+        return self.predict_batch([features])[0]
+    
+    def predict_batch(self, features_list: List[FeatureSet]) -> List[ModelPrediction]:
+        """Faz predição com Gradient Boosting para vários documentos numa única chamada ao modelo"""
+        start = time.perf_counter()
         
         if not self.is_trained or not SKLEARN_AVAILABLE:
-            return self._create_dummy_prediction()
+            return [self._create_dummy_prediction() for _ in features_list]
         
+        return self._predict_from_array(self._feature_matrix(features_list), start)
+    
+    def _predict_from_array(self, X: np.ndarray, start: float) -> List[ModelPrediction]:
+        """Predição Gradient Boosting a partir de uma matriz de _feature_matrix (não modificada)"""
         try:
-            # Converter para DataFrame
-            features_df = feature_engineer.features_to_dataframe([features])
-            X = self.preprocess_features(features_df)
+            # Escalar
+            X_scaled = self._scale_features(X)
             
-            # Garantir que as colunas sejam as mesmas do treinamento
-            X = X.reindex(columns=self.feature_columns, fill_value=0)
+            # Predição (uma chamada para o lote inteiro): ONNX quando exportado; no sklearn
+            # a matriz já é finita, então ele não precisa varrê-la de novo atrás de NaN/inf
+            if self._onnx_session is not None:
+                predicted_scores = self._onnx_session.run(
+                    None, {ONNX_INPUT_NAME: X_scaled}
+                )[0][:, 0].astype(np.float64)
+            else:
+                with config_context(assume_finite=True):
+                    predicted_scores = self.model.predict(X_scaled)
             
-            # Escalar
-            X_scaled = self.scaler.transform(X)
+            prediction_time = time.perf_counter() - start
             
-            # Predição
-            predicted_score = self.model.predict(X_scaled)[0]
+            # Limitar score entre 0 e 100 (fmin/fmax: NaN vira 100, como min/max escalares)
+            predicted_scores = np.fmax(0.0, np.fmin(100.0, predicted_scores))
             
-            # Limitar score entre 0 e 100
-            predicted_score = max(0, min(100, predicted_score))
+            # Classificação baseada no score (low < 50 <= medium < 80 <= high)
+            class_indices = (predicted_scores >= 50).astype(np.intp) + (predicted_scores >= 80)
             
-            # Classificação baseada no score
-            if predicted_score >= 80:
-                classification = 'high'
-                confidence = 0.9
-            elif predicted_score >= 50:
-                classification = 'medium'
-                confidence = 0.7
-            else:
-                classification = 'low'
-                confidence = 0.8
+            # Probabilidades aproximadas, uma linha da tabela por score
+            probability_rows = _score_probability_rows(predicted_scores)
             
-            # Probabilidades aproximadas
-            prob_dict = self._score_to_probabilities(predicted_score)
+            predictions = []
+            for predicted_score, class_index, probabilities in zip(
+                    predicted_scores.tolist(), class_indices.tolist(), probability_rows):
+                classification, confidence = GB_CLASSIFICATION[class_index]
+                
+                predictions.append(ModelPrediction(
+                    lead_score=predicted_score,
+                    confidence=confidence,
+                    classification=classification,
+                    probability_distribution=dict(zip(ENSEMBLE_CLASSES, probabilities)),
+                    feature_importance=self._feature_importance,
+                    model_name=self.model_name,
+                    prediction_time=prediction_time,
+                    metadata={
+                        'input_features': len(self.feature_columns),
+                        'model_type': 'GradientBoostingRegressor'
+                    }
+                ))
             
-            # Feature importance
-            feature_importance = dict(zip(
-                self.feature_columns,
-                self.model.feature_importances_
-            ))
-            
-            prediction_time = (datetime.now() - start_time).total_seconds()
-            
-            return ModelPrediction(
-                lead_score=predicted_score,
-                confidence=confidence,
-                classification=classification,
-                probability_distribution=prob_dict,
-                feature_importance=feature_importance,
-                model_name=self.model_name,
-                prediction_time=prediction_time,
-                metadata={
-                    'input_features': len(self.feature_columns),
-                    'model_type': 'GradientBoostingRegressor'
-                }
-            )
+            return predictions
             
         except Exception as e:
             logger.error(f"Erro na predição Gradient Boosting: {e}")
-            return self._create_dummy_prediction()
+            return [self._create_dummy_prediction() for _ in range(len(X))]
     
     def _score_to_probabilities(self, score: float) -> Dict[str, float]:
         """Converte score numérico para distribuição de probabilidades"""
-        if score >= 80:
-            return {'high': 0.8, 'medium': 0.15, 'low': 0.05}
-        elif score >= 60:
-            return {'high': 0.4, 'medium': 0.5, 'low': 0.1}
-        elif score >= 40:
-            return {'high': 0.1, 'medium': 0.6, 'low': 0.3}
-        else:
-            return {'high': 0.05, 'medium': 0.2, 'low': 0.75}
+        return dict(zip(ENSEMBLE_CLASSES, _score_probability_rows(np.array([score]))[0]))
     
     def _create_dummy_performance(self) -> ModelPerformance:
         """Cria performance dummy para casos de erro"""
@@ -589,7 +859,11 @@ class EnsembleLeadScorer:
     
     def predict(self, features: FeatureSet) -> ModelPrediction:
         """Faz predição usando ensemble de modelos"""
-        start_time = datetime.now()
+        return self.predict_batch([features])[0]
+    
+    def predict_batch(self, features_list: List[FeatureSet]) -> List[ModelPrediction]:
+        """Faz predição usando ensemble de modelos, com um predict por sub-modelo para o lote"""
+        start = time.perf_counter()
         
         # Initialize models with global instances if not already done
         if not self.models:
@@ -597,22 +871,39 @@ class EnsembleLeadScorer:
         
         if not self.is_trained:
             logger.warning("Ensemble não está treinado")
-            return self._create_dummy_prediction()
+            return [self._create_dummy_prediction() for _ in features_list]
         
-        predictions = {}
+        model_predictions = {}
         total_weight = 0
         
-        # Obter predições de todos os modelos
+        # Obter predições de todos os modelos; modelos com as mesmas colunas
+        # compartilham a matriz de features (cada um aplica só o próprio scaler)
+        X = None
+        columns = None
         for model_name, model in self.models.items():
             if model.is_trained:
-                pred = model.predict(features)
-                predictions[model_name] = pred
+                if X is None or model.feature_columns != columns:
+                    columns = model.feature_columns
+                    X = model._feature_matrix(features_list)
+                model_predictions[model_name] = model._predict_from_array(X, time.perf_counter())
                 total_weight += self.weights[model_name]
         
-        if not predictions:
+        if not model_predictions:
             logger.warning(f"Nenhum modelo individual está treinado: RF={self.models['random_forest'].is_trained}, GB={self.models['gradient_boosting'].is_trained}")
-            return self._create_dummy_prediction()
+            return [self._create_dummy_prediction() for _ in features_list]
         
+        return [
+            self._combine_predictions(
+                {model_name: preds[i] for model_name, preds in model_predictions.items()},
+                total_weight,
+                start
+            )
+            for i in range(len(features_list))
+        ]
+    
+    def _combine_predictions(self, predictions: Dict[str, ModelPrediction],
+                             total_weight: float, start: float) -> ModelPrediction:
+        """Combina as predições dos sub-modelos para um documento"""
         # Combinar predições
         weighted_score = sum(
             pred.lead_score * self.weights[model_name] 
@@ -633,23 +924,35 @@ class EnsembleLeadScorer:
         else:
             classification = 'low'
         
+        # Pesos normalizados, uma linha por modelo nas matrizes abaixo
+        model_weights = [self.weights[model_name] / total_weight for model_name in predictions]
+        
         # Combinar probabilidades
-        combined_probs = {'high': 0, 'medium': 0, 'low': 0}
-        for model_name, pred in predictions.items():
-            weight = self.weights[model_name] / total_weight
-            for class_name, prob in pred.probability_distribution.items():
-                combined_probs[class_name] += prob * weight
-        
-        # Combinar feature importance
-        combined_importance = {}
-        for model_name, pred in predictions.items():
-            weight = self.weights[model_name] / total_weight
-            for feature, importance in pred.feature_importance.items():
-                if feature not in combined_importance:
-                    combined_importance[feature] = 0
-                combined_importance[feature] += importance * weight
-        
-        prediction_time = (datetime.now() - start_time).total_seconds()
+        probabilities = np.array([
+            [pred.probability_distribution.get(class_name, 0.0) for class_name in ENSEMBLE_CLASSES]
+            for pred in predictions.values()
+        ])
+        combined_probs = dict(zip(ENSEMBLE_CLASSES, _weighted_sum(probabilities, model_weights).tolist()))
+        
+        # Combinar feature importance: com as mesmas colunas em todos os modelos,
+        # soma ponderada dos vetores em cache; senão, junção dos dicionários
+        scorers = [self.models[model_name] for model_name in predictions]
+        columns = scorers[0].feature_columns
+        if all(scorer._importance_vector is not None and
+               pred.feature_importance is scorer._feature_importance and
+               scorer.feature_columns == columns
+               for scorer, pred in zip(scorers, predictions.values())):
+            importances = np.vstack([scorer._importance_vector for scorer in scorers])
+            combined_importance = dict(zip(columns, _weighted_sum(importances, model_weights).tolist()))
+        else:
+            combined_importance = {}
+            for weight, pred in zip(model_weights, predictions.values()):
+                for feature, importance in pred.feature_importance.items():
+                    if feature not in combined_importance:
+                        combined_importance[feature] = 0
+                    combined_importance[feature] += importance * weight
+        
+        prediction_time = time.perf_counter() - start
         
         return ModelPrediction(
             lead_score=weighted_score,
@@ -679,7 +982,69 @@ class EnsembleLeadScorer:
             metadata={'error': 'Ensemble não treinado'}
         )
 
+class BatchedPredictor:
+    """Agrupa predições concorrentes (ex. requisições HTTP) num único predict_batch
+    
+    Cada chamada a predict entra numa fila, descarregada quando chega a
+    max_batch_size ou após max_latency_ms: uma chamada ao modelo para o lote
+    inteiro em vez de uma por documento.
+    """
+    
+    def __init__(self, scorer, max_batch_size: int = 128, max_latency_ms: float = 5.0):
+        self.scorer = scorer
+        self.max_batch_size = max_batch_size
+        self.max_latency_ms = max_latency_ms
+        self._pending: List[Tuple[FeatureSet, asyncio.Future]] = []
+        self._flush_handle = None
+        self._tasks = set()
+    
+    async def predict(self, features: FeatureSet) -> ModelPrediction:
+        """Faz predição de um documento junto com o lote em que ele cair"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_latency_ms / 1000, self._flush)
+        
+        return await future
+    
+    def _flush(self) -> None:
+        """Despacha o lote pendente"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[FeatureSet, asyncio.Future]]) -> None:
+        """Roda predict_batch numa thread (sem bloquear o event loop) e entrega os resultados"""
+        loop = asyncio.get_running_loop()
+        try:
+            predictions = await loop.run_in_executor(
+                None, self.scorer.predict_batch, [features for features, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Erro na predição em lote: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), prediction in zip(batch, predictions):
+            if not future.done():  # quem esperava pode ter cancelado
+                future.set_result(prediction)
+
 # Instâncias globais dos modelos
 random_forest_model = RandomForestLeadScorer()
 gradient_boosting_model = GradientBoostingLeadScorer()
-ensemble_model = EnsembleLeadScorer() 
\ No newline at end of file
+ensemble_model = EnsembleLeadScorer()
+
+# Ponto de entrada assíncrono do ensemble com agrupamento de requisições
+batched_ensemble_model = BatchedPredictor(ensemble_model) 
\ No newline at end of file
@@ -5,6 +5,10 @@ Extração de texto de imagens com suporte a múltiplos idiomas
 
 import os
 import logging
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 import json
@@ -18,6 +22,14 @@ except ImportError as e:
     TESSERACT_AVAILABLE = False
     logging.warning(f"Tesseract não está disponível: {e}")
 
+# API in-process do Tesseract (opcional): um handle persistente em vez de um
+# processo tesseract por imagem
+try:
+    from tesserocr import PyTessBaseAPI, RIL, iterate_level
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 class TesseractEngine:
@@ -50,6 +62,9 @@ class TesseractEngine:
         'default': 3        # Default (based on what is available)
     }
     
+    # Imagens por invocação do tesseract em batch_extract (lista de arquivos)
+    BATCH_CHUNK_SIZE = 50
+    
     def __init__(self, 
                  languages: List[str] = None,
                  psm_mode: str = 'auto',
@@ -81,8 +96,31 @@ class TesseractEngine:
         # Verificar idiomas disponíveis
         self._verify_languages()
         
+        # Handle tesserocr persistente (idiomas carregados uma vez); o lock
+        # serializa o uso, já que a API não é thread-safe
+        self._api = None
+        self._api_lock = threading.Lock()
+        if TESSEROCR_AVAILABLE:
+            try:
+                self._api = PyTessBaseAPI(
+                    lang='+'.join(self.languages),
+                    psm=self.PSM_MODES.get(self.psm_mode, 3),
+                    oem=self.OEM_MODES.get(self.oem_mode, 3)
+                )
+            except Exception as e:
+                logger.warning(f"tesserocr não inicializou, usando pytesseract: {e}")
+        
         logger.info(f"TesseractEngine inicializado - Idiomas: {self.languages}")
     
+    def close(self):
+        """Libera o handle tesserocr (se houver)"""
+        api, self._api = getattr(self, '_api', None), None
+        if api is not None:
+            api.End()
+    
+    def __del__(self):
+        self.close()
+    
     def _verify_tesseract(self):
         """Verifica se o Tesseract está instalado e funcionando"""
         try:
@@ -140,41 +178,29 @@ class TesseractEngine:
             # Configuração base do Tesseract
             config = self._build_config(custom_config)
             
-            # Extrair texto
-            text = pytesseract.image_to_string(
-                image, 
-                lang=lang_string,
-                config=config
-            )
-            
-            # Obter dados detalhados (incluindo confiança)
-            data = pytesseract.image_to_data(
-                image,
-                lang=lang_string,
-                config=config,
-                output_type=pytesseract.Output.DICT
-            )
-            
-            # Calcular estatísticas
-            stats = self._calculate_stats(data, confidence_threshold)
-            
-            # Detectar idioma principal
-            detected_lang = self._detect_language(text)
-            
-            result = {
-                'text': text.strip(),
-                'image_path': image_path,
-                'languages_used': self.languages,
-                'detected_language': detected_lang,
-                'confidence_stats': stats,
-                'word_count': len(text.split()),
-                'char_count': len(text),
-                'extraction_timestamp': datetime.now().isoformat(),
-                'tesseract_config': config
-            }
+            if self._api is not None and not custom_config:
+                # Texto e confiança por palavra numa única passada do handle persistente
+                with self._api_lock:
+                    self._api.SetImage(image)
+                    text = self._api.GetUTF8Text()
+                    data = {'conf': self._api.AllWordConfidences()}
+            else:
+                # Extrair texto
+                text = pytesseract.image_to_string(
+                    image, 
+                    lang=lang_string,
+                    config=config
+                )
+                
+                # Obter dados detalhados (incluindo confiança)
+                data = pytesseract.image_to_data(
+                    image,
+                    lang=lang_string,
+                    config=config,
+                    output_type=pytesseract.Output.DICT
+                )
             
-            logger.info(f"Texto extraído: {len(text)} caracteres, confiança média: {stats['avg_confidence']:.1f}%")
-            return result
+            return self._build_result(image_path, text, data, confidence_threshold, config)
             
         except Exception as e:
             logger.error(f"Erro ao extrair texto de {image_path}: {e}")
@@ -185,6 +211,34 @@ class TesseractEngine:
                 'extraction_timestamp': datetime.now().isoformat()
             }
     
+    def _build_result(self, image_path: str, text: str, data: Dict,
+                      confidence_threshold: float, config: str) -> Dict[str, Any]:
+        """Monta o resultado de extract_text a partir do texto e das confianças do Tesseract"""
+        # Contagens sobre o texto sem espaços/form feed das pontas: pytesseract, tesserocr e a
+        # lista de arquivos (que já separa as páginas no form feed) dão o mesmo char_count
+        text = text.strip()
+        
+        # Calcular estatísticas
+        stats = self._calculate_stats(data, confidence_threshold)
+        
+        # Detectar idioma principal
+        detected_lang = self._detect_language(text)
+        
+        result = {
+            'text': text,
+            'image_path': image_path,
+            'languages_used': self.languages,
+            'detected_language': detected_lang,
+            'confidence_stats': stats,
+            'word_count': len(text.split()),
+            'char_count': len(text),
+            'extraction_timestamp': datetime.now().isoformat(),
+            'tesseract_config': config
+        }
+        
+        logger.info(f"Texto extraído: {len(text)} caracteres, confiança média: {stats['avg_confidence']:.1f}%")
+        return result
+    
     def extract_text_with_boxes(self, image_path: str) -> Dict[str, Any]:
         """
         Extrai texto com informações de posicionamento (bounding boxes)
@@ -197,31 +251,11 @@ class TesseractEngine:
         """
         try:
             image = Image.open(image_path)
-            lang_string = '+'.join(self.languages)
-            config = self._build_config()
-            
-            # Extrair dados com coordenadas
-            data = pytesseract.image_to_data(
-                image,
-                lang=lang_string,
-                config=config,
-                output_type=pytesseract.Output.DICT
-            )
             
-            # Processar dados para extrair palavras com posições
-            words_with_boxes = []
-            for i in range(len(data['text'])):
-                if int(data['conf'][i]) > 0:  # Apenas palavras com confiança > 0
-                    word_info = {
-                        'text': data['text'][i],
-                        'confidence': int(data['conf'][i]),
-                        'left': int(data['left'][i]),
-                        'top': int(data['top'][i]),
-                        'width': int(data['width'][i]),
-                        'height': int(data['height'][i]),
-                        'level': int(data['level'][i])
-                    }
-                    words_with_boxes.append(word_info)
+            if self._api is not None:
+                words_with_boxes = self._words_with_boxes_from_api(image)
+            else:
+                words_with_boxes = self._words_with_boxes_from_data(image)
             
             # Texto completo
             full_text = ' '.join([word['text'] for word in words_with_boxes if word['text'].strip()])
@@ -244,9 +278,65 @@ class TesseractEngine:
                 'extraction_timestamp': datetime.now().isoformat()
             }
     
+    def _words_with_boxes_from_api(self, image) -> List[Dict[str, Any]]:
+        """Palavras com posições direto do iterador do tesserocr (sem TSV)"""
+        words_with_boxes = []
+        level = RIL.WORD
+        
+        with self._api_lock:
+            self._api.SetImage(image)
+            self._api.Recognize()
+            
+            for word in iterate_level(self._api.GetIterator(), level):
+                confidence = int(word.Confidence(level))
+                if confidence > 0:  # Apenas palavras com confiança > 0
+                    left, top, right, bottom = word.BoundingBox(level)
+                    words_with_boxes.append({
+                        'text': word.GetUTF8Text(level) or '',
+                        'confidence': confidence,
+                        'left': left,
+                        'top': top,
+                        'width': right - left,
+                        'height': bottom - top,
+                        'level': 5  # nível "palavra" do image_to_data
+                    })
+        
+        return words_with_boxes
+    
+    def _words_with_boxes_from_data(self, image) -> List[Dict[str, Any]]:
+        """Palavras com posições via pytesseract.image_to_data"""
+        lang_string = '+'.join(self.languages)
+        config = self._build_config()
+        
+        # Extrair dados com coordenadas
+        data = pytesseract.image_to_data(
+            image,
+            lang=lang_string,
+            config=config,
+            output_type=pytesseract.Output.DICT
+        )
+        
+        # Processar dados para extrair palavras com posições
+        words_with_boxes = []
+        for i in range(len(data['text'])):
+            if int(data['conf'][i]) > 0:  # Apenas palavras com confiança > 0
+                word_info = {
+                    'text': data['text'][i],
+                    'confidence': int(data['conf'][i]),
+                    'left': int(data['left'][i]),
+                    'top': int(data['top'][i]),
+                    'width': int(data['width'][i]),
+                    'height': int(data['height'][i]),
+                    'level': int(data['level'][i])
+                }
+                words_with_boxes.append(word_info)
+        
+        return words_with_boxes
+    
     def batch_extract(self, image_paths: List[str], 
                      output_dir: str = None,
-                     save_individual: bool = True) -> Dict[str, Any]:
+                     save_individual: bool = True,
+                     max_workers: Optional[int] = None) -> Dict[str, Any]:
         """
         Extrai texto de múltiplas imagens em lote
         
@@ -254,6 +344,8 @@ class TesseractEngine:
             image_paths: Lista de caminhos das imagens
             output_dir: Diretório para salvar resultados
             save_individual: Salvar resultado de cada imagem individualmente
+            max_workers: Processos de OCR em paralelo (padrão: os.cpu_count());
+                reduza em máquinas com poucos núcleos para não disputar CPU
             
         Returns:
             Dicionário com resultados consolidados
@@ -266,10 +358,22 @@ class TesseractEngine:
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
         
-        for i, image_path in enumerate(image_paths, 1):
-            logger.info(f"Processando imagem {i}/{len(image_paths)}: {Path(image_path).name}")
-            
-            result = self.extract_text(image_path)
+        max_workers = max_workers or os.cpu_count() or 1
+        
+        # Blocos de até BATCH_CHUNK_SIZE imagens, pequenos o bastante para ocupar todos os workers
+        chunk_size = max(1, min(self.BATCH_CHUNK_SIZE, -(-len(image_paths) // max_workers)))
+        chunks = [image_paths[start:start + chunk_size]
+                  for start in range(0, len(image_paths), chunk_size)]
+        
+        if max_workers > 1 and len(chunks) > 1:
+            extracted = self._extract_chunks_in_pool(chunks, max_workers)
+        else:
+            extracted = []
+            for chunk in chunks:
+                extracted.extend(self._extract_chunk(chunk))
+        
+        for i, (image_path, result) in enumerate(zip(image_paths, extracted), 1):
+            logger.info(f"Imagem {i}/{len(image_paths)} processada: {Path(image_path).name}")
             results.append(result)
             
             if 'text' in result and result['text']:
@@ -318,6 +422,114 @@ class TesseractEngine:
         logger.info(f"Lote processado: {batch_result['successful_extractions']}/{batch_result['total_images']} sucessos")
         return batch_result
     
+    def _extract_chunk(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """Extrai um bloco de imagens pelo handle tesserocr ou, sem ele, por lista de arquivos"""
+        if self._api is None:
+            # Sem handle persistente: um processo tesseract por bloco de imagens
+            return self._batch_extract_via_filelist(image_paths)
+        return [self.extract_text(image_path) for image_path in image_paths]
+    
+    def _extract_chunks_in_pool(self, chunks: List[List[str]],
+                                max_workers: int) -> List[Dict[str, Any]]:
+        """
+        Processa os blocos em um ProcessPoolExecutor, mantendo a ordem de entrada
+        
+        Os workers sempre usam a lista de arquivos (um processo tesseract por
+        bloco, lançado com OMP_THREAD_LIMIT=1), nunca o handle tesserocr: a
+        libgomp já carregada no worker leu o ambiente antes do initializer, então
+        o limite só vale para os subprocessos. Um tesseract single-thread por
+        núcleo rende mais que poucos processos disputando threads OpenMP.
+        O pool usa spawn: este processo pode ter threads e um handle tesserocr
+        ativo, que não devem ser copiados por fork. Bloco cujo worker falhar é
+        refeito neste processo.
+        """
+        engine_args = (self.languages, self.psm_mode, self.oem_mode,
+                       pytesseract.pytesseract.tesseract_cmd)
+        total_images = sum(len(chunk) for chunk in chunks)
+        chunk_results = [None] * len(chunks)
+        done_images = 0
+        
+        # OMP_THREAD_LIMIT definido só no ambiente dos workers (este processo não é alterado)
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks)),
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_ocr_worker) as executor:
+            futures = {
+                executor.submit(_extract_chunk_in_worker, engine_args, chunk): index
+                for index, chunk in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    chunk_results[index] = future.result()
+                except Exception as e:
+                    logger.warning(f"Worker de OCR falhou ({e}), refazendo bloco {index + 1} localmente")
+                    continue
+                done_images += len(chunks[index])
+                logger.info(f"Bloco {index + 1}/{len(chunks)} concluído ({done_images}/{total_images} imagens)")
+        
+        results = []
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            results.extend(chunk_result if chunk_result is not None else self._extract_chunk(chunk))
+        return results
+    
+    def _batch_extract_via_filelist(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        Extrai texto de várias imagens passando ao tesseract uma lista de arquivos
+        
+        Uma invocação de image_to_string e uma de image_to_data por bloco de
+        BATCH_CHUNK_SIZE imagens (blocos menores evitam travar no pipe de saída),
+        em vez de duas por imagem. O texto de cada imagem termina em form feed e o
+        TSV numera as imagens em page_num; se a saída não bater com o bloco, o
+        bloco é refeito imagem a imagem.
+        """
+        lang_string = '+'.join(self.languages)
+        config = self._build_config()
+        results = []
+        
+        for start in range(0, len(image_paths), self.BATCH_CHUNK_SIZE):
+            chunk = image_paths[start:start + self.BATCH_CHUNK_SIZE]
+            
+            try:
+                with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False,
+                                                 encoding='utf-8') as list_file:
+                    list_file.write('\n'.join(os.path.abspath(path) for path in chunk) + '\n')
+                try:
+                    output = pytesseract.image_to_string(
+                        list_file.name,
+                        lang=lang_string,
+                        config=config
+                    )
+                    data = pytesseract.image_to_data(
+                        list_file.name,
+                        lang=lang_string,
+                        config=config,
+                        output_type=pytesseract.Output.DICT
+                    )
+                finally:
+                    os.unlink(list_file.name)
+                
+                texts = output.split('\x0c')
+                if len(texts) > len(chunk) and not any(t.strip() for t in texts[len(chunk):]):
+                    texts = texts[:len(chunk)]
+                if len(texts) != len(chunk):
+                    raise ValueError(f"{len(texts)} páginas na saída para {len(chunk)} imagens")
+                
+            except Exception as e:
+                logger.warning(f"OCR por lista de arquivos falhou ({e}), processando imagem a imagem")
+                results.extend(self.extract_text(image_path) for image_path in chunk)
+                continue
+            
+            # Confianças agrupadas por imagem (page_num começa em 1)
+            confidences_by_page = {}
+            for page_num, conf in zip(data['page_num'], data['conf']):
+                confidences_by_page.setdefault(int(page_num), []).append(conf)
+            
+            for page_num, (image_path, text) in enumerate(zip(chunk, texts), 1):
+                page_data = {'conf': confidences_by_page.get(page_num, [])}
+                results.append(self._build_result(image_path, text, page_data, 0.0, config))
+        
+        return results
+    
     def _build_config(self, custom_config: str = None) -> str:
         """Constrói string de configuração do Tesseract"""
         if custom_config:
@@ -386,5 +598,23 @@ class TesseractEngine:
             logger.error(f"Erro ao obter idiomas disponíveis: {e}")
             return {}
 
+# Engine de cada processo do pool de batch_extract (criado no primeiro bloco recebido)
+_worker_engine = None
+
+def _init_ocr_worker():
+    """Inicializa um worker de batch_extract: subprocessos tesseract lançados por ele rodam single-thread"""
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+def _extract_chunk_in_worker(engine_args: Tuple, image_paths: List[str]) -> List[Dict[str, Any]]:
+    """Ponto de entrada dos workers de batch_extract (função de módulo para não serializar o engine)"""
+    global _worker_engine
+    if _worker_engine is None:
+        languages, psm_mode, oem_mode, tesseract_cmd = engine_args
+        _worker_engine = TesseractEngine(languages, psm_mode, oem_mode, tesseract_cmd)
+        # Sem handle tesserocr: o OMP_THREAD_LIMIT do initializer não chega à libgomp
+        # já carregada neste processo, só aos subprocessos da lista de arquivos
+        _worker_engine.close()
+    return _worker_engine._extract_chunk(image_paths)
+
 # Instância global do engine
 tesseract_engine = TesseractEngine() 
\ No newline at end of file
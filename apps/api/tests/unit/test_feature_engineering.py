@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Testes de feature engineering
+Valida a conversão de FeatureSets em matriz e o cache de matrizes
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# Add the api directory to the path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ml_engine.feature_engineering import FeatureMatrixCache, FeatureSet, feature_engineer
+
+COLUMNS = ('text_length', 'word_count', 'sentence_count', 'paragraph_count')
+
+
+def _features(job_id, rows, created_at='2026-01-01T00:00:00'):
+    return [FeatureSet(job_id=job_id, page_number=page, text_length=100 + page, word_count=page,
+                       created_at=created_at)
+            for page in range(rows)]
+
+
+def test_feature_matrix_cache_reuses_matrix():
+    """Mesma população reutiliza a matriz; sem created_at não passa pelo cache"""
+    cache = FeatureMatrixCache()
+    features = _features('job-1', 10)
+
+    X = cache.get_matrix(features, COLUMNS)
+    np.testing.assert_array_equal(X, feature_engineer.features_to_matrix(features, COLUMNS))
+    assert cache.get_matrix(features, COLUMNS) is X
+    assert not X.flags.writeable
+
+    assert cache.get_matrix(_features('job-2', 10, created_at=''), COLUMNS) is not None
+    assert cache.nbytes == X.nbytes
+
+
+def test_feature_matrix_cache_bounded_by_bytes():
+    """Total de bytes limitado (LRU) e lotes acima de max_entry_bytes não são guardados"""
+    row_bytes = len(COLUMNS) * 4
+    cache = FeatureMatrixCache(max_bytes=25 * row_bytes, max_entry_bytes=20 * row_bytes)
+
+    first = cache.get_matrix(_features('job-1', 10), COLUMNS)
+    cache.get_matrix(_features('job-2', 10), COLUMNS)
+    assert cache.nbytes == 20 * row_bytes
+
+    # Terceira matriz estoura max_bytes: a menos recente (job-1) sai
+    cache.get_matrix(_features('job-3', 10), COLUMNS)
+    assert cache.nbytes == 20 * row_bytes
+    assert cache.get_matrix(_features('job-1', 10), COLUMNS) is not first
+
+    # Lote grande: calculado, mas não guardado
+    big = _features('job-big', 21)
+    X = cache.get_matrix(big, COLUMNS)
+    assert X.shape == (21, len(COLUMNS))
+    assert cache.get_matrix(big, COLUMNS) is not X
+    assert cache.nbytes <= cache.max_bytes
+
+    cache.clear()
+    assert cache.nbytes == 0
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Testes do sistema de feedback
+Valida a extração de features de treino a partir das colunas JSON dos jobs
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+# Add the api directory to the path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ml_engine.feedback_integration import FEATURE_VECTOR_SIZE, FeedbackIntegrationSystem
+
+
+def _job_row(financial_data, business_indicators):
+    return SimpleNamespace(
+        id='job-1',
+        filename='edital_leilao.pdf',
+        keywords=['leilão', 'imóvel', 'judicial'],
+        entities={'persons': ['Fulano', 'Beltrano']},
+        financial_data=financial_data,
+        business_indicators=business_indicators,
+        lead_score=70.0,
+    )
+
+
+def test_extract_features_from_job():
+    """Valores JSON numéricos são escritos nas 11 primeiras posições"""
+    row = _job_row(
+        {'amounts': [1, 2, 3], 'total_value': 350000, 'max_value': 250000.5},
+        {'legal_score': 0.8, 'risk_score': 0.3, 'viability_score': 0.6},
+    )
+    out = np.zeros(FEATURE_VECTOR_SIZE, dtype=np.float32)
+
+    FeedbackIntegrationSystem()._extract_features_from_job(row, out)
+
+    expected = np.array([17, 3, 2, 0.9, 0.7, 3, 350000, 250000.5, 0.8, 0.3, 0.6], dtype=np.float32)
+    np.testing.assert_array_equal(out[:11], expected)
+    assert not out[11:].any()
+
+
+def test_extract_features_from_job_null_fields():
+    """Campos JSON null ou não numéricos usam o default em vez de abortar o dataset"""
+    row = _job_row(
+        {'amounts': [], 'total_value': None, 'max_value': '1250.5'},
+        {'legal_score': None, 'risk_score': 'n/a', 'viability_score': None},
+    )
+    out = np.zeros(FEATURE_VECTOR_SIZE, dtype=np.float32)
+
+    FeedbackIntegrationSystem()._extract_features_from_job(row, out)
+
+    np.testing.assert_array_equal(out[5:11], np.array([0, 0, 1250.5, 0, 0.5, 0.5], dtype=np.float32))
+
+    # Colunas JSON inteiras nulas
+    out = np.zeros(FEATURE_VECTOR_SIZE, dtype=np.float32)
+    FeedbackIntegrationSystem()._extract_features_from_job(_job_row(None, None), out)
+    np.testing.assert_array_equal(out[5:11], np.array([0, 0, 0, 0, 0.5, 0.5], dtype=np.float32))
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Testes dos modelos de lead scoring
+Valida predição em lote, o agrupamento assíncrono do BatchedPredictor
+e a persistência do histórico de treinos e do scaler
+"""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pytest
+
+# Add the api directory to the path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ml_engine.feature_engineering import FeatureSet
+from ml_engine.lead_scoring_models import (
+    BatchedPredictor, EnsembleLeadScorer, GradientBoostingLeadScorer, RandomForestLeadScorer, _FastScaler
+)
+
+
+class _RecordingScorer:
+    """Scorer falso: registra cada lote e devolve o job_id de cada documento"""
+
+    def __init__(self, error=None, release=None):
+        self.batches = []
+        self.error = error
+        self.release = release
+
+    def predict_batch(self, features_list):
+        if self.release is not None:
+            self.release.wait(5)
+        self.batches.append([features.job_id for features in features_list])
+        if self.error is not None:
+            raise self.error
+        return [features.job_id for features in features_list]
+
+
+def _documents(count):
+    return [FeatureSet(job_id=f"job-{i}", page_number=1) for i in range(count)]
+
+
+def test_batched_predictor_flushes_on_size():
+    """Lote cheio é despachado na hora, sem esperar o timer"""
+    scorer = _RecordingScorer()
+    predictor = BatchedPredictor(scorer, max_batch_size=3, max_latency_ms=60_000)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(predictor.predict(features) for features in _documents(3))), timeout=5
+        )
+
+    assert asyncio.run(run()) == ['job-0', 'job-1', 'job-2']
+    assert scorer.batches == [['job-0', 'job-1', 'job-2']]
+
+
+def test_batched_predictor_flushes_on_timer():
+    """Lote incompleto é despachado após max_latency_ms; chamadas seguintes abrem outro lote"""
+    scorer = _RecordingScorer()
+    predictor = BatchedPredictor(scorer, max_batch_size=100, max_latency_ms=5)
+    documents = _documents(5)
+
+    async def run():
+        first = await asyncio.gather(*(predictor.predict(features) for features in documents[:2]))
+        second = await asyncio.gather(*(predictor.predict(features) for features in documents[2:]))
+        return first + second
+
+    assert asyncio.run(run()) == ['job-0', 'job-1', 'job-2', 'job-3', 'job-4']
+    assert scorer.batches == [['job-0', 'job-1'], ['job-2', 'job-3', 'job-4']]
+
+
+def test_batched_predictor_propagates_exception():
+    """Erro do predict_batch chega a todas as chamadas do lote"""
+    scorer = _RecordingScorer(error=ValueError("modelo indisponível"))
+    predictor = BatchedPredictor(scorer, max_batch_size=2, max_latency_ms=5)
+
+    async def run():
+        return await asyncio.gather(*(predictor.predict(features) for features in _documents(2)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(results) == 2
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_batched_predictor_cancelled_caller():
+    """Chamada cancelada não impede a entrega do resultado às demais do lote"""
+    release = threading.Event()
+    scorer = _RecordingScorer(release=release)
+    predictor = BatchedPredictor(scorer, max_batch_size=2, max_latency_ms=60_000)
+    documents = _documents(2)
+
+    async def run():
+        cancelled = asyncio.ensure_future(predictor.predict(documents[0]))
+        kept = asyncio.ensure_future(predictor.predict(documents[1]))
+        await asyncio.sleep(0.01)  # lote despachado; predict_batch bloqueado em release
+
+        cancelled.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await asyncio.wait_for(kept, timeout=5)
+
+    assert asyncio.run(run()) == 'job-1'
+    assert scorer.batches == [['job-0', 'job-1']]
+
+
+def _training_data(count=80, seed=7):
+    """FeatureSets sintéticos com score alvo dependente das features"""
+    rng = np.random.default_rng(seed)
+    features_list, scores = [], []
+    for i in range(count):
+        money = int(rng.integers(0, 10))
+        legal = float(rng.random())
+        risk = float(rng.random())
+        features_list.append(FeatureSet(
+            job_id=f"train-{i}", page_number=1,
+            text_length=int(rng.integers(500, 5000)), word_count=int(rng.integers(50, 800)),
+            money_count=money, total_financial_value=float(rng.random() * 1e6),
+            legal_compliance_score=legal, risk_level_score=risk,
+            created_at=f"2026-01-01T00:00:{i:02d}"
+        ))
+        scores.append(min(100.0, 20 + money * 5 + legal * 40 - risk * 20 + float(rng.normal(0, 5))))
+    return features_list, scores
+
+
+@pytest.fixture
+def trained_scorers(tmp_path, monkeypatch):
+    """Random Forest e Gradient Boosting treinados, salvos em tmp_path/storage/models"""
+    monkeypatch.chdir(tmp_path)
+    features_list, scores = _training_data()
+    random_forest = RandomForestLeadScorer()
+    gradient_boosting = GradientBoostingLeadScorer()
+    # sklearn recente não aceita um numpy Generator como random_state
+    gradient_boosting.model.set_params(random_state=42)
+    random_forest.train(features_list, scores)
+    gradient_boosting.train(features_list, scores)
+    assert random_forest.is_trained and gradient_boosting.is_trained
+    return random_forest, gradient_boosting
+
+
+def _assert_same_prediction(batched, single):
+    assert batched.lead_score == pytest.approx(single.lead_score, abs=1e-9)
+    assert batched.confidence == pytest.approx(single.confidence, abs=1e-9)
+    assert batched.classification == single.classification
+    assert batched.probability_distribution.keys() == single.probability_distribution.keys()
+    for class_name, probability in single.probability_distribution.items():
+        assert batched.probability_distribution[class_name] == pytest.approx(probability, abs=1e-9)
+
+
+def test_predict_batch_matches_predict(trained_scorers):
+    """predict_batch dá, documento a documento, o mesmo resultado de predict"""
+    random_forest, gradient_boosting = trained_scorers
+    documents, _ = _training_data(count=25, seed=11)
+
+    ensemble = EnsembleLeadScorer()
+    ensemble.models = {'random_forest': random_forest, 'gradient_boosting': gradient_boosting}
+    ensemble.is_trained = True
+
+    for scorer in (random_forest, gradient_boosting, ensemble):
+        batched = scorer.predict_batch(documents)
+        assert len(batched) == len(documents)
+        for features, prediction in zip(documents, batched):
+            _assert_same_prediction(prediction, scorer.predict(features))
+
+
+def _history_lines(scorer):
+    return (scorer.model_path / "history.ndjson").read_text(encoding='utf-8').splitlines()
+
+
+def test_training_history_appended_and_reloaded(tmp_path, monkeypatch):
+    """Cada save_model acrescenta só os treinos novos; load_model relê o histórico inteiro"""
+    monkeypatch.chdir(tmp_path)
+    first = {'timestamp': '2026-01-01T00:00:00', 'samples': 64, 'accuracy': 0.75, 'cv_score': 0.7}
+    second = {'timestamp': '2026-01-02T00:00:00', 'samples': 80, 'accuracy': 0.8, 'cv_score': 0.72}
+
+    scorer = RandomForestLeadScorer()
+    scorer.training_history.append(first)
+    assert scorer.save_model()
+    scorer.training_history.append(second)
+    assert scorer.save_model()
+    assert scorer.save_model()  # nada novo: nenhuma linha a mais
+
+    assert [json.loads(line) for line in _history_lines(scorer)] == [first, second]
+    metadata = json.loads((scorer.model_path / "metadata.json").read_text(encoding='utf-8'))
+    assert metadata['last_training'] == second
+    assert 'training_history' not in metadata
+
+    reloaded = RandomForestLeadScorer()
+    reloaded.load_model()
+    assert reloaded.training_history == [first, second]
+
+    # Novo treino após o load: só ele é acrescentado
+    third = dict(second, timestamp='2026-01-03T00:00:00')
+    reloaded.training_history.append(third)
+    assert reloaded.save_model()
+    assert [json.loads(line) for line in _history_lines(reloaded)] == [first, second, third]
+
+
+def test_legacy_training_history_migrated(tmp_path, monkeypatch):
+    """Histórico embutido no metadata.json antigo vai para o history.ndjson no próximo save"""
+    monkeypatch.chdir(tmp_path)
+    legacy = [{'timestamp': '2025-12-01T00:00:00', 'samples': 40, 'accuracy': 0.6, 'cv_score': 0.55},
+              {'timestamp': '2025-12-02T00:00:00', 'samples': 48, 'accuracy': 0.65, 'cv_score': 0.6}]
+
+    scorer = RandomForestLeadScorer()
+    (scorer.model_path / "metadata.json").write_text(json.dumps({
+        'model_name': scorer.model_name,
+        'is_trained': False,
+        'feature_columns': None,
+        'training_history': legacy,
+        'saved_at': '2025-12-02T00:00:00'
+    }), encoding='utf-8')
+
+    scorer.load_model()
+    assert scorer.training_history == legacy
+    assert not (scorer.model_path / "history.ndjson").exists()
+
+    assert scorer.save_model()
+    assert [json.loads(line) for line in _history_lines(scorer)] == legacy
+
+    reloaded = RandomForestLeadScorer()
+    reloaded.load_model()
+    assert reloaded.training_history == legacy
+
+
+def test_fast_scaler_matches_standard_scaler():
+    """_FastScaler.transform reproduz StandardScaler.transform bit a bit, sem alterar a entrada"""
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(3)
+    X_train = (rng.random((200, 12)) * rng.integers(1, 1000, 12)).astype(np.float32)
+    X_train[:, 5] = 7.0  # coluna constante (scale_ = 1)
+    scaler = StandardScaler().fit(X_train)
+    fast = _FastScaler(scaler.mean_, scaler.scale_)
+
+    X = (rng.random((50, 12)) * 500).astype(np.float32)
+    for sample in (X, X.astype(np.float64), X.astype(np.int64)):
+        original = sample.copy()
+        expected = scaler.transform(sample)
+        result = fast.transform(sample)
+        assert result.dtype == expected.dtype
+        np.testing.assert_array_equal(result, expected)
+        np.testing.assert_array_equal(sample, original)
+
+
+def test_scaler_npz_round_trip(trained_scorers):
+    """Modelo recarregado usa o scaler.npz e prediz exatamente como o modelo treinado"""
+    random_forest, gradient_boosting = trained_scorers
+    documents, _ = _training_data(count=25, seed=11)
+
+    for trained, scorer_class in ((random_forest, RandomForestLeadScorer),
+                                  (gradient_boosting, GradientBoostingLeadScorer)):
+        assert (trained.model_path / "scaler.npz").exists()
+
+        reloaded = scorer_class()
+        assert reloaded.load_model()
+        assert isinstance(reloaded.scaler, _FastScaler)
+        np.testing.assert_array_equal(reloaded.scaler.mean_, trained.scaler.mean_)
+        np.testing.assert_array_equal(reloaded.scaler.scale_, trained.scaler.scale_)
+
+        # Padronização da predição igual ao StandardScaler treinado (float32)
+        X = reloaded._feature_matrix(documents)
+        np.testing.assert_array_equal(reloaded._scale_features(X), trained.scaler.transform(X.copy()))
+
+        for reloaded_prediction, trained_prediction in zip(reloaded.predict_batch(documents),
+                                                           trained.predict_batch(documents)):
+            _assert_same_prediction(reloaded_prediction, trained_prediction)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Testes do TesseractEngine
+Valida o OCR em lote por lista de arquivos com o binário do tesseract simulado
+"""
+
+import sys
+import os
+import importlib
+
+import pytest
+
+# Add the api directory to the path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+pytesseract = pytest.importorskip("pytesseract")
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """TesseractEngine sem binário do tesseract (versão/idiomas simulados, sem tesserocr)"""
+    monkeypatch.setattr(pytesseract, "get_tesseract_version", lambda: "5.3.0")
+    monkeypatch.setattr(pytesseract, "get_languages", lambda config='': ['por', 'eng'])
+
+    module = importlib.import_module("ocr.tesseract_engine")
+    engine = module.TesseractEngine()
+    engine.close()  # força o caminho pytesseract mesmo com tesserocr instalado
+    return engine
+
+
+@pytest.fixture
+def images(tmp_path):
+    """Três imagens PNG pequenas em disco"""
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"page_{i}.png"
+        Image.new("L", (8, 8), color=255).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def _fake_tesseract(monkeypatch, pages, calls=None):
+    """Simula image_to_string/image_to_data para lista de arquivos (uma página por linha)"""
+
+    def listed(image):
+        with open(image, encoding='utf-8') as list_file:
+            return list_file.read().split()
+
+    def image_to_string(image, lang=None, config=''):
+        listed_paths = listed(image)
+        if calls is not None:
+            calls.append(listed_paths)
+        return ''.join(pages[os.path.basename(path)] + '\f' for path in listed_paths)
+
+    def image_to_data(image, lang=None, config='', output_type=None):
+        data = {'page_num': [], 'conf': []}
+        for page_num, path in enumerate(listed(image), 1):
+            for word in pages[os.path.basename(path)].split():
+                data['page_num'].append(page_num)
+                data['conf'].append(90 if word.isalpha() else 60)
+        return data
+
+    monkeypatch.setattr(pytesseract, "image_to_string", image_to_string)
+    monkeypatch.setattr(pytesseract, "image_to_data", image_to_data)
+
+
+def test_batch_extract_via_filelist_splits_pages(engine, images, monkeypatch):
+    """Texto separado no form feed e confiança agrupada por page_num, em blocos"""
+    pages = {'page_0.png': 'primeira página\n', 'page_1.png': 'lote 2\n', 'page_2.png': 'leilão judicial\n'}
+    calls = []
+    _fake_tesseract(monkeypatch, pages, calls)
+    engine.BATCH_CHUNK_SIZE = 2
+
+    results = engine._batch_extract_via_filelist(images)
+
+    assert calls == [[os.path.abspath(p) for p in images[:2]], [os.path.abspath(images[2])]]
+    assert [r['text'] for r in results] == ['primeira página', 'lote 2', 'leilão judicial']
+    assert [r['image_path'] for r in results] == images
+    assert results[0]['confidence_stats']['avg_confidence'] == 90
+    assert results[1]['confidence_stats']['avg_confidence'] == 75
+    assert results[1]['confidence_stats']['total_words'] == 2
+
+
+def test_batch_extract_via_filelist_falls_back_per_image(engine, images, monkeypatch):
+    """Saída com número de páginas diferente do bloco: bloco refeito imagem a imagem"""
+    monkeypatch.setattr(pytesseract, "image_to_string", lambda image, lang=None, config='': 'uma página só\f')
+    monkeypatch.setattr(pytesseract, "image_to_data",
+                        lambda image, lang=None, config='', output_type=None: {'page_num': [], 'conf': []})
+    extracted = []
+    monkeypatch.setattr(engine, "extract_text", lambda path: extracted.append(path) or {'text': path})
+
+    results = engine._batch_extract_via_filelist(images)
+
+    assert extracted == images
+    assert [r['text'] for r in results] == images
+
+
+def test_char_count_matches_extract_text(engine, images, monkeypatch):
+    """Mesmo char_count/word_count por imagem em extract_text e na lista de arquivos"""
+    text = 'Edital de leilão\nlote 2\n'
+    _fake_tesseract(monkeypatch, {os.path.basename(images[0]): text})
+    batch_result = engine._batch_extract_via_filelist(images[:1])[0]
+
+    # pytesseract por imagem mantém o form feed final
+    monkeypatch.setattr(pytesseract, "image_to_string", lambda image, lang=None, config='': text + '\f')
+    monkeypatch.setattr(pytesseract, "image_to_data",
+                        lambda image, lang=None, config='', output_type=None: {'conf': [90, 90, 90, 90]})
+    single_result = engine.extract_text(images[0])
+
+    assert batch_result['text'] == single_result['text'] == text.strip()
+    assert batch_result['char_count'] == single_result['char_count'] == len(text.strip())
+    assert batch_result['word_count'] == single_result['word_count'] == 5
+
+
+def test_batch_extract_keeps_input_order(engine, images, monkeypatch, tmp_path):
+    """batch_extract serial (max_workers=1) consolida na ordem de entrada"""
+    _fake_tesseract(monkeypatch, {os.path.basename(p): f'texto {i}' for i, p in enumerate(images)})
+
+    result = engine.batch_extract(images, output_dir=str(tmp_path / 'out'), max_workers=1)
+
+    assert [r['text'] for r in result['individual_results']] == ['texto 0', 'texto 1', 'texto 2']
+    assert (tmp_path / 'out' / 'page_1_ocr.txt').read_text(encoding='utf-8') == 'texto 1'
+
+
+def test_pool_worker_uses_filelist_without_tesserocr(engine, images, monkeypatch):
+    """Worker do pool fecha o handle tesserocr e lança o tesseract com OMP_THREAD_LIMIT=1"""
+    module = importlib.import_module("ocr.tesseract_engine")
+    ended = []
+
+    class FakeTessBaseAPI:
+        def __init__(self, **kwargs):
+            pass
+
+        def End(self):
+            ended.append(True)
+
+    monkeypatch.setattr(module, "TESSEROCR_AVAILABLE", True)
+    monkeypatch.setattr(module, "PyTessBaseAPI", FakeTessBaseAPI, raising=False)
+    monkeypatch.setattr(module, "_worker_engine", None)
+    monkeypatch.delenv("OMP_THREAD_LIMIT", raising=False)
+    calls = []
+    _fake_tesseract(monkeypatch, {os.path.basename(p): f'texto {i}' for i, p in enumerate(images)}, calls)
+
+    module._init_ocr_worker()
+    engine_args = (engine.languages, engine.psm_mode, engine.oem_mode, None)
+    results = module._extract_chunk_in_worker(engine_args, images)
+
+    assert os.environ["OMP_THREAD_LIMIT"] == "1"
+    assert ended == [True] and module._worker_engine._api is None
+    assert calls == [[os.path.abspath(p) for p in images]]
+    assert [r['text'] for r in results] == ['texto 0', 'texto 1', 'texto 2']
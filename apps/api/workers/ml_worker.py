@@ -225,12 +225,11 @@ class MLWorker:
                     'predictions': []
                 }
             
-            # Fazer predições para cada página
+            # Fazer predições para todas as páginas numa única chamada ao ensemble
             predictions = []
-            for features in job_features:
+            page_predictions = ensemble_model.predict_batch(job_features)
+            for features, prediction in zip(job_features, page_predictions):
                 try:
-                    prediction = ensemble_model.predict(features)
-                    
                     # Adicionar informações da página
                     prediction_data = {
                         'page_number': features.page_number,